@@ -0,0 +1,143 @@
+"""Cold-start benchmark for RFID Jukebox.
+
+Starts a fresh interpreter per run, the way Home Assistant loads the
+integration after a restart, and times each step:
+
+- ``import``: the integration package with everything setup imports;
+- ``platforms``: the entity platforms of the box, all four, or only the
+  sensor platform in playback-only mode;
+- ``mappings``: the mapping load served from the parsed snapshot cache.
+
+It also reports which optional modules got loaded on the way. The tap
+statistics, pre-built queue and warm-up modules are only imported by a box
+that has them turned on, and the import/export module by its services, so
+none of them should show up. With ``--budget`` the run fails when the median
+total exceeds the given milliseconds.
+
+    python benchmarks/bench_coldstart.py --runs 20 --budget 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from harness import REPO_ROOT, write_mapping_file
+
+from custom_components.rfid_jukebox import MAPPING_PLATFORMS, PLATFORMS
+from custom_components.rfid_jukebox.const import DEFAULT_JOURNAL_COMPACT_THRESHOLD, DEFAULT_MAPPING_FILE_PATH
+from custom_components.rfid_jukebox.store import MappingStore
+
+MODES = {
+    "full": PLATFORMS,
+    "playback_only": [platform for platform in PLATFORMS if platform not in MAPPING_PLATFORMS],
+}
+STEPS = ("import", "platforms", "mappings")
+WATCHED = tuple(
+    f"custom_components.rfid_jukebox.{module}"
+    for module in ("analytics", "queues", "warmup", "transfer", "config_flow")
+)
+
+# Runs in the fresh interpreter: argv holds the config dir and the platforms.
+CHILD = """
+import importlib, json, sys, time
+config_dir, platforms = sys.argv[1], sys.argv[2].split(",")
+times = {}
+started = time.perf_counter()
+import custom_components.rfid_jukebox
+times["import"] = time.perf_counter() - started
+started = time.perf_counter()
+for platform in platforms:
+    importlib.import_module(f"custom_components.rfid_jukebox.{platform}")
+times["platforms"] = time.perf_counter() - started
+from custom_components.rfid_jukebox.store import MappingStore
+store = MappingStore(None, f"{config_dir}/%s", %d, cache_path=f"{config_dir}/.storage/mappings_cache")
+started = time.perf_counter()
+store.load()
+times["mappings"] = time.perf_counter() - started
+print(json.dumps({
+    "times": times,
+    "source": store.load_stats["source"],
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (DEFAULT_MAPPING_FILE_PATH, DEFAULT_JOURNAL_COMPACT_THRESHOLD, WATCHED)
+
+
+def run_child(config_dir: str, platforms: List[str]) -> Dict[str, Any]:
+    """Run one cold start in a fresh interpreter and return its timings."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, config_dir, ",".join(platforms)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode:
+        raise RuntimeError(f"cold start failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_mode(config_dir: str, platforms: List[str], runs: int) -> Dict[str, Any]:
+    """Return the median step times in milliseconds of one mode."""
+    samples = {step: [] for step in STEPS}
+    loaded = set()
+    sources = set()
+    for _ in range(runs):
+        result = run_child(config_dir, platforms)
+        for step in STEPS:
+            samples[step].append(result["times"][step] * 1000)
+        loaded.update(result["loaded"])
+        sources.add(result["source"])
+    report = {f"{step}_ms": round(statistics.median(samples[step]), 2) for step in STEPS}
+    report["total_ms"] = round(
+        statistics.median([sum(samples[step][run] for step in STEPS) for run in range(runs)]), 2
+    )
+    report["mapping_source"] = ", ".join(sorted(sources))
+    report["optional_modules_loaded"] = sorted(loaded)
+    return report
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="cold starts per mode")
+    parser.add_argument("--tags", type=int, default=1000, help="mappings in the mapping file")
+    parser.add_argument("--budget", type=float, help="fail when a median total exceeds this many ms")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rfid_jukebox_coldstart_") as config_dir:
+        write_mapping_file(config_dir, args.tags)
+        # Warm the parsed snapshot cache, as the first start after an edit does.
+        MappingStore(
+            None,
+            os.path.join(config_dir, DEFAULT_MAPPING_FILE_PATH),
+            DEFAULT_JOURNAL_COMPACT_THRESHOLD,
+            cache_path=os.path.join(config_dir, ".storage", "mappings_cache"),
+        ).load()
+        report = {mode: run_mode(config_dir, platforms, args.runs) for mode, platforms in MODES.items()}
+
+    over = [mode for mode, result in report.items() if args.budget and result["total_ms"] > args.budget]
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'mode':<14} {'import':>8} {'platforms':>10} {'mappings':>9} {'total':>8}  optional modules loaded")
+        for mode, result in report.items():
+            print(
+                f"{mode:<14} {result['import_ms']:>8.1f} {result['platforms_ms']:>10.1f} "
+                f"{result['mappings_ms']:>9.1f} {result['total_ms']:>8.1f}  "
+                f"{', '.join(result['optional_modules_loaded']) or 'none'}"
+            )
+        if args.budget:
+            print(f"budget {args.budget:g} ms: " + (f"exceeded by {', '.join(over)}" if over else "met"))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Group playback benchmark for RFID Jukebox.
+
+Maps two cards to media on a group of the box's player plus ``--members``
+further players and taps them in turn: start, take off (pause), put back
+(resume). The box joins the group once and plays the media with one call on
+its own player; pause and resume go to every member at once. For
+comparison, the same cycle is run by calling every player one after the
+other, the way a box without groups would have to.
+
+Each player answers after ``--latency`` ms plus up to ``--jitter`` ms, and
+the last member after a further ``--slow`` ms; grouped, it also starts
+playing that much after the box's player. Reported per step: p50/p95
+until every member is done (for a grouped start, until every member
+plays), service calls per cycle and, for the group, the slowest member of
+the grouped starts and of the fanned out calls.
+
+    python benchmarks/bench_group.py --members 3 --cycles 50 --slow 80
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from harness import MEDIA_PLAYER, TAG_REMOVED, JukeboxBench, percentile, synthetic_tag
+from homeassistant.const import STATE_IDLE
+
+from custom_components.rfid_jukebox.const import CONF_PRESENCE_CONFIRM, CONF_REMOVAL_GRACE, CONF_TAG_SENSOR
+
+STEPS = ("start", "pause", "resume")
+
+
+def _ms(values: List[float], pct: float) -> float:
+    return round(percentile(values, pct) * 1000, 2)
+
+
+async def async_settle(jukebox) -> None:
+    """Wait until the box has no playback command pending."""
+    while jukebox.playback.intent is not None:
+        await asyncio.sleep(0.0005)
+
+
+async def async_wait_recorded(jukebox, recorded: int) -> None:
+    """Wait until the box has recorded group member times past ``recorded``."""
+    deadline = time.monotonic() + 5
+    while jukebox.group_timings.recorded <= recorded and time.monotonic() < deadline:
+        await asyncio.sleep(0.0005)
+
+
+async def async_run_group(bench: JukeboxBench, players: List[str], cycles: int) -> Dict[str, Any]:
+    """Run the cycles through the jukebox with the cards mapped to the group."""
+    jukebox = bench.jukeboxes[0]
+    tags = [synthetic_tag(0), synthetic_tag(1)]
+    for tag in tags:
+        await jukebox.coordinator.async_map_tag(tag, "playlist", f"bench/group/{tag}", None, jukebox, players)
+    tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+    samples: Dict[str, List[float]] = {step: [] for step in STEPS}
+    start_members: List[float] = []
+    calls_before = bench.music_assistant.recorded
+    for cycle in range(cycles):
+        tag = tags[cycle % 2]
+        # Forget the resume points so every cycle starts with one play call.
+        for known in tags:
+            jukebox.resume.async_forget(known)
+        for step, state in (("start", tag), ("pause", TAG_REMOVED), ("resume", tag)):
+            started = time.perf_counter()
+            recorded = jukebox.group_timings.recorded
+            bench.hass.states.async_set(tag_sensor, state)
+            await asyncio.sleep(0)
+            await async_settle(jukebox)
+            if step == "start":
+                await async_wait_recorded(jukebox, recorded)
+                if jukebox.group_timings.kind == "start":
+                    start_members.append(max(jukebox.group_timings.last.values()) / 1000)
+            samples[step].append(time.perf_counter() - started)
+        bench.hass.states.async_set(tag_sensor, TAG_REMOVED)
+        await asyncio.sleep(0)
+        await async_settle(jukebox)
+    stats = jukebox.group_timings.stats()
+    return {
+        **{f"{step}_p50_ms": _ms(samples[step], 50) for step in STEPS},
+        **{f"{step}_p95_ms": _ms(samples[step], 95) for step in STEPS},
+        "calls_per_cycle": round((bench.music_assistant.recorded - calls_before) / cycles, 1),
+        "start_members_timed": len(start_members),
+        "start_slowest_member_p50_ms": _ms(start_members, 50) if start_members else None,
+        "start_slowest_member_p95_ms": _ms(start_members, 95) if start_members else None,
+        "slowest_member_p50_ms": stats["p50"],
+        "slowest_member_p95_ms": stats["p95"],
+        "slowest_member": stats["slowest_member"],
+    }
+
+
+async def async_run_sequential(bench: JukeboxBench, players: List[str], cycles: int) -> Dict[str, Any]:
+    """Run the cycles by calling every player in turn."""
+    hass = bench.hass
+    everyone = [MEDIA_PLAYER, *players]
+    samples: Dict[str, List[float]] = {step: [] for step in STEPS}
+    calls_before = bench.music_assistant.recorded
+    steps = (
+        ("start", "music_assistant", "play_media", {"media_id": "bench/group/sequential", "media_type": "playlist"}),
+        ("pause", "media_player", "media_pause", {}),
+        ("resume", "media_player", "media_play", {}),
+    )
+    for _ in range(cycles):
+        for step, domain, service, data in steps:
+            started = time.perf_counter()
+            for entity_id in everyone:
+                await hass.services.async_call(domain, service, {**data, "entity_id": entity_id}, blocking=True)
+            samples[step].append(time.perf_counter() - started)
+        for entity_id in everyone:
+            await hass.services.async_call("media_player", "media_pause", {"entity_id": entity_id}, blocking=True)
+    return {
+        **{f"{step}_p50_ms": _ms(samples[step], 50) for step in STEPS},
+        **{f"{step}_p95_ms": _ms(samples[step], 95) for step in STEPS},
+        "calls_per_cycle": round((bench.music_assistant.recorded - calls_before) / cycles, 1),
+    }
+
+
+async def async_main(args) -> Dict[str, Any]:
+    """Run both modes and return the report."""
+    report = {}
+    for mode, runner in (("group", async_run_group), ("sequential", async_run_sequential)):
+        bench = JukeboxBench(
+            tags=2,
+            service_latency=args.latency / 1000,
+            options={CONF_REMOVAL_GRACE: 0, CONF_PRESENCE_CONFIRM: 0},
+        )
+        await bench.async_start()
+        try:
+            music_assistant = bench.music_assistant
+            music_assistant.jitter = args.jitter / 1000
+            music_assistant.rng = random.Random(args.seed)
+            players = [f"media_player.bench_group_{index}" for index in range(args.members)]
+            for player in players:
+                bench.hass.states.async_set(player, STATE_IDLE)
+            if players:
+                music_assistant.member_latency[players[-1]] = args.slow / 1000
+            report[mode] = await runner(bench, players, args.cycles)
+        finally:
+            await bench.async_stop()
+    return report
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=3, help="players grouped with the box's player")
+    parser.add_argument("--cycles", type=int, default=30, help="start, pause and resume cycles")
+    parser.add_argument("--latency", type=float, default=20.0, help="service latency in ms")
+    parser.add_argument("--jitter", type=float, default=10.0, help="extra random service latency in ms")
+    parser.add_argument("--slow", type=float, default=50.0, help="extra latency of the last member in ms")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"box player + {args.members} members, {args.latency:g}+{args.jitter:g} ms, slowest +{args.slow:g} ms")
+    print(f"{'mode':<11} {'start p50/p95':>15} {'pause p50/p95':>15} {'resume p50/p95':>15} {'calls':>6}")
+    for mode, result in report.items():
+        print(
+            f"{mode:<11} "
+            + " ".join(
+                f"{result[f'{step}_p50_ms']:>7.1f}/{result[f'{step}_p95_ms']:<7.1f}" for step in STEPS
+            )
+            + f" {result['calls_per_cycle']:>6}"
+        )
+    group = report["group"]
+    if group["start_members_timed"]:
+        print(
+            f"grouped start, slowest member playing: p50 {group['start_slowest_member_p50_ms']} ms, "
+            f"p95 {group['start_slowest_member_p95_ms']} ms ({group['start_members_timed']} starts)"
+        )
+    if group["slowest_member"]:
+        print(
+            f"slowest member {group['slowest_member']}: "
+            f"p50 {group['slowest_member_p50_ms']} ms, p95 {group['slowest_member_p95_ms']} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
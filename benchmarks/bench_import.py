@@ -0,0 +1,130 @@
+"""Bulk mapping import benchmark for RFID Jukebox.
+
+Onboards a batch of new cards once through ``map_tag`` calls, one per card,
+and once through a single ``import_mappings`` call for each file format,
+and reports the wall time of each.
+
+    python benchmarks/bench_import.py --cards 500
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Dict
+
+from harness import JukeboxBench, synthetic_tag
+
+from custom_components.rfid_jukebox.const import DOMAIN
+
+FORMATS = ("csv", "jsonl", "json", "yaml")
+
+
+def write_cards(path: str, file_format: str, cards: int, offset: int) -> None:
+    """Write ``cards`` new card rows to ``path`` in the given format."""
+    rows = [
+        {
+            "tag_id": synthetic_tag(offset + index),
+            "type": "folder",
+            "name": f"onboarding/{index}",
+            "alias": f"Card {index}",
+        }
+        for index in range(cards)
+    ]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        elif file_format == "jsonl":
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+        elif file_format == "json":
+            json.dump(rows, f)
+        else:
+            import yaml
+
+            yaml.safe_dump(rows, f)
+
+
+async def async_time_map_tag(bench: JukeboxBench, cards: int, offset: int) -> float:
+    """Return the seconds needed to map ``cards`` cards one service call at a time."""
+    started = time.perf_counter()
+    for index in range(cards):
+        await bench.hass.services.async_call(
+            DOMAIN,
+            "map_tag",
+            {
+                "tag_id": synthetic_tag(offset + index),
+                "media_type": "folder",
+                "media_name": f"onboarding/{index}",
+                "alias": f"Card {index}",
+            },
+            blocking=True,
+        )
+    return time.perf_counter() - started
+
+
+async def async_time_import(bench: JukeboxBench, path: str, dry_run: bool = False) -> Dict[str, object]:
+    """Return the seconds one import_mappings call takes and its report."""
+    started = time.perf_counter()
+    report = await bench.hass.services.async_call(
+        DOMAIN,
+        "import_mappings",
+        {"file_path": path, "overwrite": False, "dry_run": dry_run},
+        blocking=True,
+        return_response=True,
+    )
+    return {"seconds": time.perf_counter() - started, "report": report}
+
+
+async def async_main(args) -> Dict[str, object]:
+    """Run the benchmark and return the report."""
+    report: Dict[str, object] = {"cards": args.cards}
+    bench = JukeboxBench(tags=args.tags)
+    await bench.async_start()
+    try:
+        config_dir = bench.hass.config.config_dir
+        offset = args.tags
+        report["map_tag_s"] = await async_time_map_tag(bench, args.cards, offset)
+        for file_format in FORMATS:
+            offset += args.cards
+            path = os.path.join(config_dir, f"cards.{file_format}")
+            write_cards(path, file_format, args.cards, offset)
+            dry = await async_time_import(bench, path, dry_run=True)
+            wet = await async_time_import(bench, path)
+            report[file_format] = {
+                "dry_run_s": dry["seconds"],
+                "import_s": wet["seconds"],
+                "added": wet["report"]["added"],
+            }
+    finally:
+        await bench.async_stop()
+    return report
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=500, help="new cards to onboard")
+    parser.add_argument("--tags", type=int, default=100, help="mappings that already exist")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"map_tag x{report['cards']}: {report['map_tag_s'] * 1000:.1f} ms")
+    print(f"{'format':<8} {'dry run ms':>11} {'import ms':>10} {'added':>6}")
+    for file_format in FORMATS:
+        stats = report[file_format]
+        print(
+            f"{file_format:<8} {stats['dry_run_s'] * 1000:>11.1f} "
+            f"{stats['import_s'] * 1000:>10.1f} {stats['added']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
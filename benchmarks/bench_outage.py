@@ -0,0 +1,144 @@
+"""Music Assistant outage benchmark for RFID Jukebox.
+
+Takes the stand-in Music Assistant down for ``--outage`` seconds. Halfway
+through, the card on the reader is swapped for another one. While it is
+down, every call fails, and the box retries with backoff. The ``short``
+outage ends within the retry window (``--expiry``), so the latest card
+should play once Music Assistant is back. The ``long`` outage lasts three
+times the window, so even the latest tap expires and the player should be
+left alone.
+
+The backoff starts at ``--retry`` seconds and doubles up to eight times
+that. Reported per mode: how many cycles played the latest card, how many
+dropped it, p50/p95 from the end of the outage until the card plays, and the
+calls, retries and expired commands per cycle.
+
+    python benchmarks/bench_outage.py --cycles 5 --outage 1 --expiry 2
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from harness import MEDIA_PLAYER, TAG_REMOVED, JukeboxBench, percentile, synthetic_tag
+from homeassistant.const import STATE_IDLE, STATE_PLAYING
+
+from custom_components.rfid_jukebox.const import CONF_PRESENCE_CONFIRM, CONF_REMOVAL_GRACE, CONF_TAG_SENSOR
+
+
+async def async_wait(condition, timeout: float) -> bool:
+    """Poll ``condition`` until it holds or ``timeout`` seconds have passed."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.001)
+    return True
+
+
+async def async_run_mode(args, outage: float) -> Dict[str, Any]:
+    """Run the cycles with outages of the given length."""
+    bench = JukeboxBench(
+        tags=2,
+        service_latency=args.latency / 1000,
+        options={CONF_REMOVAL_GRACE: 0, CONF_PRESENCE_CONFIRM: 0},
+    )
+    await bench.async_start()
+    try:
+        hass = bench.hass
+        music_assistant = bench.music_assistant
+        jukebox = bench.jukeboxes[0]
+        playback = jukebox.playback
+        playback.expiry = args.expiry
+        playback.retry_delay = args.retry
+        playback.retry_max_delay = args.retry * 8
+        tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+        first, latest = synthetic_tag(0), synthetic_tag(1)
+        recovery: List[float] = []
+        played = dropped = 0
+        calls_before = music_assistant.recorded
+
+        def _playing_latest() -> bool:
+            return jukebox.session.tag_id == latest and hass.states.get(MEDIA_PLAYER).state == STATE_PLAYING
+
+        for _ in range(args.cycles):
+            hass.states.async_set(tag_sensor, TAG_REMOVED)
+            await async_wait(lambda: playback.intent is None, 5)
+            hass.states.async_set(MEDIA_PLAYER, STATE_IDLE)
+            for tag in (first, latest):
+                jukebox.resume.async_forget(tag)
+            await hass.async_block_till_done()
+
+            music_assistant.outage = True
+            hass.states.async_set(tag_sensor, first)
+            await asyncio.sleep(outage / 2)
+            hass.states.async_set(tag_sensor, TAG_REMOVED)
+            hass.states.async_set(tag_sensor, latest)
+            await asyncio.sleep(outage / 2)
+            music_assistant.outage = False
+            recovered = time.perf_counter()
+
+            await async_wait(lambda: playback.intent is None, args.retry * 8 + 5)
+            if _playing_latest():
+                played += 1
+                recovery.append(time.perf_counter() - recovered)
+            elif hass.states.get(MEDIA_PLAYER).state != STATE_PLAYING:
+                dropped += 1
+        return {
+            "outage_s": round(outage, 2),
+            "played_latest": played,
+            "dropped": dropped,
+            "recovery_p50_ms": round(percentile(recovery, 50) * 1000, 1) if recovery else None,
+            "recovery_p95_ms": round(percentile(recovery, 95) * 1000, 1) if recovery else None,
+            "calls_per_cycle": round((music_assistant.recorded - calls_before) / args.cycles, 1),
+            "retries_per_cycle": round(playback.retries / args.cycles, 1),
+            "expired_per_cycle": round(playback.expired / args.cycles, 1),
+        }
+    finally:
+        await bench.async_stop()
+
+
+async def async_main(args) -> Dict[str, Any]:
+    """Run the short and long outages and return the report."""
+    return {
+        "short": await async_run_mode(args, args.outage),
+        "long": await async_run_mode(args, args.expiry * 3),
+    }
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=5, help="outages per mode")
+    parser.add_argument("--outage", type=float, default=1.0, help="length of the short outage in s")
+    parser.add_argument("--expiry", type=float, default=2.0, help="retry window in s")
+    parser.add_argument("--retry", type=float, default=0.1, help="first retry delay in s")
+    parser.add_argument("--latency", type=float, default=10.0, help="service latency in ms")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"retry window {args.expiry:g} s, backoff {args.retry:g}..{args.retry * 8:g} s, {args.cycles} cycles")
+    print(
+        f"{'mode':<6} {'outage':>7} {'played':>7} {'dropped':>8} {'recovery p50/p95':>17} "
+        f"{'calls':>6} {'retries':>8} {'expired':>8}"
+    )
+    for mode, result in report.items():
+        recovery = (
+            f"{result['recovery_p50_ms']:.1f}/{result['recovery_p95_ms']:.1f}"
+            if result["recovery_p50_ms"] is not None
+            else "-"
+        )
+        print(
+            f"{mode:<6} {result['outage_s']:>6g}s {result['played_latest']:>7} {result['dropped']:>8} "
+            f"{recovery:>17} {result['calls_per_cycle']:>6} {result['retries_per_cycle']:>8} "
+            f"{result['expired_per_cycle']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Pre-built track queue benchmark for RFID Jukebox.
+
+Taps folder cards with a skewed popularity, the way a few favorite cards
+dominate in practice, against a stand-in Music Assistant that walks every
+folder it plays. Reports the tap-to-playing time with and without
+pre-built queues for the most tapped tags.
+
+    python benchmarks/bench_queues.py --taps 300 --tracks 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from harness import TAG_REMOVED, JukeboxBench, percentile, synthetic_tag
+
+from custom_components.rfid_jukebox.const import (
+    CONF_PRESENCE_CONFIRM,
+    CONF_QUEUE_TAGS,
+    CONF_REMOVAL_GRACE,
+    CONF_RESUME_MAX_TAGS,
+    CONF_TAG_SENSOR,
+)
+
+
+def tap_sequence(cards: int, taps: int, seed: int) -> List[str]:
+    """Return Zipf-distributed folder card taps, never the same card twice in a row."""
+    rng = random.Random(seed)
+    # Odd indices are folders in the harness mapping file.
+    folders = [synthetic_tag(index * 2 + 1) for index in range(cards)]
+    weights = [1 / rank for rank in range(1, cards + 1)]
+    sequence: List[str] = []
+    while len(sequence) < taps:
+        tag = rng.choices(folders, weights)[0]
+        if not sequence or sequence[-1] != tag:
+            sequence.append(tag)
+    return sequence
+
+
+async def async_run(args, queue_tags: int) -> Dict[str, object]:
+    """Play the tap sequence with ``queue_tags`` pre-built queues."""
+    bench = JukeboxBench(
+        tags=args.cards * 2,
+        options={
+            CONF_REMOVAL_GRACE: 0,
+            CONF_PRESENCE_CONFIRM: 0,
+            CONF_RESUME_MAX_TAGS: 0,
+            CONF_QUEUE_TAGS: queue_tags,
+        },
+        folder_tracks=args.tracks,
+        folder_walk=args.walk / 1000,
+    )
+    await bench.async_start()
+    samples: List[float] = []
+    try:
+        tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+        for tag in tap_sequence(args.cards, args.taps, args.seed):
+            waiter = bench.music_assistant.expect_played()
+            published_at = time.perf_counter()
+            bench.hass.states.async_set(tag_sensor, tag)
+            samples.append(await asyncio.wait_for(waiter, 10) - published_at)
+            bench.hass.states.async_set(tag_sensor, TAG_REMOVED)
+            await bench.hass.async_block_till_done()
+        # A box with pre-built queues turned off has none.
+        queues = bench.jukeboxes[0].queues
+        stats = {
+            "hits": queues.hits if queues is not None else 0,
+            "builds": queues.builds if queues is not None else 0,
+            "browses": bench.music_assistant.browses,
+        }
+    finally:
+        await bench.async_stop()
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        **stats,
+    }
+
+
+async def async_main(args) -> Dict[str, object]:
+    """Run the benchmark and return the report."""
+    return {
+        "taps": args.taps,
+        "off": await async_run(args, 0),
+        "queues": await async_run(args, args.queue_tags),
+    }
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=30, help="folder cards in rotation")
+    parser.add_argument("--taps", type=int, default=300, help="taps to play")
+    parser.add_argument("--tracks", type=int, default=300, help="tracks per folder")
+    parser.add_argument("--walk", type=float, default=0.2, help="folder walk time per track in ms")
+    parser.add_argument("--queue-tags", type=int, default=10, help="pre-built queues to keep")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the tap sequence")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['taps']} taps, tap to playing:")
+    print(f"{'queues':<8} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'hits':>6} {'browses':>8}")
+    for label in ("off", "queues"):
+        stats = report[label]
+        print(
+            f"{label:<8} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['mean_ms']:>9.2f} {stats['hits']:>6} {stats['browses']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
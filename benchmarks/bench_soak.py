@@ -0,0 +1,318 @@
+"""Soak test for RFID Jukebox: many boxes and high tap rates for hours.
+
+Sets up ``--boxes`` jukeboxes in one stand-in Home Assistant core against a
+stand-in Music Assistant with ``--latency`` plus up to ``--jitter`` ms per
+call, and drives random card traffic at ``--rate`` actions per second
+across all boxes: placements, lifts, flaps shorter than the removal grace
+and rapid swaps. Every ``--report`` seconds it prints:
+
+- event loop lag (how late a 10 ms timer fires), p50/p99/max;
+- tag handler time, the synchronous work per tag sensor change, p50/p99;
+- tap to playing, as recorded by the integration's own tap timings, p50/p95;
+- resident memory and its growth since the first report;
+- dropped commands: a box that has been quiet for a while whose player
+  does not match the card on its reader;
+- misordered commands: a player changed by a call after a later call to
+  the same player already had.
+
+    python benchmarks/bench_soak.py --boxes 20 --rate 20 --duration 3600
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import resource
+import time
+from typing import Any, Dict, List, Optional
+
+from harness import TAG_REMOVED, JukeboxBench, percentile, synthetic_tag
+from homeassistant.const import STATE_PLAYING
+
+from custom_components.rfid_jukebox.const import (
+    CONF_MEDIA_PLAYER,
+    CONF_PRESENCE_CONFIRM,
+    CONF_REMOVAL_GRACE,
+    CONF_TAG_SENSOR,
+)
+from custom_components.rfid_jukebox.timing import STAGE_TOTAL
+
+ACTIONS = ("lift", "swap", "flap")
+LAG_INTERVAL = 0.01
+SWEEP_INTERVAL = 0.1
+
+
+def rss_mb() -> float:
+    """Return the resident memory of this process in MB."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # Not Linux; fall back to the peak.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Samples:
+    """Samples collected since the last report."""
+
+    def __init__(self):
+        """Initialize empty sample lists."""
+        self.lag: List[float] = []
+        self.handler: List[float] = []
+        self.playing: List[float] = []
+
+    def reset(self) -> "Samples":
+        """Return the collected samples and start over."""
+        samples = Samples()
+        samples.lag, self.lag = self.lag, []
+        samples.handler, self.handler = self.handler, []
+        samples.playing, self.playing = self.playing, []
+        return samples
+
+
+class BoxDriver:
+    """Random card traffic on one box, checking the box whenever it is quiet."""
+
+    def __init__(self, bench: JukeboxBench, index: int, args, samples: Samples):
+        """Initialize the driver and hook into the box's handlers."""
+        self.bench = bench
+        self.args = args
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.jukebox = bench.jukeboxes[index]
+        self.tag_sensor = bench.entries[index].data[CONF_TAG_SENSOR]
+        self.media_player = bench.entries[index].data[CONF_MEDIA_PLAYER]
+        self.tags = [synthetic_tag(tag) for tag in range(args.tags)]
+        self.unmapped = synthetic_tag(args.tags + index)
+        self.on_reader: Optional[str] = None
+        self.last_action = time.monotonic()
+        self.checked = True
+        self.actions = 0
+        self.checks = 0
+        self.dropped = 0
+        self._hook(samples)
+
+    def _hook(self, samples: Samples) -> None:
+        jukebox = self.jukebox
+        handler = jukebox.async_tag_changed_handler
+        record = jukebox.timings.record
+
+        def _timed_handler(event_data) -> None:
+            started = time.perf_counter()
+            handler(event_data)
+            samples.handler.append(time.perf_counter() - started)
+
+        def _record(trace) -> None:
+            record(trace)
+            total = trace.stages()[STAGE_TOTAL]
+            if total is not None:
+                samples.playing.append(total / 1000)
+
+        jukebox.async_tag_changed_handler = _timed_handler
+        jukebox.timings.record = _record
+
+    async def async_run(self, deadline: float) -> None:
+        """Act at random intervals until the deadline."""
+        mean_gap = self.args.boxes / self.args.rate
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.rng.expovariate(1 / mean_gap))
+            await self._async_act(self.rng.choice(ACTIONS) if self.on_reader else "place")
+
+    async def _async_act(self, action: str) -> None:
+        self.actions += 1
+        on_reader = self.on_reader
+        if action == "place":
+            self._publish(self._pick())
+        elif action == "lift":
+            self._publish(None)
+        elif action == "swap":
+            self._publish(None)
+            self._publish(self._pick())
+        elif action == "flap":
+            # Put the card back within the removal grace window.
+            self._publish(None)
+            await asyncio.sleep(self.rng.uniform(0, self.args.grace / 2000))
+            self._publish(on_reader)
+
+    def _pick(self) -> str:
+        if self.rng.random() < self.args.unmapped_share:
+            return self.unmapped
+        return self.rng.choice([tag for tag in self.tags if tag != self.on_reader])
+
+    def _publish(self, tag: Optional[str]) -> None:
+        self.on_reader = tag
+        self.last_action = time.monotonic()
+        self.checked = False
+        self.bench.hass.states.async_set(self.tag_sensor, tag or TAG_REMOVED)
+
+    def check(self) -> None:
+        """Compare the player with the reader once the box has been quiet long enough."""
+        jukebox = self.jukebox
+        if (
+            self.checked
+            or time.monotonic() - self.last_action < self.args.settle / 1000
+            or jukebox.playback.intent is not None
+            or jukebox.debouncer.removal_pending
+        ):
+            return
+        self.checked = True
+        self.checks += 1
+        player = self.bench.hass.states.get(self.media_player).state
+        if self.on_reader and self.on_reader != self.unmapped:
+            healthy = player == STATE_PLAYING and jukebox.session.tag_id == self.on_reader
+        else:
+            healthy = player != STATE_PLAYING
+        if not healthy:
+            self.dropped += 1
+
+
+async def async_sweep(deadline: float, drivers: List[BoxDriver]) -> None:
+    """Check every quiet box a few times a second."""
+    while time.monotonic() < deadline:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        for driver in drivers:
+            driver.check()
+
+
+async def async_monitor_lag(deadline: float, samples: Samples) -> None:
+    """Measure how late a short timer fires."""
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.lag.append(time.perf_counter() - started - LAG_INTERVAL)
+
+
+def _ms(values: List[float], pct: float) -> Optional[float]:
+    value = percentile(values, pct)
+    return None if value != value else round(value * 1000, 3)
+
+
+async def async_report(
+    bench: JukeboxBench, drivers: List[BoxDriver], samples: Samples, args, deadline: float
+) -> List[Dict[str, Any]]:
+    """Print a report line every interval and return all of them."""
+    rows: List[Dict[str, Any]] = []
+    started = time.monotonic()
+    baseline = None
+    calls_before = 0
+    actions_before = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(min(args.report, max(deadline - time.monotonic(), 0.01)))
+        interval = samples.reset()
+        music_assistant = bench.music_assistant
+        # Keep the stand-in's call log from growing over long runs.
+        music_assistant.calls.clear()
+        gc.collect()
+        memory = rss_mb()
+        baseline = memory if baseline is None else baseline
+        actions = sum(driver.actions for driver in drivers)
+        row = {
+            "elapsed_s": round(time.monotonic() - started, 1),
+            "actions": actions - actions_before,
+            "service_calls": music_assistant.recorded - calls_before,
+            "lag_p50_ms": _ms(interval.lag, 50),
+            "lag_p99_ms": _ms(interval.lag, 99),
+            "lag_max_ms": round(max(interval.lag, default=0.0) * 1000, 3),
+            "handler_p50_ms": _ms(interval.handler, 50),
+            "handler_p99_ms": _ms(interval.handler, 99),
+            "playing_p50_ms": _ms(interval.playing, 50),
+            "playing_p95_ms": _ms(interval.playing, 95),
+            "rss_mb": round(memory, 1),
+            "rss_growth_mb": round(memory - baseline, 1),
+            "checks": sum(driver.checks for driver in drivers),
+            "dropped": sum(driver.dropped for driver in drivers),
+            "misordered": music_assistant.misordered,
+        }
+        calls_before = music_assistant.recorded
+        actions_before = actions
+        rows.append(row)
+        if not args.json:
+            print(
+                f"{row['elapsed_s']:>8.0f} {row['actions']:>7} {row['service_calls']:>6} "
+                f"{row['lag_p50_ms'] or 0:>7.2f} {row['lag_p99_ms'] or 0:>7.2f} {row['lag_max_ms']:>7.1f} "
+                f"{row['handler_p50_ms'] or 0:>7.3f} {row['handler_p99_ms'] or 0:>7.3f} "
+                f"{row['playing_p50_ms'] or 0:>8.2f} {row['playing_p95_ms'] or 0:>8.2f} "
+                f"{row['rss_mb']:>7.1f} {row['rss_growth_mb']:>+6.1f} "
+                f"{row['checks']:>7} {row['dropped']:>5} {row['misordered']:>5}",
+                flush=True,
+            )
+    return rows
+
+
+async def async_main(args) -> Dict[str, Any]:
+    """Run the soak test and return the report."""
+    bench = JukeboxBench(
+        tags=args.tags,
+        service_latency=args.latency / 1000,
+        options={CONF_REMOVAL_GRACE: args.grace / 1000, CONF_PRESENCE_CONFIRM: 0},
+    )
+    await bench.async_start(args.boxes)
+    bench.music_assistant.jitter = args.jitter / 1000
+    bench.music_assistant.rng = random.Random(args.seed)
+    samples = Samples()
+    drivers = [BoxDriver(bench, index, args, samples) for index in range(args.boxes)]
+    if not args.json:
+        print(
+            f"{args.boxes} boxes, {args.rate} actions/s, {args.latency:g}+{args.jitter:g} ms service latency"
+        )
+        print(
+            f"{'time s':>8} {'actions':>7} {'calls':>6} {'lag p50':>7} {'lag p99':>7} {'lag max':>7} "
+            f"{'hdl p50':>7} {'hdl p99':>7} {'play p50':>8} {'play p95':>8} "
+            f"{'rss MB':>7} {'growth':>6} {'checks':>7} {'drop':>5} {'order':>5}"
+        )
+    deadline = time.monotonic() + args.duration
+    try:
+        rows, *_ = await asyncio.gather(
+            async_report(bench, drivers, samples, args, deadline),
+            async_monitor_lag(deadline, samples),
+            async_sweep(deadline, drivers),
+            *(driver.async_run(deadline) for driver in drivers),
+        )
+    finally:
+        await bench.async_stop()
+    return {
+        "boxes": args.boxes,
+        "rate": args.rate,
+        "duration_s": args.duration,
+        "actions": sum(driver.actions for driver in drivers),
+        "checks": sum(driver.checks for driver in drivers),
+        "dropped": sum(driver.dropped for driver in drivers),
+        "misordered": bench.music_assistant.misordered,
+        "lag_max_ms": max((row["lag_max_ms"] for row in rows), default=0.0),
+        "rss_growth_mb": rows[-1]["rss_growth_mb"] if rows else 0.0,
+        "reports": rows,
+    }
+
+
+def main() -> None:
+    """Parse arguments, run the soak test and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boxes", type=int, default=10, help="jukeboxes in the core")
+    parser.add_argument("--rate", type=float, default=10.0, help="card actions per second, all boxes")
+    parser.add_argument("--duration", type=float, default=60.0, help="run time in seconds")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between report lines")
+    parser.add_argument("--latency", type=float, default=20.0, help="service latency in ms")
+    parser.add_argument("--jitter", type=float, default=30.0, help="extra random service latency in ms")
+    parser.add_argument("--grace", type=float, default=300.0, help="removal grace window in ms")
+    parser.add_argument("--settle", type=float, default=1000.0, help="quiet time before a box is checked, in ms")
+    parser.add_argument("--unmapped-share", type=float, default=0.05, help="share of unmapped cards")
+    parser.add_argument("--tags", type=int, default=50, help="mapped cards")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    # Unmapped cards are part of the traffic; keep their warnings out of the report.
+    logging.getLogger("custom_components.rfid_jukebox").setLevel(logging.ERROR)
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(
+        f"{report['actions']} actions, {report['checks']} checks, {report['dropped']} dropped, "
+        f"{report['misordered']} misordered, max loop lag {report['lag_max_ms']:.1f} ms, "
+        f"memory growth {report['rss_growth_mb']:+.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Startup benchmark for RFID Jukebox mapping loads.
+
+Generates mapping files of increasing size and times MappingStore.load with
+a cold cache (full YAML parse) and a warm cache (parsed JSON snapshot), then
+times a full RFIDJukebox.async_setup against the stand-in core for the
+first box, which loads the shared mapping index, and for a second box.
+
+    python benchmarks/bench_startup.py --sizes 100 1000 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+from typing import Dict, List
+
+from harness import JukeboxBench, write_mapping_file
+
+from custom_components.rfid_jukebox.const import DEFAULT_JOURNAL_COMPACT_THRESHOLD, DEFAULT_MAPPING_FILE_PATH
+from custom_components.rfid_jukebox.store import MappingStore
+
+
+def time_store_loads(size: int, repeats: int) -> Dict[str, float]:
+    """Return median cold and warm MappingStore.load times in milliseconds."""
+    cold: List[float] = []
+    warm: List[float] = []
+    with tempfile.TemporaryDirectory(prefix="rfid_jukebox_startup_") as config_dir:
+        write_mapping_file(config_dir, size)
+        mapping_file = os.path.join(config_dir, DEFAULT_MAPPING_FILE_PATH)
+        cache_file = os.path.join(config_dir, ".storage", "mappings_cache")
+        for _ in range(repeats):
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+            store = MappingStore(None, mapping_file, DEFAULT_JOURNAL_COMPACT_THRESHOLD, cache_path=cache_file)
+            store.load()
+            cold.append(store.load_stats["total_ms"])
+
+            store = MappingStore(None, mapping_file, DEFAULT_JOURNAL_COMPACT_THRESHOLD, cache_path=cache_file)
+            store.load()
+            assert store.load_stats["source"] == "cache"
+            warm.append(store.load_stats["total_ms"])
+    return {"cold_ms": statistics.median(cold), "warm_ms": statistics.median(warm)}
+
+
+async def async_time_setup(size: int) -> Dict[str, float]:
+    """Return RFIDJukebox.async_setup times of the first and a second box."""
+    bench = JukeboxBench(tags=size)
+    await bench.async_start()
+    try:
+        cold = bench.jukeboxes[0].setup_stats
+        warm = (await bench.async_add_box(1)).setup_stats
+    finally:
+        await bench.async_stop()
+    return {"setup_cold_ms": cold["setup_ms"], "setup_warm_ms": warm["setup_ms"]}
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="mapping counts")
+    parser.add_argument("--repeats", type=int, default=5, help="loads per size")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        report[size] = time_store_loads(size, args.repeats)
+        report[size].update(asyncio.run(async_time_setup(size)))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'mappings':>8} {'yaml ms':>10} {'cache ms':>10} {'setup ms':>10} {'2nd box ms':>11}")
+    for size, stats in report.items():
+        print(
+            f"{size:>8} {stats['cold_ms']:>10.2f} {stats['warm_ms']:>10.2f} "
+            f"{stats['setup_cold_ms']:>10.2f} {stats['setup_warm_ms']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""Tap-to-sound latency benchmark for RFIDJukebox.async_tag_changed_handler.
+
+Drives synthetic tag present/remove events through a stand-in Home
+Assistant core and reports the time from the tag sensor state change to
+the Music Assistant / media player service call, for taps through the tag
+sensor and through the scan event, plus event throughput
+under bursts, the mapping UI state writes per tap, and the tap-to-playing time of a player that was switched
+off, with and without predictive warm-up, how returning tags resume, and
+whether taps are served while the options of a box change. Exits non-zero
+when a tap in flight during a player swap is lost or misrouted.
+
+    python benchmarks/bench_tag_latency.py --iterations 500 --json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, List
+
+from homeassistant.const import STATE_IDLE, STATE_OFF, STATE_UNAVAILABLE
+
+from harness import TAG_REMOVED, JukeboxBench, percentile, synthetic_tag
+
+from custom_components.rfid_jukebox.const import (
+    CONF_MEDIA_PLAYER,
+    CONF_PRESENCE_CONFIRM,
+    CONF_REMOVAL_GRACE,
+    CONF_TAG_SENSOR,
+    CONF_WARMUP,
+)
+
+
+async def async_measure_taps(bench: JukeboxBench, iterations: int) -> Dict[str, List[float]]:
+    """Run start/pause/resume/pause cycles and collect per-kind latencies."""
+    samples: Dict[str, List[float]] = {"start": [], "pause": [], "resume": []}
+    for index in range(iterations):
+        tag = synthetic_tag(index % bench.tag_count)
+        for kind, state in (
+            ("start", tag),
+            ("pause", TAG_REMOVED),
+            ("resume", tag),
+            ("pause", TAG_REMOVED),
+        ):
+            latency, _ = await bench.async_tap(state)
+            samples[kind].append(latency)
+    return samples
+
+
+async def async_measure_scan_events(bench: JukeboxBench, iterations: int) -> Dict[str, object]:
+    """Start tags through the scan event, alone and together with the sensor ("dual")."""
+    samples: Dict[str, List[float]] = {"event": [], "dual": []}
+    calls_before = len(bench.music_assistant.calls)
+    duplicates_before = bench.jukeboxes[0].scans["duplicate"]
+    for index in range(iterations):
+        for offset, (label, sensor) in enumerate((("event", False), ("dual", True))):
+            uid = synthetic_tag((index * 2 + offset) % bench.tag_count)
+            latency, _ = await bench.async_scan_event(uid, True, sensor)
+            samples[label].append(latency)
+            await bench.async_scan_event(uid, False, sensor)
+    return {
+        "latency": samples,
+        "service_calls": len(bench.music_assistant.calls) - calls_before,
+        "duplicates": bench.jukeboxes[0].scans["duplicate"] - duplicates_before,
+    }
+
+
+async def async_measure_bursts(bench: JukeboxBench, bursts: int, burst_size: int) -> Dict[str, float]:
+    """Fire bursts of back-to-back tag events and measure throughput."""
+    events = 0
+    calls_before = len(bench.music_assistant.calls)
+    ui_before = bench.ui.writes
+    started = time.perf_counter()
+    tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+    for burst in range(bursts):
+        for index in range(burst_size):
+            if index % 2:
+                state = TAG_REMOVED
+            else:
+                state = synthetic_tag((burst * burst_size + index) % bench.tag_count)
+            bench.hass.states.async_set(tag_sensor, state)
+            events += 1
+        await bench.hass.async_block_till_done()
+    elapsed = time.perf_counter() - started
+    return {
+        "events": events,
+        "service_calls": len(bench.music_assistant.calls) - calls_before,
+        "ui_writes": bench.ui.writes - ui_before,
+        "seconds": elapsed,
+        "events_per_second": events / elapsed if elapsed else float("inf"),
+    }
+
+
+async def async_measure_flaps(bench: JukeboxBench, flaps: int) -> Dict[str, float]:
+    """Flap a playing tag at the edge of the reader and count service calls."""
+    tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+    tag = synthetic_tag(0)
+    await bench.async_tap(tag)
+    calls_before = len(bench.music_assistant.calls)
+    for _ in range(flaps):
+        bench.hass.states.async_set(tag_sensor, TAG_REMOVED)
+        bench.hass.states.async_set(tag_sensor, tag)
+    await bench.hass.async_block_till_done()
+    return {
+        "flaps": flaps,
+        "service_calls": len(bench.music_assistant.calls) - calls_before,
+        "flaps_absorbed": bench.jukeboxes[0].debouncer.flaps_absorbed,
+    }
+
+
+async def async_measure_cold_starts(bench: JukeboxBench, iterations: int) -> List[float]:
+    """Switch the box off and on again, then time a tap until the player plays.
+
+    Each round pauses the current tag, turns the player off, takes the tag
+    reader offline and back, idles long enough for a warm-up to finish and
+    then taps one of a few favourite tags.
+    """
+    jukebox = bench.jukeboxes[0]
+    tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+    media_player = bench.entries[0].data[CONF_MEDIA_PLAYER]
+    hass = bench.hass
+    samples = []
+    for index in range(iterations):
+        hass.states.async_set(tag_sensor, STATE_UNAVAILABLE)
+        await hass.async_block_till_done()
+        hass.states.async_set(media_player, STATE_OFF)
+        if jukebox.warmup:
+            jukebox.warmup.last_run = None
+        hass.states.async_set(tag_sensor, TAG_REMOVED)
+        await asyncio.sleep(bench.cold_start + bench.service_latency + 0.05)
+        await hass.async_block_till_done()
+
+        started = time.perf_counter()
+        hass.states.async_set(tag_sensor, synthetic_tag(index % 3))
+        await hass.async_block_till_done()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def async_measure_switches(bench: JukeboxBench, rounds: int) -> Dict[str, object]:
+    """Swap between two cards and time how long a returning card takes to resume.
+
+    The resume is complete once the seek to the remembered position has been
+    sent, so the sample covers the composite play and seek.
+    """
+    samples = []
+    resumed = 0
+    first, second = synthetic_tag(0), synthetic_tag(2)
+    await bench.async_tap(first)
+    await bench.async_tap(TAG_REMOVED)
+    for _ in range(rounds):
+        await bench.async_tap(second)
+        await bench.async_tap(TAG_REMOVED)
+        tag_sensor = bench.entries[0].data[CONF_TAG_SENSOR]
+        calls_before = len(bench.music_assistant.calls)
+        published_at = time.perf_counter()
+        bench.hass.states.async_set(tag_sensor, first)
+        await bench.hass.async_block_till_done()
+        seeks = [
+            record
+            for record in bench.music_assistant.calls[calls_before:]
+            if record.service == "media_seek"
+        ]
+        if seeks:
+            resumed += 1
+            samples.append(seeks[0].called_at - published_at)
+        await bench.async_tap(TAG_REMOVED)
+    return {"rounds": rounds, "resumed": resumed, "latency": samples}
+
+
+async def async_measure_option_changes(bench: JukeboxBench, rounds: int) -> Dict[str, object]:
+    """Swap a box's player in place with a tap in flight each time.
+
+    Every tap must reach the player that was configured when it was
+    handled, without losing the tap.
+    """
+    jukebox, entry = bench.jukeboxes[0], bench.entries[0]
+    players = [entry.data[CONF_MEDIA_PLAYER], f"{entry.data[CONF_MEDIA_PLAYER]}_alt"]
+    bench.hass.states.async_set(players[1], STATE_IDLE)
+    tag_sensor = entry.data[CONF_TAG_SENSOR]
+    samples, served, misrouted = [], 0, 0
+    for index in range(rounds):
+        player = players[(index + 1) % 2]
+        waiter = bench.music_assistant.expect_call()
+        bench.hass.states.async_set(tag_sensor, synthetic_tag(index % bench.tag_count))
+        entry.update_options(**{CONF_MEDIA_PLAYER: player})
+        started = time.perf_counter()
+        jukebox.async_apply_options()
+        samples.append(time.perf_counter() - started)
+        try:
+            record = await asyncio.wait_for(waiter, 5.0)
+        except asyncio.TimeoutError:
+            continue
+        served += 1
+        if record.data["entity_id"] not in players:
+            misrouted += 1
+        # The swapped-in player may not be playing, so the removal need not pause.
+        bench.hass.states.async_set(tag_sensor, TAG_REMOVED)
+        await bench.hass.async_block_till_done()
+    return {"rounds": rounds, "served": served, "misrouted": misrouted, "apply": samples}
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Return p50/p95/p99 in milliseconds for each sample set."""
+    summary = {}
+    for kind, values in samples.items():
+        summary[kind] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return summary
+
+
+async def async_main(args) -> Dict[str, object]:
+    """Run the benchmark and return the report."""
+    # The latency runs measure the raw hot path, so the debounce windows are
+    # disabled there; the flap run uses the configured windows.
+    bench = JukeboxBench(
+        tags=args.tags,
+        service_latency=args.service_latency / 1000,
+        options={CONF_REMOVAL_GRACE: 0, CONF_PRESENCE_CONFIRM: 0},
+    )
+    await bench.async_start(args.boxes)
+    try:
+        samples = await async_measure_taps(bench, args.iterations)
+        ui_writes = bench.ui.writes
+        samples["all"] = [value for values in samples.values() for value in values]
+        scan_events = await async_measure_scan_events(bench, args.iterations)
+        burst = await async_measure_bursts(bench, args.bursts, args.burst_size)
+        switches = await async_measure_switches(bench, args.switches)
+        option_changes = await async_measure_option_changes(bench, args.option_changes)
+    finally:
+        await bench.async_stop()
+
+    bench = JukeboxBench(
+        tags=args.tags,
+        service_latency=args.service_latency / 1000,
+        options={CONF_REMOVAL_GRACE: args.removal_grace},
+    )
+    await bench.async_start()
+    try:
+        flaps = await async_measure_flaps(bench, args.flaps)
+    finally:
+        await bench.async_stop()
+
+    cold_starts = {}
+    for label, warmup in (("cold", False), ("warm_up", True)):
+        bench = JukeboxBench(
+            tags=args.tags,
+            service_latency=args.service_latency / 1000,
+            options={CONF_REMOVAL_GRACE: 0, CONF_PRESENCE_CONFIRM: 0, CONF_WARMUP: warmup},
+            cold_start=args.cold_start / 1000,
+        )
+        await bench.async_start()
+        try:
+            cold_starts[label] = await async_measure_cold_starts(bench, args.cold_starts)
+        finally:
+            await bench.async_stop()
+    return {
+        "latency": summarize(samples),
+        "scan_events": {
+            **summarize(scan_events["latency"]),
+            "service_calls": scan_events["service_calls"],
+            "duplicates": scan_events["duplicates"],
+        },
+        "burst": burst,
+        "ui_writes": {"taps": args.iterations * 2, "writes": ui_writes},
+        "flaps": flaps,
+        "cold_start": summarize(cold_starts),
+        "option_changes": {
+            "rounds": option_changes["rounds"],
+            "served": option_changes["served"],
+            "misrouted": option_changes["misrouted"],
+            **summarize({"apply": option_changes["apply"]})["apply"],
+        },
+        "switches": {
+            "rounds": switches["rounds"],
+            "resumed": switches["resumed"],
+            **summarize({"resume": switches["latency"]})["resume"],
+        },
+    }
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="start/pause/resume cycles")
+    parser.add_argument("--tags", type=int, default=100, help="number of mapped tags")
+    parser.add_argument("--bursts", type=int, default=20, help="number of event bursts")
+    parser.add_argument("--burst-size", type=int, default=50, help="events per burst")
+    parser.add_argument("--boxes", type=int, default=1, help="jukeboxes sharing the core for the latency run")
+    parser.add_argument("--service-latency", type=float, default=0.0, help="stub service latency in ms")
+    parser.add_argument("--flaps", type=int, default=100, help="remove/present flaps of a playing tag")
+    parser.add_argument("--removal-grace", type=float, default=1.0, help="removal grace window for the flap run in s")
+    parser.add_argument("--switches", type=int, default=50, help="card swaps for the resume run")
+    parser.add_argument("--option-changes", type=int, default=50, help="in-place player swaps with a tap in flight")
+    parser.add_argument("--cold-starts", type=int, default=20, help="player power-on rounds per warm-up setting")
+    parser.add_argument("--cold-start", type=float, default=300.0, help="stub player wake-up time in ms")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    changes = report["option_changes"]
+    lost = changes["rounds"] - changes["served"] + changes["misrouted"]
+    if args.json:
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if lost else 0)
+
+    print(f"{'kind':<8} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, stats in report["latency"].items():
+        print(
+            f"{kind:<8} {stats['count']:>6} {stats['p50_ms']:>9.3f} "
+            f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}"
+        )
+    scan_events = report["scan_events"]
+    for label in ("event", "dual"):
+        stats = scan_events[label]
+        print(
+            f"{label:<8} {stats['count']:>6} {stats['p50_ms']:>9.3f} "
+            f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}"
+        )
+    print(
+        f"scan events: {scan_events['service_calls']} service calls, "
+        f"{scan_events['duplicates']} duplicate sensor reports dropped"
+    )
+    burst = report["burst"]
+    print(
+        f"\nburst: {burst['events']} events, {burst['service_calls']} service calls "
+        f"and {burst['ui_writes']} mapping UI writes in {burst['seconds']:.3f}s "
+        f"({burst['events_per_second']:.0f} events/s)"
+    )
+    ui_writes = report["ui_writes"]
+    print(
+        f"mapping UI: {ui_writes['writes']} state writes for {ui_writes['taps']} taps "
+        f"({ui_writes['writes'] / ui_writes['taps']:.2f} per tap)"
+    )
+    flaps = report["flaps"]
+    print(
+        f"flaps: {flaps['flaps']} flaps, {flaps['service_calls']} service calls, "
+        f"{flaps['flaps_absorbed']} absorbed"
+    )
+    switches = report["switches"]
+    print(
+        f"switches: {switches['resumed']}/{switches['rounds']} returning cards resumed, "
+        f"p50 {switches['p50_ms']:.3f} ms, p95 {switches['p95_ms']:.3f} ms to seek"
+    )
+    print(
+        f"options: {changes['served']}/{changes['rounds']} taps served across in-place player swaps "
+        f"({changes['misrouted']} misrouted), p50 {changes['p50_ms']:.3f} ms, "
+        f"p95 {changes['p95_ms']:.3f} ms to apply"
+    )
+    print("\ntap to playing after power-off:")
+    for label, stats in report["cold_start"].items():
+        print(f"{label:<8} {stats['count']:>6} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+
+
+    if lost:
+        print(f"FAILED: {lost} taps lost or misrouted across player swaps")
+    sys.exit(1 if lost else 0)
+
+
+if __name__ == "__main__":
+    main()
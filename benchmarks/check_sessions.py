@@ -0,0 +1,277 @@
+"""Randomized replay checker for the RFID Jukebox tag session state machine.
+
+Replays random high-rate streams of card placements, lifts, swaps, flaps
+shorter than the removal grace, remaps, players stopping on their own and
+Music Assistant outages against a stand-in with random latency and
+failures. Commands failed by an outage are retried with the backoff
+shortened to milliseconds; random failures are given up at once. Once a stream has settled, checks that:
+
+- the session never took a transition outside its table;
+- no playback command is left queued, in flight or waiting for a retry;
+- the session is not stuck starting or in the grace window;
+- unless the last player call failed, the player matches the reader: a
+  mapped card on the reader plays its own media, anything else leaves the
+  player not playing.
+
+    python benchmarks/check_sessions.py --runs 200 --events 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from typing import Dict, List, Optional
+
+from harness import MA_FILESYSTEM, MEDIA_PLAYER, TAG_REMOVED, JukeboxBench, synthetic_tag
+from homeassistant.const import STATE_PLAYING
+
+from custom_components.rfid_jukebox.const import (
+    CONF_PRESENCE_CONFIRM,
+    CONF_REMOVAL_GRACE,
+    CONF_TAG_SENSOR,
+    EVENT_TAG_SCANNED,
+)
+from custom_components.rfid_jukebox.session import (
+    STATE_IDLE,
+    STATE_PAUSED,
+    STATE_REMOVED_GRACE,
+    STATE_STARTING,
+)
+
+MAPPED_TAGS = 4
+CHANNELS = ("sensor", "event", "both")
+ACTIONS = ("place", "lift", "swap", "flap", "remap", "player_stops", "outage", "wait")
+WEIGHTS = (6, 5, 4, 3, 1, 1, 1, 2)
+
+
+def media_ids(names: List[str]) -> List[str]:
+    """Return the media ID prefixes the mapped names can be played under."""
+    ids = []
+    for name in names:
+        ids.append(f"{MA_FILESYSTEM}://folder/{name}")
+        ids.append(name)
+        ids.append(f"library://playlist/{abs(hash(name))}")
+    return ids
+
+
+class Replay:
+    """One random event stream against one jukebox."""
+
+    def __init__(self, args, seed: int):
+        """Initialize the replay."""
+        self.args = args
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.channel = self.rng.choice(CHANNELS)
+        self.tags = [synthetic_tag(index) for index in range(MAPPED_TAGS)]
+        self.unmapped = synthetic_tag(MAPPED_TAGS + 1000)
+        self.names: Dict[str, List[str]] = {
+            tag: [f"bench/{'folder' if index % 2 else 'playlist'}/{index}"]
+            for index, tag in enumerate(self.tags)
+        }
+        self.on_reader: Optional[str] = None
+        self.stopped = False
+        self.remaps = 0
+        self.bench = JukeboxBench(
+            tags=MAPPED_TAGS,
+            options={CONF_REMOVAL_GRACE: args.grace / 1000, CONF_PRESENCE_CONFIRM: 0},
+        )
+
+    async def async_run(self) -> List[str]:
+        """Play the stream, let it settle and return the violations found."""
+        bench = self.bench
+        await bench.async_start()
+        music_assistant = bench.music_assistant
+        music_assistant.rng = random.Random(self.seed)
+        music_assistant.failure_rate = self.args.failures
+        playback = bench.jukeboxes[0].playback
+        playback.retry_delay = self.args.retry / 1000
+        playback.retry_max_delay = self.args.retry * 8 / 1000
+        try:
+            for _ in range(self.args.events):
+                music_assistant.latency = self.rng.uniform(0, self.args.latency / 1000)
+                await self._async_step(self.rng.choices(ACTIONS, WEIGHTS)[0])
+                await asyncio.sleep(self.rng.uniform(0, self.args.gap / 1000))
+            music_assistant.failure_rate = 0.0
+            music_assistant.outage = False
+            await self._async_settle()
+            return self._check()
+        finally:
+            await bench.async_stop()
+
+    async def _async_step(self, action: str) -> None:
+        on_reader = self.on_reader
+        if action == "place" and on_reader is None:
+            self._publish(self.rng.choice(self.tags + [self.unmapped]))
+        elif action == "lift" and on_reader:
+            self._publish(None)
+        elif action == "swap" and on_reader:
+            self._publish(None)
+            self._publish(self.rng.choice([tag for tag in self.tags + [self.unmapped] if tag != on_reader]))
+        elif action == "flap" and on_reader:
+            # Back within the grace window, so a stopped player stays stopped.
+            stopped = self.stopped
+            self._publish(None)
+            await asyncio.sleep(self.rng.uniform(0, self.args.grace / 2000))
+            self._publish(on_reader)
+            self.stopped = stopped
+        elif action == "remap":
+            tag = self.rng.choice(self.tags)
+            self.remaps += 1
+            name = f"bench/folder/remap{self.remaps}"
+            self.names[tag].append(name)
+            jukebox = self.bench.jukeboxes[0]
+            self.bench.hass.async_create_task(
+                jukebox.coordinator.async_map_tag(tag, "folder", name, None, jukebox)
+            )
+        elif action == "player_stops":
+            jukebox = self.bench.jukeboxes[0]
+            # Only once the player is settled; a command in flight would
+            # overwrite it, and a card inside the grace window is neither on
+            # nor off the reader.
+            if (
+                jukebox.playback.intent is None
+                and jukebox.session.state != STATE_STARTING
+                and not jukebox.debouncer.removal_pending
+            ):
+                self.bench.hass.states.async_set(MEDIA_PLAYER, "idle")
+                if on_reader:
+                    self.stopped = True
+        elif action == "outage":
+            # Short enough for the commands sent meanwhile to be retried, not dropped.
+            music_assistant = self.bench.music_assistant
+            music_assistant.outage = True
+            await asyncio.sleep(self.rng.uniform(0, self.args.retry * 4 / 1000))
+            music_assistant.outage = False
+        elif action == "wait":
+            await asyncio.sleep(self.rng.uniform(0, self.args.grace * 2 / 1000))
+
+    def _publish(self, tag: Optional[str]) -> None:
+        """Report a card on or off the reader through the run's channel."""
+        hass = self.bench.hass
+        if tag is not None and tag != self.on_reader:
+            self.stopped = False
+        self.on_reader = tag
+        if self.channel in ("event", "both"):
+            hass.bus.async_fire(
+                EVENT_TAG_SCANNED, {"uid": tag or "", "present": "true" if tag else "false"}
+            )
+        if self.channel in ("sensor", "both"):
+            hass.states.async_set(self.bench.entries[0].data[CONF_TAG_SENSOR], tag or TAG_REMOVED)
+
+    async def _async_settle(self) -> None:
+        """Wait for the grace window, the commands and the background tasks."""
+        hass = self.bench.hass
+        jukebox = self.bench.jukeboxes[0]
+        for _ in range(20):
+            await asyncio.sleep(
+                self.args.grace / 1000 + self.args.latency * 3 / 1000 + self.args.retry * 8 / 1000 + 0.01
+            )
+            await hass.async_block_till_done()
+            if jukebox.playback.intent is None and not jukebox.debouncer.removal_pending:
+                return
+
+    def _check(self) -> List[str]:
+        jukebox = self.bench.jukeboxes[0]
+        session = jukebox.session
+        player = self.bench.hass.states.get(MEDIA_PLAYER).state
+        problems = []
+        if session.invalid:
+            problems.append(f"{session.invalid} invalid transitions")
+        if jukebox.playback.intent is not None:
+            problems.append(f"{jukebox.playback.intent} command still pending")
+        if session.state in (STATE_STARTING, STATE_REMOVED_GRACE):
+            problems.append(f"session stuck in {session.state}")
+        if self.bench.music_assistant.last_failed:
+            return problems
+
+        on_reader = self.on_reader
+        if on_reader in self.names and not self.stopped:
+            if session.tag_id != on_reader or session.state != STATE_PLAYING:
+                problems.append(f"card {on_reader} on the reader, session {session.state} on {session.tag_id}")
+            if player != STATE_PLAYING:
+                problems.append(f"card {on_reader} on the reader, player {player}")
+            played = [
+                call for call in self.bench.music_assistant.calls
+                if call.service == "play_media" and call.data.get("enqueue") != "add"
+            ]
+            media_id = played[-1].data["media_id"] if played else None
+            if isinstance(media_id, list):
+                media_id = media_id[0]
+            if not any(str(media_id).startswith(prefix) for prefix in media_ids(self.names[on_reader])):
+                problems.append(f"card {on_reader} on the reader, player plays {media_id}")
+        else:
+            if player == STATE_PLAYING:
+                problems.append(f"reader shows {on_reader}, player still playing")
+            if on_reader is None and session.state not in (STATE_PAUSED, STATE_IDLE):
+                problems.append(f"no card on the reader, session {session.state}")
+        return problems
+
+    def stats(self) -> Dict[str, int]:
+        """Return the session counters of the run."""
+        session = self.bench.jukeboxes[0].session
+        return {"transitions": session.transitions, "ignored": session.ignored}
+
+
+async def async_main(args) -> Dict[str, object]:
+    """Run every replay and return the report."""
+    failures = []
+    transitions = ignored = skipped = 0
+    for run in range(args.runs):
+        seed = args.seed + run
+        replay = Replay(args, seed)
+        problems = await replay.async_run()
+        stats = replay.stats()
+        transitions += stats["transitions"]
+        ignored += stats["ignored"]
+        skipped += replay.bench.music_assistant.last_failed
+        if problems:
+            failures.append(
+                {
+                    "seed": seed,
+                    "channel": replay.channel,
+                    "problems": problems,
+                    "history": replay.bench.jukeboxes[0].session.diagnostics()["history"][-10:],
+                }
+            )
+    return {
+        "runs": args.runs,
+        "events": args.runs * args.events,
+        "transitions": transitions,
+        "ignored_events": ignored,
+        "player_checks_skipped": skipped,
+        "failures": failures,
+    }
+
+
+def main() -> None:
+    """Parse arguments, run the replays and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50, help="random streams to replay")
+    parser.add_argument("--events", type=int, default=200, help="events per stream")
+    parser.add_argument("--gap", type=float, default=3.0, help="longest pause between events in ms")
+    parser.add_argument("--latency", type=float, default=10.0, help="longest service latency in ms")
+    parser.add_argument("--grace", type=float, default=20.0, help="removal grace window in ms")
+    parser.add_argument("--failures", type=float, default=0.05, help="share of failing service calls")
+    parser.add_argument("--retry", type=float, default=5.0, help="first retry delay in ms")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first stream")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(async_main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"{report['runs']} streams, {report['events']} events, {report['transitions']} transitions, "
+            f"{report['ignored_events']} stale events ignored, "
+            f"{report['player_checks_skipped']} player checks skipped after a failed call"
+        )
+        for failure in report["failures"]:
+            print(f"seed {failure['seed']} ({failure['channel']}): {'; '.join(failure['problems'])}")
+        print("OK" if not report["failures"] else f"{len(report['failures'])} streams FAILED")
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+"""Local stand-in Home Assistant core for RFID Jukebox benchmarks.
+
+The harness boots a bare ``HomeAssistant`` instance in a temporary config
+directory, replaces the Music Assistant and media player services with
+stubs that record when they are called, and wires up an ``RFIDJukebox``
+exactly like ``async_setup_entry`` does.  Requires ``homeassistant`` to be
+installed in the current environment.
+"""
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import yaml  # noqa: E402
+from homeassistant.config_entries import ConfigEntries  # noqa: E402
+from homeassistant.const import STATE_IDLE, STATE_OFF, STATE_PAUSED, STATE_PLAYING  # noqa: E402
+from homeassistant.core import CoreState, HomeAssistant, ServiceCall, SupportsResponse  # noqa: E402
+from homeassistant.exceptions import HomeAssistantError, ServiceNotFound  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+
+from custom_components.rfid_jukebox import RFIDJukebox  # noqa: E402
+from custom_components.rfid_jukebox.select import MediaTypeSelect  # noqa: E402
+from custom_components.rfid_jukebox.text import AliasText, MediaNameText  # noqa: E402
+from custom_components.rfid_jukebox.const import (  # noqa: E402
+    CONF_MA_FILESYSTEM,
+    CONF_MEDIA_PLAYER,
+    CONF_TAG_SENSOR,
+    DATA_COORDINATOR,
+    DEFAULT_MAPPING_FILE_PATH,
+    EVENT_TAG_SCANNED,
+)
+from custom_components.rfid_jukebox.resolver import folder_media_id  # noqa: E402
+
+TAG_SENSOR = "sensor.bench_rfid_tag"
+MEDIA_PLAYER = "media_player.bench_jukebox"
+MA_FILESYSTEM = "filesystem_local--bench"
+TAG_REMOVED = "Unknown"
+
+
+def synthetic_tag(index: int) -> str:
+    """Return a PN532-style UID for the given index."""
+    raw = index.to_bytes(4, "big")
+    return "-".join(f"{byte:02X}" for byte in raw)
+
+
+def write_mapping_file(config_dir: str, count: int) -> Dict[str, Dict[str, str]]:
+    """Write a mapping file with ``count`` synthetic tags and return it."""
+    mappings = {}
+    for index in range(count):
+        media_type = "folder" if index % 2 else "playlist"
+        mappings[synthetic_tag(index)] = {
+            "alias": f"Bench tag {index}",
+            "type": media_type,
+            "name": f"bench/{media_type}/{index}",
+        }
+    with open(os.path.join(config_dir, DEFAULT_MAPPING_FILE_PATH), "w", encoding="utf-8") as f:
+        yaml.dump(mappings, f, default_flow_style=False)
+    return mappings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of ``values``."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BenchConfigEntry:
+    """Minimal stand-in for a config entry."""
+
+    def __init__(self, entry_id: str, data: Dict[str, Any], options: Optional[Dict[str, Any]] = None):
+        """Initialize the entry."""
+        self.entry_id = entry_id
+        self.title = f"RFID Jukebox {entry_id}"
+        self.data = MappingProxyType(dict(data))
+        self.options = MappingProxyType(dict(options or {}))
+        self._on_unload = []
+
+    def update_options(self, **options: Any) -> None:
+        """Change options the way the options flow does, without listeners."""
+        self.options = MappingProxyType({**self.options, **options})
+
+    def async_on_unload(self, func) -> None:
+        """Register a callback to run when the entry is torn down."""
+        self._on_unload.append(func)
+
+    def async_create_background_task(self, hass: HomeAssistant, target, name: str, eager_start: bool = True):
+        """Run a background task tied to the entry."""
+        task = hass.async_create_background_task(target, name)
+        self.async_on_unload(task.cancel)
+        return task
+
+    def async_unload(self) -> None:
+        """Run all registered unload callbacks."""
+        while self._on_unload:
+            self._on_unload.pop()()
+
+
+class UiWriteCounter:
+    """Counts the state writes of the mapping UI entities of all boxes."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        self.writes = 0
+
+    def attach(self, jukebox: RFIDJukebox) -> None:
+        """Give a jukebox mapping UI entities whose writes are counted."""
+        counter = self
+
+        def _count(self) -> None:
+            counter.writes += 1
+
+        for entity_class in (MediaNameText, AliasText, MediaTypeSelect):
+            counting = type(entity_class.__name__, (entity_class,), {"async_write_ha_state": _count})
+            counting(jukebox)
+
+
+class ServiceRecord:
+    """A single stubbed service call; ``index`` counts all calls so far."""
+
+    __slots__ = ("domain", "service", "data", "called_at", "index")
+
+    def __init__(self, domain: str, service: str, data: Dict[str, Any], called_at: float, index: int = 0):
+        """Initialize the record."""
+        self.domain = domain
+        self.service = service
+        self.data = data
+        self.called_at = called_at
+        self.index = index
+
+
+class BrowsedMedia:
+    """Minimal stand-in for a browsed media item."""
+
+    def __init__(self, media_content_id: str, can_play: bool, can_expand: bool, children=None):
+        """Initialize the item."""
+        self.media_content_id = media_content_id
+        self.can_play = can_play
+        self.can_expand = can_expand
+        self.children = children
+
+
+class FakePlayerEntity:
+    """A player entity that lists folders the way Music Assistant does.
+
+    Every folder a mapping names exists; a folder lists the mapped folders
+    right below it and its own tracks.
+    """
+
+    def __init__(self, music_assistant: "FakeMusicAssistant"):
+        """Initialize the entity."""
+        self._music_assistant = music_assistant
+
+    async def async_browse_media(self, media_content_type=None, media_content_id=None) -> BrowsedMedia:
+        """Return the subfolders and tracks of a folder after the simulated folder walk."""
+        music_assistant = self._music_assistant
+        music_assistant.browses += 1
+        await music_assistant.async_walk_folder()
+        parent = media_content_id.rstrip("/")
+        coordinator = music_assistant.hass.data.get(DATA_COORDINATOR)
+        folders = {
+            folder_media_id(MA_FILESYSTEM, mapping.name).rstrip("/")
+            for mapping in (coordinator.mappings.values() if coordinator else ())
+            if mapping.is_folder
+        }
+        return BrowsedMedia(
+            media_content_id,
+            True,
+            True,
+            [
+                *(BrowsedMedia(folder, True, True) for folder in sorted(folders) if folder.rpartition("/")[0] == parent),
+                *(
+                    BrowsedMedia(f"{media_content_id}/track{index:03d}.mp3", True, False)
+                    for index in range(music_assistant.folder_tracks)
+                ),
+            ],
+        )
+
+
+class FakePlayerComponent:
+    """Stand-in for the media player entity component."""
+
+    def __init__(self, entity: FakePlayerEntity):
+        """Initialize the component."""
+        self._entity = entity
+
+    def get_entity(self, entity_id: str) -> FakePlayerEntity:
+        """Return the fake entity for any player."""
+        return self._entity
+
+
+class FakeMusicAssistant:
+    """Stubbed Music Assistant and media player services.
+
+    ``cold_start`` is the extra time a player that is off needs before it
+    plays, paid either by the first ``play_media`` or by ``turn_on``.
+    Every call takes ``latency`` plus up to ``jitter`` seconds.
+    Playing or browsing a folder walks ``folder_tracks`` tracks at
+    ``folder_walk`` seconds each. Playback calls fail with a probability
+    of ``failure_rate``. While ``outage`` is set, every one of them fails
+    as if Music Assistant were not loaded; ``last_failed`` tells whether
+    the latest one did.
+    ``misordered`` counts calls that changed a player after a later call
+    to the same player already had. ``join`` groups players the way Music
+    Assistant does: media played on the leader plays on every member, each
+    one its ``member_latency`` after the leader. ``member_latency`` also adds
+    a per-player delay to the calls addressing it.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        latency: float = 0.0,
+        cold_start: float = 0.0,
+        folder_tracks: int = 0,
+        folder_walk: float = 0.0,
+    ):
+        """Initialize the stubs."""
+        self.hass = hass
+        self.latency = latency
+        self.cold_start = cold_start
+        self.folder_tracks = folder_tracks
+        self.folder_walk = folder_walk
+        self.browses = 0
+        self.jitter = 0.0
+        self.member_latency: Dict[str, float] = {}
+        self.failure_rate = 0.0
+        self.outage = False
+        self.last_failed = False
+        self.recorded = 0
+        self.misordered = 0
+        self._applied: Dict[str, int] = {}
+        self.rng = random.Random(0)
+        self.calls: List[ServiceRecord] = []
+        self._waiters: List[asyncio.Future] = []
+        self._played: List[asyncio.Future] = []
+
+    def register(self) -> None:
+        """Register the stub services and the browsable player with the stand-in core."""
+        self.hass.data["media_player"] = FakePlayerComponent(FakePlayerEntity(self))
+        self.hass.services.async_register("music_assistant", "play_media", self._async_play_media)
+        self.hass.services.async_register(
+            "music_assistant", "search", self._async_search, supports_response=SupportsResponse.ONLY
+        )
+        self.hass.services.async_register("media_player", "media_play", self._async_media_play)
+        self.hass.services.async_register("media_player", "media_pause", self._async_media_pause)
+        self.hass.services.async_register("media_player", "turn_on", self._async_turn_on)
+        self.hass.services.async_register("media_player", "media_seek", self._async_media_seek)
+        self.hass.services.async_register("media_player", "join", self._async_join)
+        self.hass.services.async_register("media_player", "unjoin", self._async_unjoin)
+
+    def expect_call(self) -> asyncio.Future:
+        """Return a future resolved with the next recorded service call."""
+        waiter = self.hass.loop.create_future()
+        self._waiters.append(waiter)
+        return waiter
+
+    def expect_played(self) -> asyncio.Future:
+        """Return a future resolved when the next ``play_media`` call finishes."""
+        waiter = self.hass.loop.create_future()
+        self._played.append(waiter)
+        return waiter
+
+    async def async_walk_folder(self) -> None:
+        """Simulate Music Assistant walking a folder on the filesystem provider."""
+        if self.folder_walk and self.folder_tracks:
+            await asyncio.sleep(self.folder_walk * self.folder_tracks)
+
+    def _record(self, call: ServiceCall) -> ServiceRecord:
+        self.recorded += 1
+        record = ServiceRecord(call.domain, call.service, dict(call.data), time.perf_counter(), self.recorded)
+        self.calls.append(record)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(record)
+        return record
+
+    async def _async_delay(self, call: Optional[ServiceCall] = None) -> None:
+        """Wait the service latency, plus up to ``jitter`` seconds and the slowest member's delay."""
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if call is not None and self.member_latency:
+            entity_ids = call.data.get("entity_id")
+            if isinstance(entity_ids, str):
+                entity_ids = [entity_ids]
+            delay += max((self.member_latency.get(entity_id, 0.0) for entity_id in entity_ids or []), default=0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _maybe_fail(self, call: ServiceCall) -> None:
+        if self.outage:
+            self.last_failed = True
+            raise ServiceNotFound(call.domain, call.service)
+        self.last_failed = bool(self.failure_rate) and self.rng.random() < self.failure_rate
+        if self.last_failed:
+            raise HomeAssistantError("Simulated Music Assistant failure")
+
+    def _set_player_state(
+        self, call: ServiceCall, state: str, record: Optional[ServiceRecord] = None, **attributes: Any
+    ) -> None:
+        entity_ids = call.data.get("entity_id")
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for entity_id in entity_ids or []:
+            if record is not None:
+                if record.index < self._applied.get(entity_id, 0):
+                    self.misordered += 1
+                self._applied[entity_id] = max(record.index, self._applied.get(entity_id, 0))
+            current = self.hass.states.get(entity_id)
+            merged = dict(current.attributes) if current else {}
+            merged.update(attributes)
+            self.hass.states.async_set(entity_id, state, merged)
+
+    async def _async_wake(self, call: ServiceCall) -> None:
+        entity_ids = call.data.get("entity_id")
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        if self.cold_start and any(
+            (state := self.hass.states.get(entity_id)) and state.state == STATE_OFF
+            for entity_id in entity_ids or []
+        ):
+            await asyncio.sleep(self.cold_start)
+
+    async def _async_play_media(self, call: ServiceCall) -> None:
+        record = self._record(call)
+        await self._async_wake(call)
+        await self._async_delay(call)
+        if call.data.get("media_type") == "folder":
+            await self.async_walk_folder()
+        if call.data.get("enqueue") == "add":
+            # Adding to the queue leaves the player as it is.
+            return
+        self._maybe_fail(call)
+        media_id = call.data["media_id"]
+        if isinstance(media_id, list):
+            media_id = media_id[0]
+        # Pretend the player is a few minutes into the first track.
+        self._set_player_state(
+            call,
+            STATE_PLAYING,
+            record,
+            media_content_id=media_id,
+            media_position=180,
+            media_position_updated_at=dt_util.utcnow(),
+        )
+        leader = self.hass.states.get(call.data["entity_id"])
+        for member in (leader.attributes.get("group_members") or [])[1:]:
+            self.hass.loop.call_later(
+                self.member_latency.get(member, 0.0), self._member_playing, member, media_id
+            )
+        played, self._played = self._played, []
+        for waiter in played:
+            if not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+    def _member_playing(self, member: str, media_id: str) -> None:
+        self.hass.states.async_set(
+            member, STATE_PLAYING, {**self.hass.states.get(member).attributes, "media_content_id": media_id}
+        )
+
+    async def _async_media_seek(self, call: ServiceCall) -> None:
+        record = self._record(call)
+        await self._async_delay(call)
+        self._set_player_state(
+            call,
+            STATE_PLAYING,
+            record,
+            media_position=call.data["seek_position"],
+            media_position_updated_at=dt_util.utcnow(),
+        )
+
+    async def _async_join(self, call: ServiceCall) -> None:
+        self._record(call)
+        await self._async_delay(call)
+        self._maybe_fail(call)
+        leader = call.data["entity_id"]
+        members = [member for member in call.data["group_members"] if member != leader]
+        self._set_player_state(call, self.hass.states.get(leader).state, group_members=[leader, *members])
+
+    async def _async_unjoin(self, call: ServiceCall) -> None:
+        self._record(call)
+        await self._async_delay(call)
+        entity_ids = call.data["entity_id"]
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for state in self.hass.states.async_all("media_player"):
+            group = state.attributes.get("group_members")
+            if group and any(entity_id in group[1:] for entity_id in entity_ids):
+                remaining = [member for member in group if member not in entity_ids]
+                self.hass.states.async_set(state.entity_id, state.state, {**state.attributes, "group_members": remaining})
+        self._set_player_state(call, STATE_IDLE)
+
+    async def _async_turn_on(self, call: ServiceCall) -> None:
+        await self._async_wake(call)
+        self._set_player_state(call, STATE_IDLE)
+
+    async def _async_search(self, call: ServiceCall) -> Dict[str, Any]:
+        await self._async_delay()
+        name = call.data["name"]
+        return {"playlists": [{"name": name, "uri": f"library://playlist/{abs(hash(name))}"}]}
+
+    async def _async_media_play(self, call: ServiceCall) -> None:
+        record = self._record(call)
+        await self._async_delay(call)
+        self._maybe_fail(call)
+        self._set_player_state(call, STATE_PLAYING, record)
+
+    async def _async_media_pause(self, call: ServiceCall) -> None:
+        record = self._record(call)
+        await self._async_delay(call)
+        self._maybe_fail(call)
+        self._set_player_state(call, STATE_PAUSED, record)
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Create a bare, running Home Assistant core."""
+    try:
+        hass = HomeAssistant(config_dir)
+    except TypeError:  # Cores before 2024.2 take no arguments.
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+    hass.config_entries = ConfigEntries(hass, {})
+    await er.async_load(hass)
+    if hasattr(hass, "set_state"):
+        hass.set_state(CoreState.running)
+    else:
+        hass.state = CoreState.running
+    return hass
+
+
+class JukeboxBench:
+    """A stand-in core running one or more jukeboxes against fake services."""
+
+    def __init__(
+        self,
+        tags: int = 100,
+        service_latency: float = 0.0,
+        options: Optional[Dict[str, Any]] = None,
+        cold_start: float = 0.0,
+        folder_tracks: int = 0,
+        folder_walk: float = 0.0,
+    ):
+        """Initialize the bench."""
+        self.tag_count = tags
+        self.service_latency = service_latency
+        self.cold_start = cold_start
+        self.folder_tracks = folder_tracks
+        self.folder_walk = folder_walk
+        self.options = dict(options or {})
+        self.hass: Optional[HomeAssistant] = None
+        self.music_assistant: Optional[FakeMusicAssistant] = None
+        self.jukeboxes: List[RFIDJukebox] = []
+        self.ui = UiWriteCounter()
+        self.entries: List[BenchConfigEntry] = []
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+
+    async def async_start(self, boxes: int = 1) -> None:
+        """Boot the core, register the stubs and set up the jukeboxes."""
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="rfid_jukebox_bench_")
+        write_mapping_file(self._tmpdir.name, self.tag_count)
+        self.hass = await async_create_hass(self._tmpdir.name)
+        self.music_assistant = FakeMusicAssistant(
+            self.hass, self.service_latency, self.cold_start, self.folder_tracks, self.folder_walk
+        )
+        self.music_assistant.register()
+        for index in range(boxes):
+            await self.async_add_box(index)
+
+    async def async_add_box(self, index: int) -> RFIDJukebox:
+        """Set up one more jukebox with its own tag sensor and player."""
+        suffix = f"_{index}" if index else ""
+        tag_sensor = f"{TAG_SENSOR}{suffix}"
+        media_player = f"{MEDIA_PLAYER}{suffix}"
+        self.hass.states.async_set(tag_sensor, TAG_REMOVED)
+        self.hass.states.async_set(media_player, STATE_IDLE)
+        entry = BenchConfigEntry(
+            f"bench{index}",
+            {
+                CONF_TAG_SENSOR: tag_sensor,
+                CONF_MEDIA_PLAYER: media_player,
+                CONF_MA_FILESYSTEM: MA_FILESYSTEM,
+            },
+            self.options,
+        )
+        jukebox = RFIDJukebox(self.hass, entry)
+        await jukebox.async_setup()
+        self.ui.attach(jukebox)
+        self.entries.append(entry)
+        self.jukeboxes.append(jukebox)
+        return jukebox
+
+    async def async_stop(self) -> None:
+        """Tear everything down."""
+        for entry in self.entries:
+            entry.async_unload()
+        await self.hass.async_block_till_done()
+        await self.hass.async_stop(force=True)
+        self._tmpdir.cleanup()
+
+    async def async_scan_event(
+        self, uid: str, present: bool, sensor: bool = False, timeout: float = 5.0
+    ) -> Tuple[float, ServiceRecord]:
+        """Fire a tag scan event and wait for the service call it causes.
+
+        With ``sensor``, the tag sensor of the first box is updated right
+        after, the way the firmware reports a scan on both channels.
+        """
+        waiter = self.music_assistant.expect_call()
+        published_at = time.perf_counter()
+        self.hass.bus.async_fire(EVENT_TAG_SCANNED, {"uid": uid, "present": "true" if present else "false"})
+        if sensor:
+            self.hass.states.async_set(self.entries[0].data[CONF_TAG_SENSOR], uid if present else TAG_REMOVED)
+        record = await asyncio.wait_for(waiter, timeout)
+        await self.hass.async_block_till_done()
+        return record.called_at - published_at, record
+
+    async def async_tap(self, state: str, box: int = 0, timeout: float = 5.0) -> Tuple[float, ServiceRecord]:
+        """Publish a tag state and wait for the service call it causes.
+
+        Returns the event-to-service latency in seconds and the call record.
+        """
+        tag_sensor = self.entries[box].data[CONF_TAG_SENSOR]
+        waiter = self.music_assistant.expect_call()
+        published_at = time.perf_counter()
+        self.hass.states.async_set(tag_sensor, state)
+        record = await asyncio.wait_for(waiter, timeout)
+        await self.hass.async_block_till_done()
+        return record.called_at - published_at, record
@@ -1,31 +1,101 @@
 """The RFID Jukebox integration."""
 import logging
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from homeassistant.core import HomeAssistant, State
+from homeassistant.core import HomeAssistant, State, callback
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers import event
-from homeassistant.const import STATE_IDLE, STATE_OFF, STATE_PAUSED, STATE_PLAYING
+from homeassistant.helpers.start import async_at_started
+from homeassistant.const import (
+    STATE_IDLE,
+    STATE_OFF,
+    STATE_PAUSED,
+    STATE_PLAYING,
+    STATE_UNAVAILABLE,
+)
 
 
 from .const import (
     DOMAIN,
-    CONF_TAG_SENSOR,
-    CONF_MEDIA_PLAYER,
-    CONF_MA_FILESYSTEM,
-    DEFAULT_MAPPING_FILE_PATH,
+    ATTR_PRESENT,
+    ATTR_UID,
+    CONF_REMOVAL_GRACE,
+    CONF_PRESENCE_CONFIRM,
+    CONF_WARMUP,
+    CONF_WARMUP_TIMES,
+    CONF_RESUME_MAX_TAGS,
+    CONF_RESUME_MAX_AGE,
+    CONF_QUEUE_TAGS,
+    CONF_PLAYBACK_ONLY,
+    CONF_COMMAND_EXPIRY,
+    CONF_TAP_STATISTICS,
+    DEFAULT_REMOVAL_GRACE,
+    DEFAULT_PRESENCE_CONFIRM,
+    DEFAULT_RESOLVER_CACHE_SIZE,
+    DEFAULT_RESOLVER_TTL,
+    DEFAULT_WARMUP,
+    DEFAULT_WARMUP_TAGS,
+    DEFAULT_WARMUP_HISTORY,
+    DEFAULT_WARMUP_COOLDOWN,
+    DEFAULT_RESUME_MAX_TAGS,
+    DEFAULT_RESUME_MAX_AGE,
+    DEFAULT_TIMING_SAMPLES,
+    DEFAULT_TAG_DEDUPE_WINDOW,
+    DEFAULT_QUEUE_TAGS,
+    DEFAULT_QUEUE_REFRESH_INTERVAL,
+    DEFAULT_PLAYBACK_ONLY,
+    DEFAULT_COMMAND_EXPIRY,
+    DEFAULT_TAP_STATISTICS,
+    DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    DEFAULT_ANALYTICS_RETENTION,
+    MEDIA_TYPE_FOLDER,
+)
+from .coordinator import async_get_coordinator
+from .debounce import TagDebouncer
+from .models import TagMapping, normalize_tag_id
+from .resolver import MediaResolver
+from .resume import MAX_LISTING, MIN_RESUME_POSITION, ResumePoint, ResumeStore
+from .session import STATE_REMOVED_GRACE, TagSession
+from .timing import GroupTimings, TapTimings, TapTrace
+from .playback import (
+    KIND_PAUSE,
+    KIND_RESUME,
+    KIND_START,
+    PlaybackCommand,
+    PlaybackPlan,
+    PlaybackQueue,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["text", "button", "select", "sensor"]
+# The mapping UI, left out on playback-only boxes.
+MAPPING_PLATFORMS = ("text", "button", "select")
+
+# Channels a tag scan can arrive on.
+SOURCE_SENSOR = "sensor"
+SOURCE_EVENT = "event"
+
+# Unique ID suffixes of the per-entry entities, formerly used with the
+# domain as prefix, which only allowed a single box.
+_ENTITY_KEYS = ("media_name_to_map", "alias", "media_type", "map_tag_button", "flaps_absorbed")
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up RFID Jukebox from a config entry."""
     hass.data.setdefault(DOMAIN, {})
+    await er.async_migrate_entries(hass, entry.entry_id, _async_migrate_unique_id)
     jukebox = RFIDJukebox(hass, entry)
     hass.data[DOMAIN][entry.entry_id] = jukebox
 
     await jukebox.async_setup()
 
-    await hass.config_entries.async_forward_entry_setups(entry, ["text", "button", "select"])
+    await hass.config_entries.async_forward_entry_setups(entry, jukebox.platforms)
 
     entry.async_on_unload(entry.add_update_listener(update_listener))
 
@@ -34,18 +104,56 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(
-        entry, ["text", "button", "select"]
-    )
+    jukebox = hass.data[DOMAIN][entry.entry_id]
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, jukebox.platforms)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the stored resume points and statistics of a removed jukebox."""
+    from .analytics import TapAnalytics
+
+    await ResumeStore(hass, entry.entry_id, 0, 0).async_remove()
+    await TapAnalytics(hass, entry.entry_id, 0).async_remove()
+
+
+@callback
+def _async_migrate_unique_id(entity_entry: er.RegistryEntry):
+    """Move an entity from a domain-wide unique ID to a per-entry one."""
+    for key in _ENTITY_KEYS:
+        if entity_entry.unique_id == f"{DOMAIN}_{key}":
+            return {"new_unique_id": f"{entity_entry.config_entry_id}_{key}"}
+    return None
+
+
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
+    """Apply changed options to the running jukebox."""
+    jukebox = hass.data[DOMAIN][entry.entry_id]
+    config = {**entry.data, **entry.options}
+    if (
+        _platforms(config) != jukebox.platforms
+        or bool(config.get(CONF_TAP_STATISTICS, DEFAULT_TAP_STATISTICS)) != (jukebox.analytics is not None)
+    ):
+        # Adding or dropping the mapping UI or the statistics sensors needs
+        # the platforms set up again.
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    jukebox.async_apply_options()
+
+
+def _platforms(config) -> List[str]:
+    """Return the platforms of a jukebox with the given configuration."""
+    if config.get(CONF_PLAYBACK_ONLY, DEFAULT_PLAYBACK_ONLY):
+        return [platform for platform in PLATFORMS if platform not in MAPPING_PLATFORMS]
+    return PLATFORMS
+
+
+def _media_key(mapping: TagMapping) -> str:
+    """Return the key resume points of a mapping's media are stored under."""
+    return f"{mapping.media_type}/{mapping.name}"
 
 
 class RFIDJukebox:
@@ -55,38 +163,204 @@ class RFIDJukebox:
         """Initialize the RFID Jukebox."""
         self.hass = hass
         self.entry = entry
-        self.config = entry.data
+        self.config = {**entry.data, **entry.options}
+        self.plan = PlaybackPlan.from_config(self.config)
+        self.playback_only = bool(self.config.get(CONF_PLAYBACK_ONLY, DEFAULT_PLAYBACK_ONLY))
+        self.platforms = _platforms(self.config)
+        self.coordinator = None
         self.mappings = {}
         self.last_tag = None
-        self.current_tag = None
+        self.session = TagSession()
         self.text_entity = None
         self.alias_entity = None
         self.media_type_entity = None
+        self.flaps_entity = None
+        self.group_entity = None
+        self.timing_entities = []
+        self._pending_ui = None
+        self._ui_flush = None
+        self.scans = {SOURCE_SENSOR: 0, SOURCE_EVENT: 0, "duplicate": 0}
+        self._last_scan = None
+        self._last_scan_source = None
+        self._last_scan_at = float("-inf")
         self.last_played_playlist_name = None
+        self.setup_stats = {}
+        self.playback = PlaybackQueue(
+            hass,
+            self._async_command_done,
+            self._async_command_failed,
+            expiry=self.config.get(CONF_COMMAND_EXPIRY, DEFAULT_COMMAND_EXPIRY),
+            retry_delay=DEFAULT_RETRY_DELAY,
+            retry_max_delay=DEFAULT_RETRY_MAX_DELAY,
+        )
+        self.timings = TapTimings(DEFAULT_TIMING_SAMPLES)
+        # Players a card grouped with this box's player, and their call times.
+        self.group = ()
+        self.group_timings = GroupTimings(DEFAULT_TIMING_SAMPLES)
+        # The grouped start waiting for its players to play, and their times so far.
+        self._group_start: Optional[Tuple[PlaybackCommand, Dict[str, float]]] = None
+        self._tap_trace = None
+        self._playing_trace = None
+        self.resolver = MediaResolver(
+            hass,
+            self.plan.media_player,
+            self.plan.filesystem,
+            DEFAULT_RESOLVER_CACHE_SIZE,
+            DEFAULT_RESOLVER_TTL,
+        )
+        self.debouncer = TagDebouncer(
+            hass,
+            self.async_tag_present,
+            self.async_tag_removed,
+            removal_grace=self.config.get(CONF_REMOVAL_GRACE, DEFAULT_REMOVAL_GRACE),
+            presence_confirm=self.config.get(CONF_PRESENCE_CONFIRM, DEFAULT_PRESENCE_CONFIRM),
+            on_absorbed=self._async_flap_absorbed,
+        )
+        self.resume = ResumeStore(
+            hass,
+            entry.entry_id,
+            int(self.config.get(CONF_RESUME_MAX_TAGS, DEFAULT_RESUME_MAX_TAGS)),
+            self.config.get(CONF_RESUME_MAX_AGE, DEFAULT_RESUME_MAX_AGE) * 86400,
+        )
+        # Optional features; their modules are only imported when enabled.
+        self.analytics = None
+        if self.config.get(CONF_TAP_STATISTICS, DEFAULT_TAP_STATISTICS):
+            from .analytics import TapAnalytics
+
+            self.analytics = TapAnalytics(hass, entry.entry_id, DEFAULT_ANALYTICS_RETENTION)
+        self._listening = None
+        self.queues = None
+        self._async_set_queue_size(int(self.config.get(CONF_QUEUE_TAGS, DEFAULT_QUEUE_TAGS)))
+        self.warmup = None
+        self._unsub_warmup = None
 
     async def async_setup(self):
         """Set up the jukebox."""
-        from .helpers import load_mappings
+        started = time.perf_counter()
+
+        # The mapping index and the tag sensor listener are shared by all boxes
+        self.coordinator = await async_get_coordinator(self.hass)
+        self.mappings = self.coordinator.mappings
+        self.setup_stats = dict(self.coordinator.store.load_stats)
+        await self.resume.async_load()
+        if self.analytics is not None:
+            await self.analytics.async_load()
+        self.coordinator.async_add_box(self)
+        self.entry.async_on_unload(lambda: self.coordinator.async_remove_box(self))
+
+        self.entry.async_on_unload(self.debouncer.async_cancel)
+        self.entry.async_on_unload(self.playback.async_shutdown)
+        self.entry.async_on_unload(self._async_cancel_ui)
+        if self.analytics is not None:
+            self.entry.async_on_unload(self.analytics.async_shutdown)
+            self.entry.async_on_unload(
+                event.async_track_time_change(
+                    self.hass, self._async_new_day, hour=0, minute=0, second=5
+                )
+            )
 
-        # Load mappings
-        mapping_file = self.hass.config.path(DEFAULT_MAPPING_FILE_PATH)
-        self.mappings = await self.hass.async_add_executor_job(
-            load_mappings, self.hass, mapping_file
-        )
+        self._async_setup_warmup()
+        self.entry.async_on_unload(self._async_stop_warmup)
 
-        # Register state listener
+        # Resolve mappings once Music Assistant is up; the coordinator refreshes them periodically
+        self.entry.async_on_unload(async_at_started(self.hass, self._async_refresh_resolver))
         self.entry.async_on_unload(
-            event.async_track_state_change_event(
-                self.hass, self.config[CONF_TAG_SENSOR], self.async_tag_changed_handler
+            event.async_track_time_interval(
+                self.hass,
+                self._async_refresh_queues,
+                timedelta(seconds=DEFAULT_QUEUE_REFRESH_INTERVAL),
             )
         )
 
-        # Register services
-        self.hass.services.async_register(
-            DOMAIN, "map_tag", self.async_map_tag_service
+        self.setup_stats["setup_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        _LOGGER.debug(
+            "Jukebox set up in %.1f ms, %d mappings loaded from %s in %.1f ms",
+            self.setup_stats["setup_ms"],
+            self.setup_stats["mappings"],
+            self.setup_stats["source"],
+            self.setup_stats["total_ms"],
         )
 
-    async def async_tag_changed_handler(self, event_data):
+    @callback
+    def async_apply_options(self):
+        """Apply the entry's current options without reloading it.
+
+        The tag sensor and player are swapped in the coordinator in one go.
+        Mappings, debounce state and queued playback carry over, so taps
+        keep being served while the options change.
+        """
+        self.config = {**self.entry.data, **self.entry.options}
+        previous, self.plan = self.plan, PlaybackPlan.from_config(self.config)
+
+        if (previous.tag_sensor, previous.media_player) != (self.plan.tag_sensor, self.plan.media_player):
+            _LOGGER.info(
+                "Jukebox now follows %s and plays on %s",
+                self.plan.tag_sensor,
+                self.plan.media_player,
+            )
+            self.coordinator.async_update_box(self, previous)
+        if previous.media_player != self.plan.media_player:
+            # Card groups were joined to the previous player; leave them be.
+            self.group = ()
+            self._group_start = None
+            self.coordinator.async_update_group(self)
+        if (previous.media_player, previous.filesystem) != (self.plan.media_player, self.plan.filesystem):
+            self.resolver.media_player = self.plan.media_player
+            self.resolver.filesystem = self.plan.filesystem
+            self.resolver.clear()
+            self._async_refresh_resolver()
+            # Queued and listed track URIs came from the previous provider.
+            self._async_set_queue_size(0)
+            if previous.filesystem != self.plan.filesystem:
+                self.resume.async_clear()
+            else:
+                self.resume.async_drop_listings()
+
+        self.debouncer.removal_grace = self.config.get(CONF_REMOVAL_GRACE, DEFAULT_REMOVAL_GRACE)
+        self.debouncer.presence_confirm = self.config.get(CONF_PRESENCE_CONFIRM, DEFAULT_PRESENCE_CONFIRM)
+        self.resume.async_set_limits(
+            int(self.config.get(CONF_RESUME_MAX_TAGS, DEFAULT_RESUME_MAX_TAGS)),
+            self.config.get(CONF_RESUME_MAX_AGE, DEFAULT_RESUME_MAX_AGE) * 86400,
+        )
+        self._async_set_queue_size(int(self.config.get(CONF_QUEUE_TAGS, DEFAULT_QUEUE_TAGS)))
+        self.playback.expiry = self.config.get(CONF_COMMAND_EXPIRY, DEFAULT_COMMAND_EXPIRY)
+        self._async_stop_warmup()
+        self._async_setup_warmup()
+
+    @callback
+    def _async_setup_warmup(self):
+        """Start the predictive warm-up if it is enabled.
+
+        The tap history of an earlier warm-up is kept.
+        """
+        if not self.config.get(CONF_WARMUP, DEFAULT_WARMUP):
+            self.warmup = None
+            return
+        from .warmup import PlayerWarmUp, parse_warmup_times
+
+        times = parse_warmup_times(self.config.get(CONF_WARMUP_TIMES))
+        if self.warmup is None:
+            self.warmup = PlayerWarmUp(
+                self.hass,
+                self,
+                times,
+                DEFAULT_WARMUP_TAGS,
+                DEFAULT_WARMUP_HISTORY,
+                DEFAULT_WARMUP_COOLDOWN,
+            )
+        else:
+            self.warmup.times = times
+        self._unsub_warmup = self.warmup.async_setup()
+
+    @callback
+    def _async_stop_warmup(self):
+        """Stop the scheduled warm-ups."""
+        if self._unsub_warmup:
+            self._unsub_warmup()
+            self._unsub_warmup = None
+
+    @callback
+    def async_tag_changed_handler(self, event_data):
         """Handle state changes for the RFID tag sensor."""
         new_state = event_data.data.get("new_state")
         if not new_state:
@@ -94,196 +368,586 @@ class RFIDJukebox:
 
         new_tag = new_state.state
         _LOGGER.debug("Tag sensor changed to: %s", new_tag)
+        self._async_scanned(new_tag, SOURCE_SENSOR, time.time() - new_state.last_updated_timestamp)
+        if self.warmup:
+            self.warmup.async_state_changed(event_data)
+
+    @callback
+    def async_tag_event(self, event_data):
+        """Handle a tag scan event fired by the reader."""
+        uid = event_data.data.get(ATTR_UID)
+        present = event_data.data.get(ATTR_PRESENT, True)
+        if isinstance(present, str):
+            present = present.strip().lower() not in ("false", "0", "off", "no", "")
+        _LOGGER.debug("Tag scan event: %s %s", uid, "present" if present else "removed")
+        self._async_scanned(
+            uid if present else None, SOURCE_EVENT, time.time() - event_data.time_fired_timestamp
+        )
+
+    @callback
+    def _async_scanned(self, new_tag, source: str, bus_delay: float):
+        """Act on a tag reported by the sensor or the scan event.
 
-        # Tag is presented
-        if new_tag and new_tag.lower() not in ["none", "unknown", ""]:
-            # Update the 'last_tag' sensor for the UI
-            if self.last_tag != new_tag:
-                self.last_tag = new_tag
-                if new_tag in self.mappings:
-                    mapping = self.mappings[new_tag]
-                    if isinstance(mapping, dict):
-                        alias = mapping.get("alias", new_tag)
-                        media_type = mapping.get("type", "playlist")
-                        media_name = mapping.get("name", "")
-                        if self.text_entity:
-                            self.text_entity.update_value(media_name)
-                        if self.alias_entity:
-                            self.alias_entity.update_value(alias)
-                        if self.media_type_entity:
-                            self.media_type_entity.update_option(media_type)
-                    else:  # Handle old, simple mapping format
-                        if self.text_entity:
-                            self.text_entity.update_value(mapping)
-                        if self.alias_entity:
-                            self.alias_entity.update_value(new_tag)
-                        if self.media_type_entity:
-                            self.media_type_entity.update_option("playlist")
-                else:  # Unmapped tag, clear the fields
-                    if self.text_entity:
-                        self.text_entity.update_value("")
-                    if self.alias_entity:
-                        self.alias_entity.update_value("")
-                    if self.media_type_entity:
-                        self.media_type_entity.update_option("folder")
-
-            # If it's the same tag, decide whether to resume or restart.
-            if self.current_tag == new_tag:
-                media_player_entity_id = self.config[CONF_MEDIA_PLAYER]
-                media_player_state = self.hass.states.get(media_player_entity_id)
-
-                if media_player_state and media_player_state.state == STATE_PAUSED:
-                    await self.async_resume_playback()
+        Readers may report a scan both ways; whichever arrives first is
+        used and the same report from the other channel is dropped.
+        """
+        if new_tag and new_tag.lower() not in ["none", "unknown", STATE_UNAVAILABLE, ""]:
+            tag_id = normalize_tag_id(new_tag)
+        else:
+            tag_id = None
+
+        now = time.monotonic()
+        if (
+            tag_id == self._last_scan
+            and source != self._last_scan_source
+            and now - self._last_scan_at < DEFAULT_TAG_DEDUPE_WINDOW
+        ):
+            self.scans["duplicate"] += 1
+            return
+        self._last_scan, self._last_scan_source, self._last_scan_at = tag_id, source, now
+        self.scans[source] += 1
+
+        if tag_id:
+            self._tap_trace = TapTrace(tag_id, bus_delay, time.perf_counter())
+            self.debouncer.async_present(tag_id)
+            if self.session.state == STATE_REMOVED_GRACE and not self.debouncer.removal_pending:
+                # The card came back within the grace window.
+                self.session.async_returned()
+        else:
+            self.debouncer.async_removed()
+            if self.debouncer.removal_pending:
+                self.session.async_lifted()
+
+    @callback
+    def async_tag_present(self, new_tag: str):
+        """Handle a tag that has been confirmed present."""
+        trace = self._tap_trace
+        if trace and trace.tag_id == new_tag:
+            trace.presented = time.perf_counter()
+            mapping = self.mappings.get(new_tag)
+            trace.looked_up = time.perf_counter()
+        else:
+            self._tap_trace = None
+            mapping = self.mappings.get(new_tag)
+
+        new_last_tag = self.last_tag != new_tag
+        self.last_tag = new_tag
+        session = self.session
+
+        # If it's the same tag, decide whether to resume or restart.
+        if session.same_tag(new_tag):
+            if session.state == STATE_PAUSED:
+                command = self.async_resume_playback()
+                if command is None:
+                    session.async_continued(new_tag)
                 else:
-                    # If the player is idle, off, or in any other state,
-                    # treat it as a new request to play from the beginning.
-                    _LOGGER.info("Player is not paused, restarting media for tag %s", new_tag)
-                    if new_tag in self.mappings:
-                        mapping = self.mappings[new_tag]
-                        media_type = mapping.get("type", "playlist")
-                        media_name = mapping.get("name")
-                        if media_name:
-                            if media_type == "folder":
-                                await self.async_start_new_folder(media_name)
-                            else:
-                                await self.async_start_new_playlist(media_name)
-            # Otherwise, it's a new media.
+                    session.async_start(new_tag, command)
+                self._async_listening_start(new_tag)
+            elif session.state == STATE_IDLE and mapping:
+                # The player finished, stopped or never started the media.
+                _LOGGER.info("Player is not paused, restarting media for tag %s", new_tag)
+                session.async_start(new_tag, self._async_start_mapping(mapping, from_start=True))
+                self._async_listening_start(new_tag)
+            # Starting or playing already.
+        # Otherwise, it's a new media.
+        else:
+            if session.tag_id:
+                self._async_remember(session.tag_id)
+            self._async_listening_end()
+            if mapping:
+                session.async_start(new_tag, self._async_start_mapping(mapping))
+                self._async_listening_start(new_tag)
             else:
-                self.current_tag = new_tag
-                if new_tag in self.mappings:
-                    mapping = self.mappings[new_tag]
-                    if isinstance(mapping, dict):
-                        media_type = mapping.get("type", "playlist")
-                        media_name = mapping.get("name")
-                    else:
-                        media_type = "playlist"
-                        media_name = mapping
-
-                    if media_name:
-                        if media_type == "folder":
-                            await self.async_start_new_folder(media_name)
-                        else:
-                            await self.async_start_new_playlist(media_name)
-                    else:
-                        _LOGGER.warning("No media name found for tag: %s", new_tag)
-                else:
-                    _LOGGER.warning("Unmapped tag scanned: %s", new_tag)
-        # Tag is removed
+                session.async_stop(new_tag)
+                _LOGGER.warning("Unmapped tag scanned: %s", new_tag)
+        self._tap_trace = None
+
+        # Show the tag in the mapping UI once playback has been dispatched
+        if new_last_tag:
+            if mapping:
+                self._async_update_ui(mapping.name, mapping.alias, mapping.media_type)
+            else:  # Unmapped tag, clear the fields
+                self._async_update_ui("", "", MEDIA_TYPE_FOLDER)
+
+    @callback
+    def _async_update_ui(self, media_name: str, alias: str, media_type: str):
+        """Show the scanned tag's mapping in the mapping UI entities.
+
+        The entities are written in one deferred update, so the playback
+        command queued in the same tap goes out first. Taps before that
+        update runs only leave their latest values.
+        """
+        if self.playback_only:
+            return
+        self._pending_ui = (media_name, alias, media_type)
+        if self._ui_flush is None:
+            self._ui_flush = self.hass.loop.call_soon(self._async_flush_ui)
+
+    @callback
+    def _async_flush_ui(self):
+        """Write the pending mapping UI values to the entities."""
+        self._ui_flush = None
+        if self._pending_ui is None:
+            return
+        media_name, alias, media_type = self._pending_ui
+        self._pending_ui = None
+        if self.text_entity:
+            self.text_entity.update_value(media_name)
+        if self.alias_entity:
+            self.alias_entity.update_value(alias)
+        if self.media_type_entity:
+            self.media_type_entity.update_option(media_type)
+
+    @callback
+    def _async_cancel_ui(self):
+        """Drop a pending mapping UI update."""
+        if self._ui_flush is not None:
+            self._ui_flush.cancel()
+            self._ui_flush = None
+        self._pending_ui = None
+
+    @callback
+    def _async_start_mapping(self, mapping: TagMapping, from_start: bool = False):
+        """Start the media a tag is mapped to and return the command.
+
+        Media the tag was taken off halfway continues where it stopped,
+        unless ``from_start`` is set.
+        """
+        if self.warmup:
+            self.warmup.record_tap(mapping.tag_id)
+        broken = mapping.tag_id in self.resolver.broken
+        if broken:
+            _LOGGER.warning(
+                "Tag %s is mapped to a broken %s: %s",
+                mapping.tag_id,
+                mapping.media_type,
+                self.resolver.broken[mapping.tag_id],
+            )
+        media_key = _media_key(mapping)
+        if from_start:
+            self.resume.async_forget(mapping.tag_id)
         else:
-            if self.current_tag:
-                media_player_entity_id = self.config[CONF_MEDIA_PLAYER]
-                media_player_state = self.hass.states.get(media_player_entity_id)
+            point = self.resume.get(mapping.tag_id, media_key)
+            if point:
+                return self.async_resume_media(mapping, point)
+        command = self._async_start_media(mapping, media_key)
+        if command is not None and broken:
+            # Retrying will not make the missing media appear.
+            command.retry = False
+        return command
+
+    @callback
+    def _async_start_media(self, mapping: TagMapping, media_key: str):
+        """Start a mapping's media from the beginning and return the command."""
+        if mapping.is_folder:
+            media_id = self._async_media_id(mapping)
+            tracks = None
+            if self.queues is not None:
+                tracks = self.queues.get(mapping, media_key)
+                self.queues.record_tap(mapping, media_key, media_id)
+            if tracks:
+                return self.async_start_tracks(mapping, tracks)
+            return self.async_start_new_folder(mapping.name, media_id, mapping.players)
+        return self.async_start_new_playlist(mapping.name, self.resolver.get(mapping), mapping.players)
+
+    @callback
+    def _async_media_id(self, mapping: TagMapping):
+        """Return the Music Assistant media ID of a mapping, if known."""
+        if mapping.is_folder:
+            return self.resolver.get(mapping) or self.plan.folder_media_id(mapping.name)
+        return self.resolver.get(mapping)
+
+    @callback
+    def _async_remember(self, tag_id: str):
+        """Remember where the player is in the media of a tag it is leaving."""
+        if self.playback.intent is not None or not self.session.loaded:
+            # The player state still shows what played before the pending
+            # command, or media of another card after a failed start.
+            return
+        mapping = self.mappings.get(tag_id)
+        state = self.hass.states.get(self.plan.media_player)
+        if not mapping or not state or state.state not in (STATE_PLAYING, STATE_PAUSED):
+            return
+        media_key = _media_key(mapping)
+        point = self.resume.async_capture(tag_id, media_key, state)
+        if point and point.listing is None and self.queues is not None:
+            point.listing = self.queues.get(mapping, media_key)
+        if point and point.listing is None:
+            self.entry.async_create_background_task(
+                self.hass, self._async_fill_listing(mapping, point), f"{DOMAIN}_list_{tag_id}"
+            )
 
-                # Only pause if the player is currently playing
-                if media_player_state and media_player_state.state == STATE_PLAYING:
-                    await self.async_pause_player()
-                # We don't clear current_tag here, so we can resume it later
+    async def _async_fill_listing(self, mapping: TagMapping, point: ResumePoint):
+        """List the tracks of a mapping's media so a resume can queue the rest."""
+        media_id = self._async_media_id(mapping)
+        if media_id:
+            point.listing = await self.resolver.async_list_tracks(
+                mapping.media_type, media_id, MAX_LISTING
+            )
 
-    async def async_start_new_playlist(self, playlist_name: str):
-        """Start a new playlist from the beginning."""
-        _LOGGER.info("Starting new playlist '%s'", playlist_name)
-        from homeassistant.exceptions import HomeAssistantError
+    @callback
+    def _async_refresh_resolver(self, _now=None):
+        """Have the coordinator re-resolve every mapping in the background."""
+        self.coordinator.async_refresh_media()
 
-        try:
-            service_data = {
-                "entity_id": self.config[CONF_MEDIA_PLAYER],
-                "media_id": playlist_name,
-                "media_type": "playlist",
-            }
-            _LOGGER.debug("Calling music_assistant.play_media with data: %s", service_data)
-            await self.hass.services.async_call(
+    @callback
+    def _async_set_queue_size(self, size: int):
+        """Keep up to ``size`` pre-built queues; 0 drops them all."""
+        if size <= 0:
+            self.queues = None
+        elif self.queues is None:
+            from .queues import TrackQueues
+
+            self.queues = TrackQueues(self.hass, self.entry, self.resolver, size)
+        else:
+            self.queues.set_size(size)
+
+    @callback
+    def _async_refresh_queues(self, _now=None):
+        """Rebuild the pre-built track queues in the background."""
+        if self.queues:
+            self.entry.async_create_background_task(
+                self.hass, self.queues.async_refresh(), f"{DOMAIN}_refresh_queues"
+            )
+
+    @callback
+    def async_tag_removed(self):
+        """Handle a tag that has been confirmed removed."""
+        tag_id = self.session.tag_id
+        # Only pause if the player is playing or about to start. The tag
+        # stays in the session, so it can be resumed later.
+        if tag_id and self.session.active:
+            self._async_remember(tag_id)
+            command = self.session.command
+            self.session.async_removed()
+            self.async_pause_player()
+            if command is not None and not self.playback.pending(command):
+                # The pause cancelled out a resume that was never sent.
+                self.session.async_cancelled(command)
+            self._async_listening_end()
+        else:
+            self.session.async_removed()
+
+    @callback
+    def _async_listening_start(self, tag_id: str):
+        """Count a tap in the statistics and start timing its listening."""
+        self._async_listening_end()
+        self._listening = (tag_id, time.monotonic())
+        if self.analytics is not None:
+            self.analytics.record_tap(tag_id)
+
+    @callback
+    def _async_listening_end(self):
+        """Add the running listening time to the statistics."""
+        if self._listening is None:
+            return
+        tag_id, started = self._listening
+        self._listening = None
+        if self.analytics is not None:
+            self.analytics.record_session(tag_id, time.monotonic() - started)
+
+    @callback
+    def _async_new_day(self, _now):
+        """Roll the statistics over to a new day."""
+        self.analytics.async_rollover()
+
+    @callback
+    def _async_flap_absorbed(self):
+        """Publish the updated flap counters."""
+        if self.flaps_entity:
+            self.flaps_entity.update_value(self.debouncer)
+
+    @callback
+    def _async_submit(self, command: PlaybackCommand):
+        """Queue a playback command, timing it if it answers the pending tap.
+
+        Returns the command that carries it out, as the playback queue does.
+        """
+        if command.kind in (KIND_START, KIND_RESUME) and self._tap_trace:
+            trace, self._tap_trace = self._tap_trace, None
+            trace.kind = command.kind
+            command.trace = trace
+            self._playing_trace = trace
+        return self.playback.async_submit(command)
+
+    @callback
+    def _async_submit_start(self, command: PlaybackCommand, players: Sequence[str]):
+        """Queue a start that plays on ``players`` too, grouped with the box's player.
+
+        The group is joined before the media is played once on the box's
+        player, which Music Assistant keeps in sync on every member. An
+        existing group costs no extra call; players an earlier card grouped
+        in but this one does not are unjoined.
+        """
+        leader = self.plan.media_player
+        members = tuple(player for player in players if player != leader)
+        prepare = []
+        stray = [player for player in self.group if player not in members]
+        if stray:
+            prepare.append(("media_player", "unjoin", {"entity_id": stray}))
+        if members and not self._async_grouped(members):
+            prepare.append(("media_player", "join", {"entity_id": leader, "group_members": list(members)}))
+        command.prepare = prepare
+        self._group_start = (command, {}) if members else None
+        if members != self.group:
+            self.group = members
+            self.coordinator.async_update_group(self)
+        return self._async_submit(command)
+
+    @callback
+    def _async_grouped(self, members: Sequence[str]) -> bool:
+        """Return True if the box's player is grouped with all ``members``."""
+        state = self.hass.states.get(self.plan.media_player)
+        joined = state.attributes.get("group_members") if state else None
+        return bool(joined) and all(member in joined for member in members)
+
+    @callback
+    def _async_record_members(self, command: PlaybackCommand):
+        """Publish the member times of a call fanned out to the group."""
+        if not command.member_times:
+            return
+        self.group_timings.record(command.kind, command.member_times)
+        if self.group_entity:
+            self.group_entity.update_value(self.group_timings)
+
+    @callback
+    def async_member_changed(self, event_data):
+        """Time a player of the group reaching playing after a grouped start."""
+        new_state = event_data.data.get("new_state")
+        if new_state is None or new_state.state != STATE_PLAYING or self._group_start is None:
+            return
+        command, times = self._group_start
+        if command.sent is None or new_state.entity_id in times:
+            return
+        times[new_state.entity_id] = (time.perf_counter() - command.sent) * 1000
+        if len(times) < len(self.group) + 1:
+            return
+        # Every player of the group is playing.
+        self._group_start = None
+        self.group_timings.record(command.kind, times)
+        if self.group_entity:
+            self.group_entity.update_value(self.group_timings)
+
+    @callback
+    def _async_command_failed(self, command: PlaybackCommand):
+        """Let the session know a start did not go through."""
+        self._async_record_members(command)
+        if self._group_start is not None and self._group_start[0] is command:
+            self._group_start = None
+        self.session.async_command_done(command, False)
+
+    @callback
+    def _async_command_done(self, command: PlaybackCommand):
+        """Settle the session and finish the tap trace once the player is playing."""
+        self._async_record_members(command)
+        self.session.async_command_done(command, True)
+        trace = command.trace
+        if trace is None or trace is not self._playing_trace:
+            return
+        state = self.hass.states.get(self.plan.media_player)
+        if trace.playing is None and state and state.state == STATE_PLAYING:
+            # Already playing before the command, no state change will follow.
+            trace.playing = trace.completed
+        if trace.done:
+            self._async_finish_trace(trace)
+
+    @callback
+    def async_player_changed(self, event_data):
+        """Handle state changes of the media player."""
+        new_state = event_data.data.get("new_state")
+        if new_state and self.playback.intent is None:
+            # States seen while commands are pending are on their way to the outcome.
+            self.session.async_player_changed(new_state.state)
+        if self.warmup:
+            self.warmup.async_state_changed(event_data)
+        self.async_member_changed(event_data)
+        trace = self._playing_trace
+        if trace is None or not new_state or new_state.state != STATE_PLAYING:
+            return
+        if trace.playing is None:
+            trace.playing = time.perf_counter()
+        if trace.done:
+            self._async_finish_trace(trace)
+
+    @callback
+    def _async_finish_trace(self, trace: TapTrace):
+        """Record a finished tap trace and publish the new timings."""
+        self._playing_trace = None
+        self.timings.record(trace)
+        if self.timing_entities:
+            stats = self.timings.stats()
+            for entity in self.timing_entities:
+                entity.update_value(stats)
+
+    @callback
+    def async_start_new_playlist(self, playlist_name: str, media_id: str = None, players: Sequence[str] = ()):
+        """Start a new playlist from the beginning.
+
+        ``media_id`` is the playlist's resolved URI, if known; otherwise Music
+        Assistant looks the playlist up by name. ``players`` play along.
+        """
+        _LOGGER.info("Starting new playlist '%s'", playlist_name)
+        return self._async_submit_start(
+            PlaybackCommand(
+                KIND_START,
                 "music_assistant",
                 "play_media",
-                service_data,
-                blocking=True,
-            )
-        except HomeAssistantError as err:
-            _LOGGER.error(
-                "Error playing playlist '%s': %s. Please ensure the playlist name is spelled correctly and exists in Music Assistant.",
-                playlist_name,
-                err,
-            )
+                self.plan.play_media(media_id or playlist_name, "playlist"),
+                f"Error playing playlist '{playlist_name}'. Please ensure the playlist name "
+                "is spelled correctly and exists in Music Assistant",
+            ),
+            players,
+        )
 
-    async def async_start_new_folder(self, folder_name: str):
-        """HACK: play a Music Assistant folder now (hardcoded filesystem + device)."""
-        from homeassistant.exceptions import HomeAssistantError
+    @callback
+    def async_start_new_folder(self, folder_name: str, media_id: str = None, players: Sequence[str] = ()):
+        """Play a Music Assistant folder now.
 
-        filesystem = self.config.get(CONF_MA_FILESYSTEM)
-        if not filesystem:
+        ``media_id`` is the folder's resolved URI, if known; otherwise it is
+        built from the configured filesystem provider. ``players`` play along.
+        """
+        media_id = media_id or self.plan.folder_media_id(folder_name)
+        if media_id is None:
             _LOGGER.error("Music Assistant filesystem ID is not configured.")
-            return
+            return None
 
-        # Build "<filesystem>://folder/<path>"
-        path = str(folder_name).strip().lstrip("/\\").replace("\\", "/")
-        media_id = f"{filesystem}://folder/{path}"
         _LOGGER.info("Starting new folder '%s'", media_id)
+        return self._async_submit_start(
+            PlaybackCommand(
+                KIND_START,
+                "music_assistant",
+                "play_media",
+                self.plan.play_media(media_id, "folder"),
+                f"MA folder play failed ({media_id})",
+            ),
+            players,
+        )
+
+    @callback
+    def async_start_tracks(self, mapping: TagMapping, tracks):
+        """Play a folder from its pre-built track queue in one call."""
+        _LOGGER.info("Starting folder '%s' from its %d queued tracks", mapping.name, len(tracks))
+        return self._async_submit_start(
+            PlaybackCommand(
+                KIND_START,
+                "music_assistant",
+                "play_media",
+                self.plan.play_media(tracks, "track", "replace"),
+                f"Error playing the queued tracks of folder '{mapping.name}'",
+            ),
+            mapping.players,
+        )
+
+    @callback
+    def async_resume_media(self, mapping: TagMapping, point: ResumePoint):
+        """Continue a tag's media at its resume point in one composite start.
+
+        The resume track and everything after it are queued in a single
+        ``play_media`` call, followed by a seek. If the track listing is not
+        known yet, only the resume track is queued and the rest is added once
+        it has been listed.
+        """
+        remaining = point.remaining()
+        _LOGGER.info(
+            "Resuming %s '%s' at %s (%.0f s)",
+            mapping.media_type,
+            mapping.name,
+            point.track_uri,
+            point.position,
+        )
+        steps = []
+        if point.position >= MIN_RESUME_POSITION:
+            steps.append(
+                (
+                    "media_player",
+                    "media_seek",
+                    {"entity_id": self.plan.media_player, "seek_position": point.position},
+                )
+            )
+        command = self._async_submit_start(
+            PlaybackCommand(
+                KIND_START,
+                "music_assistant",
+                "play_media",
+                self.plan.play_media(remaining or point.track_uri, "track", "replace"),
+                f"Error resuming {mapping.media_type} '{mapping.name}'",
+                steps,
+            ),
+            mapping.players,
+        )
+        self.resume.async_resumed(mapping.tag_id)
+        if remaining is None:
+            self.entry.async_create_background_task(
+                self.hass,
+                self._async_enqueue_rest(mapping, point),
+                f"{DOMAIN}_enqueue_{mapping.tag_id}",
+            )
+        return command
+
+    async def _async_enqueue_rest(self, mapping: TagMapping, point: ResumePoint):
+        """Add the tracks after the resume track once they have been listed."""
+        await self._async_fill_listing(mapping, point)
+        remaining = point.remaining()
+        if not remaining or len(remaining) < 2 or self.session.tag_id != mapping.tag_id:
+            return
         try:
-            service_data = {
-                "entity_id": self.config[CONF_MEDIA_PLAYER],
-                "media_id": media_id,
-                "media_type": "folder",
-            }
-            _LOGGER.debug("Calling music_assistant.play_media with data: %s", service_data)
             await self.hass.services.async_call(
                 "music_assistant",
                 "play_media",
-                service_data,
+                self.plan.play_media(remaining[1:], "track", "add"),
                 blocking=True,
             )
         except HomeAssistantError as err:
-            _LOGGER.error("MA folder play failed (%s): %s", media_id, err)
+            _LOGGER.error("Error queueing the rest of %s '%s': %s", mapping.media_type, mapping.name, err)
 
-    async def async_resume_playback(self):
-        """Resume the currently paused media player."""
+    @callback
+    def async_resume_playback(self):
+        """Resume the currently paused media player and its group members."""
         _LOGGER.info("Resuming playback")
-        await self.hass.services.async_call(
-            "media_player",
-            "media_play",
-            {"entity_id": self.config[CONF_MEDIA_PLAYER]},
-            blocking=True,
+        return self._async_submit(
+            PlaybackCommand(
+                KIND_RESUME,
+                "media_player",
+                "media_play",
+                self.plan.group_target(self.group),
+                "Error resuming playback",
+            )
         )
 
-    async def async_pause_player(self):
-        """Pause the media player."""
+    @callback
+    def async_pause_player(self):
+        """Pause the media player and its group members."""
         _LOGGER.info("Pausing player")
-        await self.hass.services.async_call(
-            "media_player",
-            "media_pause",
-            {"entity_id": self.config[CONF_MEDIA_PLAYER]},
-            blocking=True,
-        )
-
-    async def async_map_tag(self, tag_id: str, media_type: str, media_name: str, alias: str = None):
-        """Map a tag to a media item and save it."""
-        from .helpers import save_mappings
-
-        if not tag_id or not media_name:
-            _LOGGER.error(
-                "Cannot map tag. Tag ID or Media Name is missing. Tag: '%s', Media: '%s'",
-                tag_id,
-                media_name,
+        return self._async_submit(
+            PlaybackCommand(
+                KIND_PAUSE,
+                "media_player",
+                "media_pause",
+                self.plan.group_target(self.group),
+                "Error pausing player",
             )
-            return
-
-        _LOGGER.info("Mapping tag '%s' to %s '%s'", tag_id, media_type, media_name)
-        self.mappings[tag_id] = {
-            "type": media_type,
-            "name": media_name,
-            "alias": alias or tag_id,
-        }
-
-        mapping_file = self.hass.config.path(DEFAULT_MAPPING_FILE_PATH)
-        await self.hass.async_add_executor_job(
-            save_mappings, self.hass, mapping_file, self.mappings
         )
-        self.current_tag = None  # Clear current tag to force re-evaluation
-
-    async def async_map_tag_service(self, service_call):
-        """Handle the map_tag service call."""
-        tag_id = service_call.data.get("tag_id")
-        media_type = service_call.data.get("media_type", "playlist")
-        media_name = service_call.data.get("media_name")
-        alias = service_call.data.get("alias")
-        await self.async_map_tag(tag_id, media_type, media_name, alias)
-
 
+    async def async_map_tag(self, tag_id: str, media_type: str, media_name: str, alias: str = None):
+        """Map a tag to a media item from this box and save it."""
+        await self.coordinator.async_map_tag(tag_id, media_type, media_name, alias, self)
+
+    @callback
+    def async_mappings_changed(self, updates):
+        """Drop stale state for remapped and removed tags.
+
+        ``updates`` are ``(previous, mapping)`` pairs, with ``mapping`` None
+        for a removed tag; the coordinator resolves the new media. A changed
+        current tag is forgotten so its next tap is re-evaluated, but taking
+        it off still pauses the player.
+        """
+        for previous, mapping in updates:
+            if previous:
+                self.resolver.invalidate(previous)
+                if self.queues is not None:
+                    self.queues.invalidate(previous.tag_id)
+            if mapping is None:
+                self.resume.async_forget(previous.tag_id)
+            tag_id = (mapping or previous).tag_id
+            if tag_id == self.session.tag_id:
+                self.session.async_remapped()
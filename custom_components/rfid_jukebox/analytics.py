@@ -0,0 +1,329 @@
+"""Tap and listening statistics for the RFID Jukebox integration."""
+import base64
+import logging
+import sys
+import time
+from array import array
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+EVENT_TAP = 0
+EVENT_SESSION = 1
+
+# Sessions shorter than this count as a skipped card.
+SKIP_SECONDS = 30.0
+# Raw events are kept this long; the daily roll-ups for the full retention.
+RAW_RETENTION_DAYS = 7
+MAX_RAW_EVENTS = 20000
+HOURS = 24
+
+
+def _pack(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack(typecode: str, text: str, swap: bool) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    if swap:
+        values.byteswap()
+    return values
+
+
+class DailyRollup:
+    """One day of statistics: a row per tag, a column per counter.
+
+    ``hours`` holds 24 tap counters per tag, row after row.
+    """
+
+    __slots__ = ("tags", "_rows", "taps", "listened", "skips", "hours")
+
+    def __init__(self, tags: Iterable[str] = ()):
+        """Initialize an empty roll-up for the given tags."""
+        self.tags: List[str] = list(tags)
+        self._rows = {tag_id: row for row, tag_id in enumerate(self.tags)}
+        count = len(self.tags)
+        self.taps = array("I", [0]) * count
+        self.listened = array("f", [0.0]) * count
+        self.skips = array("I", [0]) * count
+        self.hours = array("I", [0]) * (count * HOURS)
+
+    def row(self, tag_id: str) -> int:
+        """Return the row of a tag, adding it if needed."""
+        row = self._rows.get(tag_id)
+        if row is None:
+            row = self._rows[tag_id] = len(self.tags)
+            self.tags.append(tag_id)
+            self.taps.append(0)
+            self.listened.append(0.0)
+            self.skips.append(0)
+            self.hours.extend(array("I", [0]) * HOURS)
+        return row
+
+    def add_tap(self, tag_id: str, hour: int) -> None:
+        """Count a tap at the given hour of the day."""
+        row = self.row(tag_id)
+        self.taps[row] += 1
+        self.hours[row * HOURS + hour] += 1
+
+    def add_session(self, tag_id: str, listened: float) -> None:
+        """Add the listening time of a session; short ones count as skips."""
+        row = self.row(tag_id)
+        self.listened[row] += listened
+        if listened < SKIP_SECONDS:
+            self.skips[row] += 1
+
+    def totals(self) -> Dict[str, float]:
+        """Return the day's totals over all tags."""
+        return {"taps": sum(self.taps), "listened": sum(self.listened), "skips": sum(self.skips)}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the stored form."""
+        return {
+            "tags": self.tags,
+            "taps": _pack(self.taps),
+            "listened": _pack(self.listened),
+            "skips": _pack(self.skips),
+            "hours": _pack(self.hours),
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any], swap: bool) -> "DailyRollup":
+        """Rebuild a roll-up from its stored form."""
+        rollup = cls(raw["tags"])
+        rollup.taps = _unpack("I", raw["taps"], swap)
+        rollup.listened = _unpack("f", raw["listened"], swap)
+        rollup.skips = _unpack("I", raw["skips"], swap)
+        rollup.hours = _unpack("I", raw["hours"], swap)
+        count = len(rollup.tags)
+        lengths = {len(rollup.taps), len(rollup.listened), len(rollup.skips), len(rollup.hours) // HOURS}
+        if lengths != {count} or len(rollup.hours) % HOURS:
+            raise ValueError("column lengths do not match")
+        return rollup
+
+
+class TapAnalytics:
+    """Columnar tap and session history of one jukebox.
+
+    Every tap and listening session is appended to raw event columns, kept
+    for a week, and added to the day's roll-up, kept for ``retention_days``.
+    Queries and sensors read the roll-ups only. Everything is written to
+    ``.storage`` with a delayed save.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, retention_days: int):
+        """Initialize the store."""
+        self.hass = hass
+        self.retention_days = retention_days
+        self.days: Dict[str, DailyRollup] = {}
+        self._tag_table: List[str] = []
+        self._tag_index: Dict[str, int] = {}
+        self._times = array("d")
+        self._tags = array("I")
+        self._kinds = array("B")
+        self._values = array("f")
+        self._listeners: List[Callable[["TapAnalytics"], None]] = []
+        self._notify = None
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.analytics.{entry_id}")
+
+    async def async_load(self) -> None:
+        """Load the stored history, dropping what is past retention."""
+        data = await self._store.async_load() or {}
+        swap = data.get("byteorder", sys.byteorder) != sys.byteorder
+        for day, raw in data.get("days", {}).items():
+            try:
+                self.days[day] = DailyRollup.from_dict(raw, swap)
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.warning("Dropping unreadable statistics of %s: %s", day, err)
+        events = data.get("events")
+        if events:
+            try:
+                times = _unpack("d", events["times"], swap)
+                tags = _unpack("I", events["tags"], swap)
+                kinds = _unpack("B", events["kinds"], swap)
+                values = _unpack("f", events["values"], swap)
+                table = list(events["tag_table"])
+                if not len(times) == len(tags) == len(kinds) == len(values):
+                    raise ValueError("column lengths do not match")
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.warning("Dropping unreadable tap history: %s", err)
+            else:
+                self._times, self._tags, self._kinds, self._values = times, tags, kinds, values
+                self._tag_table = table
+                self._tag_index = {tag_id: index for index, tag_id in enumerate(table)}
+        self._prune()
+
+    async def async_remove(self) -> None:
+        """Delete the stored history."""
+        await self._store.async_remove()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop a pending listener notification."""
+        if self._notify is not None:
+            self._notify.cancel()
+            self._notify = None
+
+    @callback
+    def add_listener(self, listener: Callable[["TapAnalytics"], None]) -> Callable[[], None]:
+        """Call ``listener`` after the statistics changed; return a remover."""
+        self._listeners.append(listener)
+
+        @callback
+        def _remove() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return _remove
+
+    @callback
+    def record_tap(self, tag_id: str) -> None:
+        """Record a tap that started or resumed a tag's media."""
+        now = dt_util.now()
+        self._append(EVENT_TAP, tag_id, 0.0)
+        self._today(now).add_tap(tag_id, now.hour)
+        self._async_changed()
+
+    @callback
+    def record_session(self, tag_id: str, listened: float) -> None:
+        """Record how long a tag's media played before it was taken off."""
+        self._append(EVENT_SESSION, tag_id, listened)
+        self._today(dt_util.now()).add_session(tag_id, listened)
+        self._async_changed()
+
+    @callback
+    def async_rollover(self) -> None:
+        """Drop what is past retention and tell the listeners a new day began."""
+        self._prune()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        self._async_changed()
+
+    def today(self) -> Dict[str, float]:
+        """Return today's totals."""
+        rollup = self.days.get(dt_util.now().date().isoformat())
+        return rollup.totals() if rollup else {"taps": 0, "listened": 0.0, "skips": 0}
+
+    def tag_stats(self, days: int) -> Dict[str, Dict[str, float]]:
+        """Return taps, listening time and skips per tag over the last ``days`` days."""
+        stats: Dict[str, Dict[str, float]] = {}
+        for rollup in self._recent(days):
+            for row, tag_id in enumerate(rollup.tags):
+                entry = stats.setdefault(tag_id, {"taps": 0, "listened": 0.0, "skips": 0})
+                entry["taps"] += rollup.taps[row]
+                entry["listened"] += rollup.listened[row]
+                entry["skips"] += rollup.skips[row]
+        return stats
+
+    def top_tags(self, count: int, days: int, hour: Optional[int] = None) -> List[str]:
+        """Return the most tapped tags, optionally only counting one hour of the day."""
+        scores: Dict[str, int] = {}
+        for rollup in self._recent(days):
+            for row, tag_id in enumerate(rollup.tags):
+                taps = rollup.taps[row] if hour is None else rollup.hours[row * HOURS + hour]
+                if taps:
+                    scores[tag_id] = scores.get(tag_id, 0) + taps
+        return sorted(scores, key=scores.get, reverse=True)[:count]
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the size of the history and today's totals."""
+        return {
+            "days": len(self.days),
+            "raw_events": len(self._times),
+            "tags": len(self._tag_table),
+            "today": self.today(),
+        }
+
+    def _today(self, now) -> DailyRollup:
+        day = now.date().isoformat()
+        rollup = self.days.get(day)
+        if rollup is None:
+            rollup = self.days[day] = DailyRollup()
+        return rollup
+
+    def _recent(self, days: int) -> List[DailyRollup]:
+        cutoff = (dt_util.now().date() - timedelta(days=days - 1)).isoformat()
+        return [rollup for day, rollup in self.days.items() if day >= cutoff]
+
+    @callback
+    def _append(self, kind: int, tag_id: str, value: float) -> None:
+        """Append an event to the raw columns."""
+        index = self._tag_index.get(tag_id)
+        if index is None:
+            index = self._tag_index[tag_id] = len(self._tag_table)
+            self._tag_table.append(tag_id)
+        self._times.append(time.time())
+        self._tags.append(index)
+        self._kinds.append(kind)
+        self._values.append(value)
+        if len(self._times) > MAX_RAW_EVENTS:
+            self._drop_events(len(self._times) - MAX_RAW_EVENTS)
+
+    @callback
+    def _prune(self) -> None:
+        """Drop roll-ups and raw events past their retention."""
+        cutoff = (dt_util.now().date() - timedelta(days=self.retention_days)).isoformat()
+        for day in [day for day in self.days if day < cutoff]:
+            del self.days[day]
+        oldest = time.time() - RAW_RETENTION_DAYS * 86400
+        expired = 0
+        while expired < len(self._times) and self._times[expired] < oldest:
+            expired += 1
+        if expired:
+            self._drop_events(expired)
+        self._compact_tag_table()
+
+    @callback
+    def _compact_tag_table(self) -> None:
+        """Forget tags no raw event refers to anymore."""
+        used = sorted(set(self._tags))
+        if len(used) == len(self._tag_table):
+            return
+        remap = {old: new for new, old in enumerate(used)}
+        self._tag_table = [self._tag_table[old] for old in used]
+        self._tag_index = {tag_id: index for index, tag_id in enumerate(self._tag_table)}
+        self._tags = array("I", (remap[old] for old in self._tags))
+
+    @callback
+    def _drop_events(self, count: int) -> None:
+        """Drop the oldest raw events."""
+        for column in (self._times, self._tags, self._kinds, self._values):
+            del column[:count]
+
+    @callback
+    def _async_changed(self) -> None:
+        """Save later and notify the listeners once the current tap is handled."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        if self._listeners and self._notify is None:
+            self._notify = self.hass.loop.call_soon(self._async_notify)
+
+    @callback
+    def _async_notify(self) -> None:
+        self._notify = None
+        for listener in list(self._listeners):
+            listener(self)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        """Return the data to store."""
+        return {
+            "byteorder": sys.byteorder,
+            "days": {day: rollup.as_dict() for day, rollup in self.days.items()},
+            "events": {
+                "tag_table": self._tag_table,
+                "times": _pack(self._times),
+                "tags": _pack(self._tags),
+                "kinds": _pack(self._kinds),
+                "values": _pack(self._values),
+            },
+        }
@@ -28,17 +28,18 @@ class MapTagButton(ButtonEntity):
         """Initialize the button entity."""
         self._jukebox = jukebox
         self._attr_name = "Map Scanned Tag to Media"
-        self._attr_unique_id = f"{DOMAIN}_map_tag_button"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_map_tag_button"
         self._attr_icon = "mdi:tag-plus"
 
     async def async_press(self) -> None:
         """Handle the button press."""
         _LOGGER.debug("Map tag button pressed")
 
-        # Get values from UI entities
-        media_type = self.hass.states.get(f"select.{DOMAIN}_media_type").state
-        media_name = self.hass.states.get(f"text.{DOMAIN}_media_name_to_map").state
-        alias = self.hass.states.get(f"text.{DOMAIN}_alias").state
-        tag_id = self._jukebox.last_tag
+        # Get values from this box's UI entities
+        jukebox = self._jukebox
+        media_type = jukebox.media_type_entity.current_option if jukebox.media_type_entity else None
+        media_name = jukebox.text_entity.native_value if jukebox.text_entity else None
+        alias = jukebox.alias_entity.native_value if jukebox.alias_entity else None
+        tag_id = jukebox.last_tag
 
-        await self._jukebox.async_map_tag(tag_id, media_type, media_name, alias)
\ No newline at end of file
+        await jukebox.async_map_tag(tag_id, media_type, media_name, alias)
\ No newline at end of file
@@ -4,7 +4,9 @@ from typing import Any, Dict, Optional
 
 import voluptuous as vol
 from homeassistant import config_entries
-from homeassistant.core import callback
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers import selector
 
 from .const import (
@@ -12,10 +14,106 @@ from .const import (
     CONF_TAG_SENSOR,
     CONF_MEDIA_PLAYER,
     CONF_MA_FILESYSTEM,
+    CONF_REMOVAL_GRACE,
+    CONF_PRESENCE_CONFIRM,
+    CONF_WARMUP,
+    CONF_WARMUP_TIMES,
+    CONF_RESUME_MAX_TAGS,
+    CONF_RESUME_MAX_AGE,
+    CONF_QUEUE_TAGS,
+    CONF_PLAYBACK_ONLY,
+    CONF_COMMAND_EXPIRY,
+    CONF_TAP_STATISTICS,
+    DEFAULT_REMOVAL_GRACE,
+    DEFAULT_PRESENCE_CONFIRM,
+    DEFAULT_WARMUP,
+    DEFAULT_RESUME_MAX_TAGS,
+    DEFAULT_RESUME_MAX_AGE,
+    DEFAULT_QUEUE_TAGS,
+    DEFAULT_PLAYBACK_ONLY,
+    DEFAULT_COMMAND_EXPIRY,
+    DEFAULT_TAP_STATISTICS,
 )
+from .resolver import MA_DOMAIN, MediaResolver
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def _seconds_selector(maximum: float) -> selector.NumberSelector:
+    """Return a number selector for a debounce window in seconds."""
+    return selector.NumberSelector(
+        selector.NumberSelectorConfig(
+            min=0,
+            max=maximum,
+            step=0.1,
+            unit_of_measurement="s",
+            mode=selector.NumberSelectorMode.BOX,
+        )
+    )
+
+
+def _count_selector(maximum: int, unit: str = None) -> selector.NumberSelector:
+    """Return a number selector for a whole-number limit."""
+    return selector.NumberSelector(
+        selector.NumberSelectorConfig(
+            min=0,
+            max=maximum,
+            step=1,
+            unit_of_measurement=unit,
+            mode=selector.NumberSelectorMode.BOX,
+        )
+    )
+
+
+async def async_validate_input(
+    hass: HomeAssistant, user_input: Dict[str, Any], entry_id: Optional[str] = None
+) -> Dict[str, str]:
+    """Check the entities and the filesystem provider of a jukebox.
+
+    Returns the form errors, keyed by field. ``user_input`` is normalized in
+    place. ``entry_id`` is the entry being reconfigured, if any.
+    """
+    errors: Dict[str, str] = {}
+    registry = er.async_get(hass)
+    tag_sensor = user_input[CONF_TAG_SENSOR]
+    media_player = user_input[CONF_MEDIA_PLAYER]
+
+    if hass.states.get(tag_sensor) is None and registry.async_get(tag_sensor) is None:
+        errors[CONF_TAG_SENSOR] = "entity_not_found"
+
+    player_entry = registry.async_get(media_player)
+    if hass.states.get(media_player) is None and player_entry is None:
+        errors[CONF_MEDIA_PLAYER] = "entity_not_found"
+    elif player_entry is None or player_entry.platform != MA_DOMAIN:
+        errors[CONF_MEDIA_PLAYER] = "not_music_assistant"
+
+    # Boxes are told apart by their tag sensor and player.
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        if entry.entry_id == entry_id:
+            continue
+        config = {**entry.data, **entry.options}
+        if config.get(CONF_TAG_SENSOR) == tag_sensor:
+            errors.setdefault(CONF_TAG_SENSOR, "already_in_use")
+        if config.get(CONF_MEDIA_PLAYER) == media_player:
+            errors.setdefault(CONF_MEDIA_PLAYER, "already_in_use")
+
+    # Stored even when empty, so clearing it in the options takes effect.
+    filesystem = (user_input.get(CONF_MA_FILESYSTEM) or "").strip()
+    user_input[CONF_MA_FILESYSTEM] = filesystem
+    if filesystem and CONF_MEDIA_PLAYER not in errors:
+        resolver = MediaResolver(hass, media_player, filesystem, 1, 0)
+        try:
+            reason = await resolver.async_check_filesystem()
+        except HomeAssistantError as err:
+            # Music Assistant is not up yet, the provider cannot be checked.
+            _LOGGER.debug("Not checking filesystem %s: %s", filesystem, err)
+        else:
+            if reason:
+                _LOGGER.debug("Filesystem %s cannot be browsed: %s", filesystem, reason)
+                errors[CONF_MA_FILESYSTEM] = "filesystem_not_found"
+    return errors
+
+
 class RFIDJukeboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for RFID Jukebox."""
 
@@ -26,21 +124,25 @@ class RFIDJukeboxConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle the initial step."""
         errors: Dict[str, str] = {}
         if user_input is not None:
-            # TODO: Validate user input
-            return self.async_create_entry(title="RFID Jukebox", data=user_input)
+            errors = await async_validate_input(self.hass, user_input)
+            if not errors:
+                return self.async_create_entry(title="RFID Jukebox", data=user_input)
 
         return self.async_show_form(
             step_id="user",
-            data_schema=vol.Schema(
-                {
-                    vol.Required(CONF_TAG_SENSOR): selector.EntitySelector(
-                        selector.EntitySelectorConfig(domain=["sensor", "input_text"]),
-                    ),
-                    vol.Required(CONF_MEDIA_PLAYER): selector.EntitySelector(
-                        selector.EntitySelectorConfig(domain="media_player"),
-                    ),
-                    vol.Optional(CONF_MA_FILESYSTEM): str,
-                }
+            data_schema=self.add_suggested_values_to_schema(
+                vol.Schema(
+                    {
+                        vol.Required(CONF_TAG_SENSOR): selector.EntitySelector(
+                            selector.EntitySelectorConfig(domain=["sensor", "input_text"]),
+                        ),
+                        vol.Required(CONF_MEDIA_PLAYER): selector.EntitySelector(
+                            selector.EntitySelectorConfig(domain="media_player"),
+                        ),
+                        vol.Optional(CONF_MA_FILESYSTEM): str,
+                    }
+                ),
+                user_input,
             ),
             errors=errors,
             description_placeholders=None,
@@ -65,28 +167,71 @@ class RFIDJukeboxOptionsFlowHandler(config_entries.OptionsFlow):
         """Manage the options."""
         errors: Dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            errors = await async_validate_input(self.hass, user_input, self.config_entry.entry_id)
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
 
+        config = {**self.config_entry.data, **self.config_entry.options, **(user_input or {})}
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(
                 {
                     vol.Required(
                         CONF_TAG_SENSOR,
-                        default=self.config_entry.data.get(CONF_TAG_SENSOR),
+                        default=config.get(CONF_TAG_SENSOR),
                     ): selector.EntitySelector(
                         selector.EntitySelectorConfig(domain=["sensor", "input_text"]),
                     ),
                     vol.Required(
                         CONF_MEDIA_PLAYER,
-                        default=self.config_entry.data.get(CONF_MEDIA_PLAYER),
+                        default=config.get(CONF_MEDIA_PLAYER),
                     ): selector.EntitySelector(
                         selector.EntitySelectorConfig(domain="media_player"),
                     ),
                     vol.Optional(
                         CONF_MA_FILESYSTEM,
-                        default=self.config_entry.data.get(CONF_MA_FILESYSTEM),
+                        default=config.get(CONF_MA_FILESYSTEM) or "",
+                    ): str,
+                    vol.Optional(
+                        CONF_REMOVAL_GRACE,
+                        default=config.get(CONF_REMOVAL_GRACE, DEFAULT_REMOVAL_GRACE),
+                    ): _seconds_selector(10),
+                    vol.Optional(
+                        CONF_PRESENCE_CONFIRM,
+                        default=config.get(CONF_PRESENCE_CONFIRM, DEFAULT_PRESENCE_CONFIRM),
+                    ): _seconds_selector(5),
+                    vol.Optional(
+                        CONF_WARMUP,
+                        default=config.get(CONF_WARMUP, DEFAULT_WARMUP),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_WARMUP_TIMES,
+                        default=config.get(CONF_WARMUP_TIMES, ""),
                     ): str,
+                    vol.Optional(
+                        CONF_RESUME_MAX_TAGS,
+                        default=config.get(CONF_RESUME_MAX_TAGS, DEFAULT_RESUME_MAX_TAGS),
+                    ): _count_selector(1000),
+                    vol.Optional(
+                        CONF_RESUME_MAX_AGE,
+                        default=config.get(CONF_RESUME_MAX_AGE, DEFAULT_RESUME_MAX_AGE),
+                    ): _count_selector(365, "d"),
+                    vol.Optional(
+                        CONF_QUEUE_TAGS,
+                        default=config.get(CONF_QUEUE_TAGS, DEFAULT_QUEUE_TAGS),
+                    ): _count_selector(100),
+                    vol.Optional(
+                        CONF_COMMAND_EXPIRY,
+                        default=config.get(CONF_COMMAND_EXPIRY, DEFAULT_COMMAND_EXPIRY),
+                    ): _count_selector(600, "s"),
+                    vol.Optional(
+                        CONF_TAP_STATISTICS,
+                        default=config.get(CONF_TAP_STATISTICS, DEFAULT_TAP_STATISTICS),
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_PLAYBACK_ONLY,
+                        default=config.get(CONF_PLAYBACK_ONLY, DEFAULT_PLAYBACK_ONLY),
+                    ): selector.BooleanSelector(),
                 }
             ),
             errors=errors,
@@ -1,12 +1,66 @@
 """Constants for the RFID Jukebox integration."""
 
 DOMAIN = "rfid_jukebox"
+DATA_COORDINATOR = f"{DOMAIN}_coordinator"
+
+# Service fields
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+
+# Tag scan events fired by the reader firmware
+EVENT_TAG_SCANNED = "esphome.rfid_jukebox_tag"
+ATTR_UID = "uid"
+ATTR_PRESENT = "present"
 
 # Configuration keys
 CONF_TAG_SENSOR = "tag_sensor"
 CONF_MEDIA_PLAYER = "media_player"
 CONF_MA_FILESYSTEM = "ma_filesystem"
 CONF_MAPPING_FILE_PATH = "mapping_file_path"
+CONF_REMOVAL_GRACE = "removal_grace"
+CONF_PRESENCE_CONFIRM = "presence_confirm"
+CONF_WARMUP = "warmup"
+CONF_WARMUP_TIMES = "warmup_times"
+CONF_RESUME_MAX_TAGS = "resume_max_tags"
+CONF_RESUME_MAX_AGE = "resume_max_age"
+CONF_QUEUE_TAGS = "queue_tags"
+CONF_PLAYBACK_ONLY = "playback_only"
+CONF_COMMAND_EXPIRY = "command_expiry"
+CONF_TAP_STATISTICS = "tap_statistics"
+
+# Media types
+MEDIA_TYPE_PLAYLIST = "playlist"
+MEDIA_TYPE_FOLDER = "folder"
+MEDIA_TYPES = [MEDIA_TYPE_PLAYLIST, MEDIA_TYPE_FOLDER]
+
+# Mapping file formats of import_mappings and export_mappings
+FORMAT_CSV = "csv"
+FORMAT_JSON = "json"
+FORMAT_JSONL = "jsonl"
+FORMAT_YAML = "yaml"
+FORMATS = [FORMAT_CSV, FORMAT_JSON, FORMAT_JSONL, FORMAT_YAML]
 
 # Default values
-DEFAULT_MAPPING_FILE_PATH = "rfid_mappings.yaml"
\ No newline at end of file
+DEFAULT_MAPPING_FILE_PATH = "rfid_mappings.yaml"
+DEFAULT_MAPPING_CACHE_FILE = f"{DOMAIN}.mappings_cache"
+DEFAULT_REMOVAL_GRACE = 0.0
+DEFAULT_PRESENCE_CONFIRM = 0.0
+DEFAULT_JOURNAL_COMPACT_THRESHOLD = 100
+DEFAULT_RESOLVER_CACHE_SIZE = 512
+DEFAULT_RESOLVER_TTL = 24 * 3600
+DEFAULT_RESOLVER_REFRESH_INTERVAL = 6 * 3600
+DEFAULT_WARMUP = False
+DEFAULT_WARMUP_TAGS = 5
+DEFAULT_WARMUP_HISTORY = 200
+DEFAULT_WARMUP_COOLDOWN = 300
+DEFAULT_RESUME_MAX_TAGS = 50
+DEFAULT_RESUME_MAX_AGE = 30  # days
+DEFAULT_TIMING_SAMPLES = 200
+DEFAULT_TAG_DEDUPE_WINDOW = 2.0  # seconds
+DEFAULT_QUEUE_TAGS = 0
+DEFAULT_PLAYBACK_ONLY = False
+DEFAULT_TAP_STATISTICS = True
+DEFAULT_COMMAND_EXPIRY = 30  # seconds, 0 turns retries off
+DEFAULT_RETRY_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 16.0
+DEFAULT_QUEUE_REFRESH_INTERVAL = 3600
+DEFAULT_ANALYTICS_RETENTION = 90  # days
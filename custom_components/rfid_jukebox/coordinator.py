@@ -0,0 +1,534 @@
+"""Domain-wide coordinator shared by all RFID Jukebox boxes."""
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import voluptuous as vol
+from homeassistant.core import Event, HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers import event
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    DATA_COORDINATOR,
+    DEFAULT_JOURNAL_COMPACT_THRESHOLD,
+    DEFAULT_MAPPING_CACHE_FILE,
+    DEFAULT_MAPPING_FILE_PATH,
+    DEFAULT_RESOLVER_REFRESH_INTERVAL,
+    DOMAIN,
+    EVENT_TAG_SCANNED,
+    FORMATS,
+    MEDIA_TYPE_PLAYLIST,
+    MEDIA_TYPES,
+)
+from .models import TagMapping, normalize_tag_id
+from .store import OP_DELETE, OP_SET, MappingStore
+
+if TYPE_CHECKING:
+    from . import RFIDJukebox
+    from .playback import PlaybackPlan
+    from .resolver import MediaResolver
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_MAP_TAG = "map_tag"
+SERVICE_REMOVE_MAPPING = "remove_mapping"
+SERVICE_IMPORT_MAPPINGS = "import_mappings"
+SERVICE_EXPORT_MAPPINGS = "export_mappings"
+SERVICES = [SERVICE_MAP_TAG, SERVICE_REMOVE_MAPPING, SERVICE_IMPORT_MAPPINGS, SERVICE_EXPORT_MAPPINGS]
+
+MAP_TAG_SCHEMA = vol.Schema(
+    {
+        vol.Required("tag_id"): cv.string,
+        vol.Optional("media_type", default=MEDIA_TYPE_PLAYLIST): vol.In(MEDIA_TYPES),
+        vol.Required("media_name"): cv.string,
+        vol.Optional("alias"): cv.string,
+        vol.Optional("players"): cv.entity_ids,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+REMOVE_MAPPING_SCHEMA = vol.Schema(
+    {
+        vol.Required("tag_id"): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
+IMPORT_MAPPINGS_SCHEMA = vol.Schema(
+    {
+        vol.Required("file_path"): cv.string,
+        vol.Optional("format"): vol.In(FORMATS),
+        vol.Optional("overwrite", default=False): cv.boolean,
+        vol.Optional("dry_run", default=False): cv.boolean,
+    }
+)
+
+EXPORT_MAPPINGS_SCHEMA = vol.Schema(
+    {
+        vol.Required("file_path"): cv.string,
+        vol.Optional("format"): vol.In(FORMATS),
+    }
+)
+
+
+async def async_get_coordinator(hass: HomeAssistant) -> "JukeboxCoordinator":
+    """Return the coordinator, creating it and loading the mappings on first use."""
+    coordinator = hass.data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        coordinator = hass.data[DATA_COORDINATOR] = JukeboxCoordinator(hass)
+        coordinator.async_setup()
+    await coordinator.async_load()
+    return coordinator
+
+
+class JukeboxCoordinator:
+    """Own the mapping index, the state listener and the services.
+
+    Every box registers itself here. Tag sensor, player and group member
+    changes arrive through one state listener each and are handed to the box owning the
+    entity with one dict lookup. The mapping index is loaded once and
+    shared, so all boxes see the same tags, and the services are registered
+    once for the whole domain, taking the target box as a config entry ID.
+    Mappings are resolved once for all boxes on the same Music Assistant
+    filesystem.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the coordinator."""
+        self.hass = hass
+        self.mappings: Dict[str, TagMapping] = {}
+        self.store = None
+        self.boxes: Dict[str, "RFIDJukebox"] = {}
+        self._boxes_by_sensor: Dict[str, "RFIDJukebox"] = {}
+        self._boxes_by_player: Dict[str, "RFIDJukebox"] = {}
+        self._boxes_by_device: Dict[str, "RFIDJukebox"] = {}
+        # Players grouped with a box's player by a card, and the boxes that did.
+        self._boxes_by_member: Dict[str, List["RFIDJukebox"]] = {}
+        # (tracked entity IDs, remover) of the tag sensor, player and group member listeners.
+        self._sensor_listener: Optional[Tuple[FrozenSet[str], Callable[[], None]]] = None
+        self._player_listener: Optional[Tuple[FrozenSet[str], Callable[[], None]]] = None
+        self._member_listener: Optional[Tuple[FrozenSet[str], Callable[[], None]]] = None
+        self._unsub_tag_event: Optional[Callable[[], None]] = None
+        self._unsub_refresh: Optional[Callable[[], None]] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_again = False
+
+    @callback
+    def async_setup(self) -> None:
+        """Register the domain services and listen for tag scan events."""
+        self._unsub_tag_event = self.hass.bus.async_listen(EVENT_TAG_SCANNED, self._async_tag_event)
+        self._unsub_refresh = event.async_track_time_interval(
+            self.hass,
+            self._async_refresh_interval,
+            timedelta(seconds=DEFAULT_RESOLVER_REFRESH_INTERVAL),
+        )
+        self.hass.services.async_register(
+            DOMAIN, SERVICE_MAP_TAG, self._async_map_tag_service, schema=MAP_TAG_SCHEMA
+        )
+        self.hass.services.async_register(
+            DOMAIN,
+            SERVICE_REMOVE_MAPPING,
+            self._async_remove_mapping_service,
+            schema=REMOVE_MAPPING_SCHEMA,
+        )
+        self.hass.services.async_register(
+            DOMAIN,
+            SERVICE_IMPORT_MAPPINGS,
+            self._async_import_mappings_service,
+            schema=IMPORT_MAPPINGS_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+        self.hass.services.async_register(
+            DOMAIN,
+            SERVICE_EXPORT_MAPPINGS,
+            self._async_export_mappings_service,
+            schema=EXPORT_MAPPINGS_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    async def async_load(self) -> None:
+        """Load the shared mapping index; concurrent callers share one load."""
+        if self._load_task is None:
+            self._load_task = self.hass.async_create_task(self._async_load())
+        try:
+            await self._load_task
+        except Exception:
+            self._load_task = None
+            raise
+
+    async def _async_load(self) -> None:
+        self.store = MappingStore(
+            self.hass,
+            self.hass.config.path(DEFAULT_MAPPING_FILE_PATH),
+            DEFAULT_JOURNAL_COMPACT_THRESHOLD,
+            cache_path=self.hass.config.path(STORAGE_DIR, DEFAULT_MAPPING_CACHE_FILE),
+        )
+        # Boxes hold a reference to this dict, so it is filled in place.
+        self.mappings.update(await self.hass.async_add_executor_job(self.store.load))
+
+    @callback
+    def async_add_box(self, box: "RFIDJukebox") -> None:
+        """Start dispatching tag events to a box."""
+        tag_sensor = box.plan.tag_sensor
+        other = self._boxes_by_sensor.get(tag_sensor)
+        if other is not None and other is not box:
+            _LOGGER.warning(
+                "%s is used by more than one jukebox, only '%s' will react to it",
+                tag_sensor,
+                box.entry.title,
+            )
+        self.boxes[box.entry.entry_id] = box
+        self._boxes_by_sensor[tag_sensor] = box
+        self._boxes_by_player[box.plan.media_player] = box
+        # Scan events carry the device of the reader, the tag sensor's device.
+        sensor_entry = er.async_get(self.hass).async_get(tag_sensor)
+        if sensor_entry and sensor_entry.device_id:
+            self._boxes_by_device[sensor_entry.device_id] = box
+        self._async_resubscribe()
+
+    @callback
+    def async_update_box(self, box: "RFIDJukebox", previous: "PlaybackPlan") -> None:
+        """Re-key a box whose tag sensor or player changed.
+
+        Only the listener whose entities changed is replaced, so swapping
+        the player leaves the tag sensor listener, and any tap on its way
+        through it, alone.
+        """
+        if self._boxes_by_sensor.get(previous.tag_sensor) is box:
+            del self._boxes_by_sensor[previous.tag_sensor]
+        if self._boxes_by_player.get(previous.media_player) is box:
+            del self._boxes_by_player[previous.media_player]
+        self._async_forget_device(box)
+        self.async_add_box(box)
+
+    @callback
+    def async_update_group(self, box: "RFIDJukebox") -> None:
+        """Follow the players ``box`` has grouped with its own."""
+        self._async_resubscribe()
+
+    @callback
+    def async_remove_box(self, box: "RFIDJukebox") -> None:
+        """Stop dispatching to a box; tear down when the last one goes."""
+        self.boxes.pop(box.entry.entry_id, None)
+        tag_sensor = box.plan.tag_sensor
+        if self._boxes_by_sensor.get(tag_sensor) is box:
+            del self._boxes_by_sensor[tag_sensor]
+        media_player = box.plan.media_player
+        if self._boxes_by_player.get(media_player) is box:
+            del self._boxes_by_player[media_player]
+        self._async_forget_device(box)
+        if self.boxes:
+            self._async_resubscribe()
+            return
+
+        for _, unsub in filter(None, (self._sensor_listener, self._player_listener, self._member_listener)):
+            unsub()
+        self._sensor_listener = self._player_listener = self._member_listener = None
+        self._boxes_by_member = {}
+        if self._unsub_tag_event:
+            self._unsub_tag_event()
+            self._unsub_tag_event = None
+        if self._unsub_refresh:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        for service in SERVICES:
+            self.hass.services.async_remove(DOMAIN, service)
+        self.hass.data.pop(DATA_COORDINATOR, None)
+
+    @callback
+    def async_refresh_media(self, mappings: Optional[List[TagMapping]] = None) -> None:
+        """Resolve mappings in the background for every box.
+
+        Without ``mappings``, all of them are resolved; a request made while
+        such a refresh runs is served by one more refresh after it.
+        """
+        if mappings is not None:
+            self.hass.async_create_background_task(
+                self._async_refresh_media(mappings), f"{DOMAIN}_resolve_changed"
+            )
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_again = True
+            return
+        self._refresh_task = self.hass.async_create_background_task(
+            self._async_refresh_all(), f"{DOMAIN}_resolve_mappings"
+        )
+
+    @callback
+    def _async_refresh_interval(self, _now) -> None:
+        """Resolve every mapping again, as results go stale."""
+        self.async_refresh_media()
+
+    async def _async_refresh_all(self) -> None:
+        """Resolve every mapping, again if asked to meanwhile."""
+        while True:
+            self._refresh_again = False
+            await self._async_refresh_media(None)
+            if not self._refresh_again:
+                return
+
+    async def _async_refresh_media(self, mappings: Optional[List[TagMapping]]) -> None:
+        """Resolve ``mappings``, or all of them, once per Music Assistant filesystem.
+
+        One box of each group resolves; the others adopt its results.
+        """
+        prune = mappings is None
+        if prune:
+            mappings = list(self.mappings.values())
+        groups: Dict[Tuple[Optional[str], Optional[str]], List["MediaResolver"]] = {}
+        for box in self.boxes.values():
+            groups.setdefault(box.resolver.share_key, []).append(box.resolver)
+
+        async def _refresh(resolvers: List["MediaResolver"]) -> None:
+            await resolvers[0].async_refresh(mappings, prune)
+            for resolver in resolvers[1:]:
+                resolver.adopt(resolvers[0], mappings, prune)
+
+        await asyncio.gather(*(_refresh(resolvers) for resolvers in groups.values()))
+
+    @callback
+    def _async_forget_device(self, box: "RFIDJukebox") -> None:
+        """Stop routing scan events of a box's reader to it."""
+        for device_id in [device_id for device_id, other in self._boxes_by_device.items() if other is box]:
+            del self._boxes_by_device[device_id]
+
+    @callback
+    def _async_resubscribe(self) -> None:
+        """Listen to the tag sensors, the players and the group members of all boxes."""
+        self._sensor_listener = self._async_track(
+            self._sensor_listener, frozenset(self._boxes_by_sensor), self._async_state_changed
+        )
+        self._player_listener = self._async_track(
+            self._player_listener, frozenset(self._boxes_by_player), self._async_state_changed
+        )
+        by_member: Dict[str, List["RFIDJukebox"]] = {}
+        for box in self.boxes.values():
+            for member in box.group:
+                by_member.setdefault(member, []).append(box)
+        self._boxes_by_member = by_member
+        self._member_listener = self._async_track(
+            self._member_listener, frozenset(by_member), self._async_member_changed
+        )
+
+    @callback
+    def _async_track(
+        self,
+        listener: Optional[Tuple[FrozenSet[str], Callable[[], None]]],
+        entity_ids: FrozenSet[str],
+        action: Callable[[Event], None],
+    ) -> Optional[Tuple[FrozenSet[str], Callable[[], None]]]:
+        """Return a listener for ``entity_ids``, replacing ``listener`` if it tracks others.
+
+        The new listener is subscribed before the old one is removed.
+        """
+        if listener is not None and listener[0] == entity_ids:
+            return listener
+        new = None
+        if entity_ids:
+            new = (
+                entity_ids,
+                event.async_track_state_change_event(self.hass, list(entity_ids), action),
+            )
+        if listener is not None:
+            listener[1]()
+        return new
+
+    @callback
+    def _async_state_changed(self, event_data: Event) -> None:
+        """Hand a state change to the box that owns the entity."""
+        entity_id = event_data.data.get("entity_id")
+        box = self._boxes_by_sensor.get(entity_id)
+        if box is not None:
+            box.async_tag_changed_handler(event_data)
+            return
+        box = self._boxes_by_player.get(entity_id)
+        if box is not None:
+            box.async_player_changed(event_data)
+
+    @callback
+    def _async_member_changed(self, event_data: Event) -> None:
+        """Hand a state change of a group member to the boxes that grouped it."""
+        for box in self._boxes_by_member.get(event_data.data.get("entity_id"), ()):
+            box.async_member_changed(event_data)
+
+    @callback
+    def _async_tag_event(self, event_data: Event) -> None:
+        """Hand a tag scan event fired by a reader to its box."""
+        box = self._boxes_by_device.get(event_data.data.get("device_id"))
+        if box is None and len(self.boxes) == 1:
+            # A single box needs no routing, even if its reader is unknown.
+            box = next(iter(self.boxes.values()))
+        if box is not None:
+            box.async_tag_event(event_data)
+        else:
+            _LOGGER.debug("Tag scan event from unknown reader: %s", event_data.data)
+
+    async def async_map_tag(
+        self,
+        tag_id: str,
+        media_type: str,
+        media_name: str,
+        alias: Optional[str] = None,
+        box: Optional["RFIDJukebox"] = None,
+        players: Optional[List[str]] = None,
+    ) -> None:
+        """Map a tag to a media item for all boxes and save it.
+
+        ``box`` is the box the mapping was made on, if any. ``players`` are
+        played on together with the player of the box the tag is tapped on.
+        """
+        if not tag_id or not media_name:
+            _LOGGER.error(
+                "Cannot map tag. Tag ID or Media Name is missing. Tag: '%s', Media: '%s'",
+                tag_id,
+                media_name,
+            )
+            return
+
+        tag_id = normalize_tag_id(tag_id)
+        mapping = TagMapping.from_raw(
+            tag_id, {"type": media_type, "name": media_name, "alias": alias, "players": players}
+        )
+        _LOGGER.info(
+            "Mapping tag '%s' to %s '%s'%s",
+            tag_id,
+            mapping.media_type,
+            mapping.name,
+            f" from {box.entry.title}" if box else "",
+        )
+        await self.async_apply({tag_id: mapping})
+
+    async def async_apply(self, changes: Dict[str, Optional[TagMapping]]) -> int:
+        """Apply a batch of mapping changes; None removes a tag.
+
+        The batch is persisted with a single store write, and the shared
+        index is only updated once that write went through. The new media is
+        resolved right away. Returns the number of changed tags.
+        """
+        operations = []
+        staged: Dict[str, Optional[TagMapping]] = {}
+        updates: List[Tuple[Optional[TagMapping], Optional[TagMapping]]] = []
+        for tag_id, mapping in changes.items():
+            previous = self.mappings.get(tag_id)
+            if mapping is None:
+                if previous is None:
+                    continue
+                operations.append((OP_DELETE, tag_id, None))
+            else:
+                operations.append((OP_SET, tag_id, mapping.as_dict()))
+            staged[tag_id] = mapping
+            updates.append((previous, mapping))
+        if not operations:
+            return 0
+
+        try:
+            await self.hass.async_add_executor_job(self.store.apply, operations)
+        except OSError as err:
+            raise HomeAssistantError(f"Could not save the tag mappings: {err}") from err
+        for tag_id, mapping in staged.items():
+            if mapping is None:
+                self.mappings.pop(tag_id, None)
+            else:
+                self.mappings[tag_id] = mapping
+        for box in self.boxes.values():
+            box.async_mappings_changed(updates)
+        changed = [mapping for _previous, mapping in updates if mapping is not None]
+        if changed:
+            self.async_refresh_media(changed)
+        return len(updates)
+
+    def _resolve_path(self, file_path: str) -> str:
+        """Return the absolute path of a service file, relative to the config dir.
+
+        Files in the config dir are allowed, others only from the directories
+        in ``allowlist_external_dirs``.
+        """
+        config_dir = os.path.realpath(self.hass.config.config_dir)
+        path = os.path.realpath(os.path.join(config_dir, file_path))
+        inside_config = os.path.commonpath([config_dir, path]) == config_dir
+        if not inside_config and not self.hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Access to {file_path} is not allowed")
+        return path
+
+    async def _async_map_tag_service(self, service_call: ServiceCall) -> None:
+        """Handle the map_tag service call."""
+        box = None
+        entry_id = service_call.data.get(ATTR_CONFIG_ENTRY_ID)
+        if entry_id:
+            box = self.boxes.get(entry_id)
+            if box is None:
+                raise HomeAssistantError(f"No RFID Jukebox with config entry ID {entry_id}")
+        await self.async_map_tag(
+            service_call.data["tag_id"],
+            service_call.data["media_type"],
+            service_call.data["media_name"],
+            service_call.data.get("alias"),
+            box,
+            service_call.data.get("players"),
+        )
+
+    async def _async_remove_mapping_service(self, service_call: ServiceCall) -> None:
+        """Handle the remove_mapping service call."""
+        changes = {normalize_tag_id(tag_id): None for tag_id in service_call.data["tag_id"]}
+        unknown = [tag_id for tag_id in changes if tag_id not in self.mappings]
+        if unknown:
+            _LOGGER.warning("Cannot remove unmapped tags: %s", ", ".join(unknown))
+        removed = await self.async_apply(changes)
+        _LOGGER.info("Removed %d mappings", removed)
+
+    async def _async_import_mappings_service(self, service_call: ServiceCall) -> ServiceResponse:
+        """Handle the import_mappings service call."""
+        # Bulk transfers are rare; their module stays out of setup.
+        from .transfer import TransferError, plan_import
+
+        path = self._resolve_path(service_call.data["file_path"])
+        dry_run = service_call.data["dry_run"]
+        try:
+            changes, report = await self.hass.async_add_executor_job(
+                plan_import,
+                path,
+                service_call.data.get("format"),
+                dict(self.mappings),
+                service_call.data["overwrite"],
+                dry_run,
+            )
+        except TransferError as err:
+            raise HomeAssistantError(str(err)) from err
+
+        if not dry_run:
+            await self.async_apply(changes)
+        result = report.as_dict()
+        _LOGGER.info(
+            "%s %s: %d added, %d updated, %d unchanged, %d skipped, %d errors",
+            "Checked" if dry_run else "Imported",
+            path,
+            result["added"],
+            result["updated"],
+            result["unchanged"],
+            result["skipped"],
+            result["error_count"],
+        )
+        return result
+
+    async def _async_export_mappings_service(self, service_call: ServiceCall) -> ServiceResponse:
+        """Handle the export_mappings service call."""
+        from .transfer import TransferError, write_export
+
+        path = self._resolve_path(service_call.data["file_path"])
+        mappings = sorted(self.mappings.values(), key=lambda mapping: mapping.tag_id)
+        try:
+            count = await self.hass.async_add_executor_job(
+                write_export, path, service_call.data.get("format"), mappings
+            )
+        except TransferError as err:
+            raise HomeAssistantError(str(err)) from err
+        _LOGGER.info("Exported %d mappings to %s", count, path)
+        return {"file_path": path, "mappings": count}
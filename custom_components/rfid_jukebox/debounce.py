@@ -0,0 +1,137 @@
+"""Debouncing of flapping RFID tag sensor states."""
+import logging
+from typing import Callable, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TagDebouncer:
+    """Filter present/removed bursts from a tag lying at the edge of the reader.
+
+    A removal is only reported once the tag has stayed away for the removal
+    grace window, and a presence only once the tag has stayed for the presence
+    confirmation window. Either window can be zero to report immediately.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        on_present: Callable[[str], None],
+        on_removed: Callable[[], None],
+        removal_grace: float = 0.0,
+        presence_confirm: float = 0.0,
+        on_absorbed: Optional[Callable[[], None]] = None,
+    ):
+        """Initialize the debouncer."""
+        self.hass = hass
+        self.removal_grace = removal_grace
+        self.presence_confirm = presence_confirm
+        self._on_present = on_present
+        self._on_removed = on_removed
+        self._on_absorbed = on_absorbed
+        self._tag: Optional[str] = None
+        self._pending_tag: Optional[str] = None
+        self._cancel_removal: Optional[Callable[[], None]] = None
+        self._cancel_presence: Optional[Callable[[], None]] = None
+        self.absorbed_removals = 0
+        self.absorbed_presences = 0
+
+    @property
+    def flaps_absorbed(self) -> int:
+        """Return the total number of state changes that were swallowed."""
+        return self.absorbed_removals + self.absorbed_presences
+
+    @property
+    def removal_pending(self) -> bool:
+        """Return True while a removal waits out the grace window."""
+        return self._cancel_removal is not None
+
+    @callback
+    def async_present(self, tag: str) -> None:
+        """Handle a tag being reported by the reader."""
+        if self._cancel_presence:
+            if tag == self._pending_tag:
+                return
+            self._cancel_presence()
+            self._cancel_presence = None
+
+        if self._cancel_removal:
+            self._cancel_removal()
+            self._cancel_removal = None
+            if tag == self._tag:
+                _LOGGER.debug("Absorbed dropout of tag %s", tag)
+                self.absorbed_removals += 1
+                self._absorbed()
+                return
+            # A different tag arrived; the old one is definitely gone.
+            self._removed()
+
+        if self.presence_confirm <= 0:
+            self._present(tag)
+            return
+
+        self._pending_tag = tag
+        self._cancel_presence = event.async_call_later(
+            self.hass, self.presence_confirm, self._async_presence_confirmed
+        )
+
+    @callback
+    def async_removed(self) -> None:
+        """Handle the reader reporting that no tag is present."""
+        if self._cancel_presence:
+            self._cancel_presence()
+            self._cancel_presence = None
+            _LOGGER.debug("Absorbed unconfirmed tag %s", self._pending_tag)
+            self._pending_tag = None
+            self.absorbed_presences += 1
+            self._absorbed()
+            return
+
+        if self._cancel_removal:
+            return
+
+        if self.removal_grace <= 0 or self._tag is None:
+            self._removed()
+            return
+
+        self._cancel_removal = event.async_call_later(
+            self.hass, self.removal_grace, self._async_removal_confirmed
+        )
+
+    @callback
+    def async_cancel(self) -> None:
+        """Cancel any pending timers."""
+        if self._cancel_presence:
+            self._cancel_presence()
+            self._cancel_presence = None
+        if self._cancel_removal:
+            self._cancel_removal()
+            self._cancel_removal = None
+
+    @callback
+    def _async_presence_confirmed(self, _now) -> None:
+        """Report the pending tag once it stayed for the confirmation window."""
+        self._cancel_presence = None
+        tag, self._pending_tag = self._pending_tag, None
+        self._present(tag)
+
+    @callback
+    def _async_removal_confirmed(self, _now) -> None:
+        """Report the removal once the tag stayed away for the grace window."""
+        self._cancel_removal = None
+        self._removed()
+
+    def _present(self, tag: str) -> None:
+        self._tag = tag
+        self._on_present(tag)
+
+    def _removed(self) -> None:
+        self._tag = None
+        self._on_removed()
+
+    def _absorbed(self) -> None:
+        if self._on_absorbed:
+            self._on_absorbed()
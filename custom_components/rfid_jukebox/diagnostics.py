@@ -0,0 +1,45 @@
+"""Diagnostics support for RFID Jukebox."""
+from typing import Any, Dict
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> Dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    jukebox = hass.data[DOMAIN][entry.entry_id]
+    warmup = jukebox.warmup
+    return {
+        "config": dict(jukebox.config),
+        "mappings": len(jukebox.mappings),
+        "setup": jukebox.setup_stats,
+        "resolver": jukebox.resolver.diagnostics(),
+        "playback": jukebox.playback.diagnostics(),
+        "debounce": {
+            "absorbed_removals": jukebox.debouncer.absorbed_removals,
+            "absorbed_presences": jukebox.debouncer.absorbed_presences,
+        },
+        "scans": dict(jukebox.scans),
+        "session": jukebox.session.diagnostics(),
+        "timings": jukebox.timings.diagnostics(),
+        "group": {
+            "members": list(jukebox.group),
+            "calls": jukebox.group_timings.recorded,
+            **jukebox.group_timings.stats(),
+        },
+        "queues": jukebox.queues.diagnostics() if jukebox.queues is not None else None,
+        "analytics": jukebox.analytics.diagnostics() if jukebox.analytics is not None else None,
+        "resume": {
+            "tags": len(jukebox.resume),
+            "resumed": jukebox.resume.resumed,
+        },
+        "warmup": {
+            "runs": warmup.runs,
+            "times": [f"{hour:02d}:{minute:02d}" for hour, minute in warmup.times],
+            "likely_tags": warmup.likely_tags(),
+        }
+        if warmup
+        else None,
+    }
@@ -1,5 +1,7 @@
 """Helper functions for the RFID Jukebox integration."""
 import logging
+import os
+import tempfile
 from typing import Dict
 
 import yaml
@@ -8,29 +10,77 @@ from homeassistant.core import HomeAssistant
 _LOGGER = logging.getLogger(__name__)
 
 
+def safe_loader():
+    """Return PyYAML's safe loader, libyaml's when PyYAML was built with it.
+
+    libyaml's loader is an order of magnitude faster.
+    """
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def safe_dumper():
+    """Return PyYAML's safe dumper, libyaml's when PyYAML was built with it."""
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+class MappingFileError(Exception):
+    """The mapping file exists but cannot be read as a dictionary."""
+
+
 def load_mappings(hass: HomeAssistant, file_path: str) -> Dict[str, Dict[str, str]]:
-    """Load tag mappings from a YAML file."""
+    """Load tag mappings from a YAML file.
+
+    A missing or empty file has no mappings. Raises MappingFileError if the
+    file cannot be read or parsed, or does not hold a dictionary.
+    """
     try:
         with open(file_path, "r", encoding="utf-8") as f:
-            mappings = yaml.safe_load(f)
-            if isinstance(mappings, dict):
-                _LOGGER.info("Loaded %d mappings from %s", len(mappings), file_path)
-                return mappings
-            _LOGGER.warning("Mapping file %s is not a valid dictionary.", file_path)
-            return {}
+            mappings = yaml.load(f, Loader=safe_loader())
     except FileNotFoundError:
         _LOGGER.debug("Mapping file not found at %s, starting with empty map.", file_path)
         return {}
-    except yaml.YAMLError as e:
-        _LOGGER.error("Error reading mapping file %s: %s", file_path, e)
+    except (OSError, UnicodeDecodeError, yaml.YAMLError) as e:
+        raise MappingFileError(f"Error reading mapping file {file_path}: {e}") from e
+    if mappings is None:
         return {}
+    if not isinstance(mappings, dict):
+        raise MappingFileError(f"Mapping file {file_path} is not a valid dictionary")
+    _LOGGER.info("Loaded %d mappings from %s", len(mappings), file_path)
+    return mappings
+
+
+def write_mappings_atomic(file_path: str, mappings: Dict[str, Dict[str, str]]) -> None:
+    """Write tag mappings to a YAML file via write-rename.
+
+    The file is either fully replaced or left untouched, even on power loss.
+    Raises OSError or yaml.YAMLError on failure.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".rfid_mappings.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            yaml.dump(mappings, f, Dumper=safe_dumper(), default_flow_style=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
 
 
-def save_mappings(hass: HomeAssistant, file_path: str, mappings: Dict[str, Dict[str, str]]) -> None:
-    """Save tag mappings to a YAML file."""
+def fsync_directory(directory: str) -> None:
+    """Flush a directory entry so a rename survives power loss."""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            yaml.dump(mappings, f, default_flow_style=False)
-            _LOGGER.info("Saved %d mappings to %s", len(mappings), file_path)
-    except Exception as e:
-        _LOGGER.error("Error saving mapping file %s: %s", file_path, e)
\ No newline at end of file
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,138 @@
+"""Data models for the RFID Jukebox integration."""
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from .const import MEDIA_TYPE_FOLDER, MEDIA_TYPE_PLAYLIST, MEDIA_TYPES
+
+_LOGGER = logging.getLogger(__name__)
+
+_UID_SEPARATORS = re.compile(r"[\s:\-.]+")
+_HEX = re.compile(r"^[0-9A-Fa-f]+$")
+_PLAYER_SEPARATORS = re.compile(r"[\s,]+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_tag_id(tag_id: Any) -> str:
+    """Return the canonical form of a tag ID.
+
+    UIDs are written the way ESPHome's PN532 component reports them:
+    upper-case hex bytes joined by dashes (``74-10-37-94``). Colon, dot or
+    space separated UIDs, single-digit bytes and hex strings of four or more
+    bytes are converted. Anything else is only stripped.
+    """
+    tag = str(tag_id).strip()
+    parts = [part for part in _UID_SEPARATORS.split(tag) if part]
+    if not parts or not all(_HEX.match(part) for part in parts):
+        return tag
+    if len(parts) > 1:
+        if all(len(part) <= 2 for part in parts):
+            return "-".join(part.upper().zfill(2) for part in parts)
+        if any(len(part) % 2 for part in parts):
+            return tag
+    digits = "".join(parts)
+    if len(digits) >= 8 and len(digits) % 2 == 0:
+        return "-".join(digits[i : i + 2].upper() for i in range(0, len(digits), 2))
+    return tag
+
+
+def parse_players(raw: Any) -> Tuple[str, ...]:
+    """Return the media players of a list, or of a comma or space separated string."""
+    if not raw:
+        return ()
+    if isinstance(raw, str):
+        raw = _PLAYER_SEPARATORS.split(raw)
+    elif not isinstance(raw, (list, tuple)):
+        return ()
+    players = (str(player).strip() for player in raw)
+    return tuple(dict.fromkeys(player for player in players if player))
+
+
+class TagMapping:
+    """A normalized mapping from a tag to a media item.
+
+    ``players`` are further media players the media plays on together with
+    the box's own player, as one group.
+    """
+
+    __slots__ = ("tag_id", "media_type", "name", "alias", "players")
+
+    def __init__(self, tag_id: str, media_type: str, name: str, alias: str, players: Tuple[str, ...] = ()):
+        """Initialize the mapping."""
+        self.tag_id = tag_id
+        self.media_type = media_type
+        self.name = name
+        self.alias = alias
+        self.players = players
+
+    @classmethod
+    def from_raw(cls, tag_id: str, raw: Any) -> Optional["TagMapping"]:
+        """Build a mapping from a stored value, upgrading the legacy string format."""
+        if isinstance(raw, str):
+            # Legacy format: the value is a playlist name.
+            return cls(tag_id, MEDIA_TYPE_PLAYLIST, raw, tag_id) if raw else None
+        if not isinstance(raw, dict):
+            return None
+        name = raw.get("name")
+        if not name:
+            return None
+        media_type = raw.get("type") or MEDIA_TYPE_PLAYLIST
+        if media_type not in MEDIA_TYPES:
+            _LOGGER.warning("Unknown media type '%s' for tag %s, using playlist", media_type, tag_id)
+            media_type = MEDIA_TYPE_PLAYLIST
+        return cls(
+            tag_id, media_type, str(name), str(raw.get("alias") or tag_id), parse_players(raw.get("players"))
+        )
+
+    @property
+    def is_folder(self) -> bool:
+        """Return True if the mapping points at a filesystem folder."""
+        return self.media_type == MEDIA_TYPE_FOLDER
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the mapping in the on-disk format."""
+        stored: Dict[str, Any] = {"type": self.media_type, "name": self.name, "alias": self.alias}
+        if self.players:
+            stored["players"] = list(self.players)
+        return stored
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare two mappings by value."""
+        if not isinstance(other, TagMapping):
+            return NotImplemented
+        return (
+            self.tag_id == other.tag_id
+            and self.media_type == other.media_type
+            and self.name == other.name
+            and self.alias == other.alias
+            and self.players == other.players
+        )
+
+    def __repr__(self) -> str:
+        """Return a debug representation."""
+        return (
+            f"TagMapping({self.tag_id!r}, {self.media_type!r}, {self.name!r}, {self.alias!r}, {self.players!r})"
+        )
+
+
+def build_index(raw_mappings: Dict[Any, Any]) -> Tuple[Dict[str, TagMapping], List[Tuple[Any, TagMapping]]]:
+    """Normalize stored mappings into an index keyed by canonical tag ID.
+
+    Returns the index and the ``(stored_key, mapping)`` pairs whose stored
+    form differs from the normalized one and should be rewritten.
+    """
+    index: Dict[str, TagMapping] = {}
+    upgrades: List[Tuple[Any, TagMapping]] = []
+    for key, raw in raw_mappings.items():
+        tag_id = normalize_tag_id(key)
+        mapping = TagMapping.from_raw(tag_id, raw)
+        if mapping is None:
+            _LOGGER.warning("Ignoring invalid mapping for tag %s: %s", key, raw)
+            continue
+        if tag_id in index and index[tag_id] != mapping:
+            _LOGGER.warning("Tag IDs normalizing to %s map to different media, keeping %s", tag_id, key)
+        index[tag_id] = mapping
+        if key != tag_id or raw != mapping.as_dict():
+            upgrades.append((key, mapping))
+    return index, upgrades
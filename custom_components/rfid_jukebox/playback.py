@@ -0,0 +1,420 @@
+"""Playback command dispatch for the RFID Jukebox integration."""
+import asyncio
+import logging
+from collections import deque
+import time
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError, ServiceNotFound, ServiceValidationError
+
+from .const import CONF_MA_FILESYSTEM, CONF_MEDIA_PLAYER, CONF_TAG_SENSOR
+from .resolver import folder_path
+
+_LOGGER = logging.getLogger(__name__)
+
+KIND_START = "start"
+KIND_RESUME = "resume"
+KIND_PAUSE = "pause"
+
+_OPPOSITE = {KIND_PAUSE: KIND_RESUME, KIND_RESUME: KIND_PAUSE}
+
+
+class PlaybackPlan:
+    """The entities and service targets of a jukebox, worked out once.
+
+    Built from the validated config entry so the tap path does no config
+    lookups. ``target`` is the service data addressing the player.
+    """
+
+    __slots__ = ("tag_sensor", "media_player", "filesystem", "folder_prefix", "target")
+
+    def __init__(self, tag_sensor: str, media_player: str, filesystem: Optional[str]):
+        """Initialize the plan."""
+        self.tag_sensor = tag_sensor
+        self.media_player = media_player
+        self.filesystem = filesystem or None
+        self.folder_prefix = f"{filesystem}://folder/" if filesystem else None
+        self.target = {"entity_id": media_player}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "PlaybackPlan":
+        """Build the plan of a config entry's data and options."""
+        filesystem = config.get(CONF_MA_FILESYSTEM)
+        return cls(
+            config[CONF_TAG_SENSOR],
+            config[CONF_MEDIA_PLAYER],
+            filesystem.strip() if filesystem else None,
+        )
+
+    def folder_media_id(self, folder_name: str) -> Optional[str]:
+        """Return the media ID of a folder, or None without a filesystem."""
+        if self.folder_prefix is None:
+            return None
+        return self.folder_prefix + folder_path(folder_name)
+
+    def group_target(self, members: Sequence[str]) -> Dict[str, Any]:
+        """Return the service data addressing the player and its group members."""
+        if not members:
+            return self.target
+        return {"entity_id": [self.media_player, *members]}
+
+    def play_media(self, media_id: Any, media_type: str, enqueue: Optional[str] = None) -> Dict[str, Any]:
+        """Return the ``music_assistant.play_media`` data for the player."""
+        data = {"entity_id": self.media_player, "media_id": media_id, "media_type": media_type}
+        if enqueue:
+            data["enqueue"] = enqueue
+        return data
+
+
+class PlaybackCommand:
+    """A service call queued for a jukebox.
+
+    ``prepare`` and ``steps`` are further ``(domain, service, data)`` calls
+    sent before and right after the main one, as part of the same command;
+    a failed call ends it and a newer start cancels the whole sequence.
+    ``trace`` is the tap trace the command is timed in, if any.
+
+    A call addressing a list of entities is sent to each of them at once;
+    ``member_times`` then holds how long each one took, in milliseconds.
+    ``attempts`` counts failed sends, and ``retry_at`` is the monotonic
+    time of the next one. ``sent`` is the ``perf_counter`` time the latest
+    send began. ``retry`` is cleared for commands known to fail for good,
+    such as a start of media the resolver found broken.
+    """
+
+    __slots__ = (
+        "kind",
+        "domain",
+        "service",
+        "data",
+        "error_message",
+        "prepare",
+        "steps",
+        "trace",
+        "member_times",
+        "created",
+        "attempts",
+        "retry_at",
+        "sent",
+        "retry",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        domain: str,
+        service: str,
+        data: Dict[str, Any],
+        error_message: str,
+        steps: Sequence[Tuple[str, str, Dict[str, Any]]] = (),
+    ):
+        """Initialize the command."""
+        self.kind = kind
+        self.domain = domain
+        self.service = service
+        self.data = data
+        self.error_message = error_message
+        self.prepare: Sequence[Tuple[str, str, Dict[str, Any]]] = ()
+        self.steps = steps
+        self.trace = None
+        self.member_times: Optional[Dict[str, float]] = None
+        self.created = time.monotonic()
+        self.attempts = 0
+        self.retry_at: Optional[float] = None
+        self.sent: Optional[float] = None
+        self.retry = True
+
+
+class PlaybackQueue:
+    """Latest-wins playback command queue for one jukebox.
+
+    Commands are sent one at a time in a background task so the tag handler
+    never waits on Music Assistant. A start supersedes everything queued and
+    cancels the command in flight; a pause or resume that has not been sent
+    yet cancels out against its opposite.
+
+    A command that fails while Music Assistant or the player is unavailable
+    is sent again after ``retry_delay`` seconds, doubling up to
+    ``retry_max_delay``, as long as nothing newer was submitted meanwhile; a newer command replaces it, so only the latest
+    intent is replayed. Commands older than ``expiry`` seconds are dropped
+    instead of sent. An ``expiry`` of 0 turns retries and expiry off. Other
+    failures, such as invalid service data or media that does not exist,
+    are given up at once.
+
+    ``on_complete`` is called with each command that was sent successfully,
+    ``on_error`` with each command that failed for good, expired or was
+    replaced while waiting for a retry.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        on_complete: Optional[Callable[[PlaybackCommand], None]] = None,
+        on_error: Optional[Callable[[PlaybackCommand], None]] = None,
+        expiry: float = 0.0,
+        retry_delay: float = 1.0,
+        retry_max_delay: float = 16.0,
+    ):
+        """Initialize the queue."""
+        self.hass = hass
+        self._on_complete = on_complete
+        self._on_error = on_error
+        self.expiry = expiry
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self._queue: Deque[PlaybackCommand] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[PlaybackCommand] = None
+        self._wake: Optional[asyncio.Future] = None
+        self._generation = 0
+        self._listeners: List[Callable[["PlaybackQueue"], None]] = []
+        self._notify = None
+        self.superseded = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.expired = 0
+
+    @property
+    def intent(self) -> Optional[str]:
+        """Return the kind of the newest command that has not completed yet."""
+        if self._queue:
+            return self._queue[-1].kind
+        return self._inflight.kind if self._inflight else None
+
+    @property
+    def depth(self) -> int:
+        """Return the number of commands queued, in flight or waiting for a retry."""
+        return len(self._queue) + (self._inflight is not None)
+
+    @property
+    def retrying(self) -> Optional[PlaybackCommand]:
+        """Return the command waiting for or being sent in a retry, if any."""
+        command = self._inflight
+        return command if command is not None and command.attempts else None
+
+    def pending(self, command: PlaybackCommand) -> bool:
+        """Return True if a command is still queued, in flight or waiting for a retry."""
+        return command is self._inflight or any(queued is command for queued in self._queue)
+
+    @callback
+    def add_listener(self, listener: Callable[["PlaybackQueue"], None]) -> Callable[[], None]:
+        """Call ``listener`` after the queue changed; return a remover."""
+        self._listeners.append(listener)
+
+        @callback
+        def _remove() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return _remove
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the queue state and counters."""
+        retrying = self.retrying
+        return {
+            "intent": self.intent,
+            "depth": self.depth,
+            "retrying": retrying.kind if retrying else None,
+            "attempts": retrying.attempts if retrying else 0,
+            "superseded": self.superseded,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "expired": self.expired,
+        }
+
+    @callback
+    def async_submit(self, command: PlaybackCommand) -> Optional[PlaybackCommand]:
+        """Queue a command and make sure the worker is running.
+
+        Returns the command whose completion carries out the request: the
+        command itself, or the pending one it duplicates. Returns the
+        command in flight, if any, when it cancelled out a queued one.
+        """
+        if command.kind == KIND_START:
+            self.superseded += len(self._queue)
+            self._queue.clear()
+            if self._task and not self._task.done():
+                self.superseded += 1
+                self._cancel_worker()
+        elif self._queue and self._queue[-1].kind == _OPPOSITE[command.kind]:
+            self._queue.pop()
+            self.coalesced += 1
+            _LOGGER.debug("Coalesced %s with queued %s", command.kind, _OPPOSITE[command.kind])
+            self._async_changed()
+            return self._inflight
+        elif self.intent == command.kind:
+            _LOGGER.debug("Dropping duplicate %s command", command.kind)
+            return self._queue[-1] if self._queue else self._inflight
+
+        self._queue.append(command)
+        if self._wake is not None and not self._wake.done():
+            # Replaces the command waiting for its retry.
+            self._wake.set_result(None)
+        if self._task is None or self._task.done():
+            self._task = self.hass.async_create_task(self._async_run(self._generation))
+        self._async_changed()
+        return command
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Drop queued commands and cancel the one in flight."""
+        self._queue.clear()
+        if self._task and not self._task.done():
+            self._cancel_worker()
+        if self._notify is not None:
+            self._notify.cancel()
+            self._notify = None
+
+    @callback
+    def _cancel_worker(self) -> None:
+        """Cancel the worker task and forget the command in flight."""
+        self._generation += 1
+        self._task.cancel()
+        self._task = None
+        self._inflight = None
+
+    async def _async_run(self, generation: int) -> None:
+        """Send queued commands until the queue is empty."""
+        while self._queue and generation == self._generation:
+            command = self._queue.popleft()
+            self._inflight = command
+            try:
+                if command.retry_at is not None:
+                    await self._async_wait_retry(command)
+                    if self._queue:
+                        self.superseded += 1
+                        _LOGGER.debug("Dropping the retry of a %s command, a newer one replaces it", command.kind)
+                        self._async_drop(command)
+                        continue
+                if self.expiry and time.monotonic() - command.created > self.expiry:
+                    self.expired += 1
+                    _LOGGER.warning(
+                        "%s: dropped after %.0f s", command.error_message, time.monotonic() - command.created
+                    )
+                    self._async_drop(command)
+                    continue
+                command.sent = time.perf_counter()
+                if command.trace:
+                    command.trace.dispatched = command.sent
+                try:
+                    await self._async_send(command)
+                except HomeAssistantError as err:
+                    self._async_failed(command, err)
+                else:
+                    if command.trace:
+                        command.trace.completed = time.perf_counter()
+                    if self._on_complete:
+                        self._on_complete(command)
+            finally:
+                if generation == self._generation:
+                    self._inflight = None
+                    self._async_changed()
+
+    async def _async_send(self, command: PlaybackCommand) -> None:
+        """Make the service calls of a command, one after the other."""
+        for domain, service, data in (
+            *command.prepare,
+            (command.domain, command.service, command.data),
+            *command.steps,
+        ):
+            _LOGGER.debug("Calling %s.%s with data: %s", domain, service, data)
+            if isinstance(data.get("entity_id"), list):
+                await self._async_fan_out(command, domain, service, data)
+            else:
+                await self.hass.services.async_call(domain, service, data, blocking=True)
+
+    @callback
+    def _async_failed(self, command: PlaybackCommand, err: HomeAssistantError) -> None:
+        """Queue a failed command for a retry, or give up on it."""
+        delay = min(self.retry_delay * 2**command.attempts, self.retry_max_delay)
+        if not self.expiry or self._queue or not self._transient(command, err):
+            _LOGGER.error("%s: %s", command.error_message, err)
+            self._async_drop(command)
+            return
+        if time.monotonic() + delay - command.created > self.expiry:
+            self.expired += 1
+            _LOGGER.error("%s: %s; giving up after %d retries", command.error_message, err, command.attempts)
+            self._async_drop(command)
+            return
+        command.attempts += 1
+        command.retry_at = time.monotonic() + delay
+        self.retries += 1
+        _LOGGER.warning("%s: %s; retrying in %.1f s", command.error_message, err, delay)
+        self._queue.appendleft(command)
+
+    @callback
+    def _transient(self, command: PlaybackCommand, err: HomeAssistantError) -> bool:
+        """Return whether a failure may go away once Music Assistant is back.
+
+        Music Assistant not being loaded shows as a missing service or an
+        unavailable player.
+        """
+        if isinstance(err, ServiceNotFound):
+            return True
+        if isinstance(err, ServiceValidationError) or not command.retry:
+            return False
+        entity_ids = command.data.get("entity_id")
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        for entity_id in entity_ids or ():
+            state = self.hass.states.get(entity_id)
+            if state is None or state.state == STATE_UNAVAILABLE:
+                return True
+        return False
+
+    async def _async_wait_retry(self, command: PlaybackCommand) -> None:
+        """Wait until a command is due for its retry or a newer one is submitted."""
+        delay = command.retry_at - time.monotonic()
+        if delay <= 0:
+            return
+        self._wake = self.hass.loop.create_future()
+        try:
+            await asyncio.wait((self._wake,), timeout=delay)
+        finally:
+            self._wake = None
+
+    @callback
+    def _async_drop(self, command: PlaybackCommand) -> None:
+        """Report a command that will not be sent."""
+        if self._on_error:
+            self._on_error(command)
+
+    @callback
+    def _async_changed(self) -> None:
+        """Notify the listeners once the current event is handled."""
+        if self._listeners and self._notify is None:
+            self._notify = self.hass.loop.call_soon(self._async_notify)
+
+    @callback
+    def _async_notify(self) -> None:
+        self._notify = None
+        for listener in list(self._listeners):
+            listener(self)
+
+    async def _async_fan_out(
+        self, command: PlaybackCommand, domain: str, service: str, data: Dict[str, Any]
+    ) -> None:
+        """Send a call to each of its entities at once and time every one.
+
+        All members get the call even if one fails; the first error is
+        raised once they are done.
+        """
+        command.member_times = {}
+
+        async def _async_member(entity_id: str) -> None:
+            started = time.perf_counter()
+            try:
+                await self.hass.services.async_call(
+                    domain, service, {**data, "entity_id": entity_id}, blocking=True
+                )
+            finally:
+                command.member_times[entity_id] = (time.perf_counter() - started) * 1000
+
+        results: List[Any] = await asyncio.gather(
+            *(_async_member(entity_id) for entity_id in data["entity_id"]), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,173 @@
+"""Pre-built track queues for the most tapped folder tags."""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .models import TagMapping
+from .resolver import MediaResolver
+
+_LOGGER = logging.getLogger(__name__)
+
+# Longest track list queued in one call.
+MAX_QUEUE_TRACKS = 500
+# Tap counts are multiplied by this at every refresh, so old favorites fade.
+COUNT_DECAY = 0.5
+# Counts of uncached tags below this are forgotten at a refresh.
+MIN_COUNT = 0.1
+# Cap on concurrent folder listings during a refresh.
+REFRESH_CONCURRENCY = 2
+
+
+class PrebuiltQueue:
+    """The track URIs of a tag's folder, listed ahead of a tap."""
+
+    __slots__ = ("media_key", "media_id", "tracks", "built_at")
+
+    def __init__(self, media_key: str, media_id: str, tracks: List[str], built_at: float):
+        """Initialize the queue."""
+        self.media_key = media_key
+        self.media_id = media_id
+        self.tracks = tracks
+        self.built_at = built_at
+
+
+class TrackQueues:
+    """Track-level queues for the ``size`` most tapped folder tags.
+
+    Starting a folder makes Music Assistant walk the filesystem provider
+    for the tracks. For the tags tapped most, the folder is listed ahead of
+    time so a tap queues the tracks in one call. Tags are ranked by tap
+    count, decayed at every refresh; the least tapped queue is evicted
+    first. Queues are rebuilt at every refresh and dropped when their tag
+    is remapped.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, resolver: MediaResolver, size: int):
+        """Initialize the queues."""
+        self.hass = hass
+        self.size = size
+        self._entry = entry
+        self._resolver = resolver
+        self._counts: Dict[str, float] = {}
+        self._queues: Dict[str, PrebuiltQueue] = {}
+        self._building: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+    def __len__(self) -> int:
+        """Return the number of pre-built queues."""
+        return len(self._queues)
+
+    @callback
+    def get(self, mapping: TagMapping, media_key: str) -> Optional[List[str]]:
+        """Return the pre-built tracks of a folder tag, if any."""
+        queue = self._queues.get(mapping.tag_id)
+        if queue is None or queue.media_key != media_key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return queue.tracks
+
+    @callback
+    def record_tap(self, mapping: TagMapping, media_key: str, media_id: Optional[str]) -> None:
+        """Count a tap and build the tag's queue if it ranks high enough."""
+        if self.size <= 0 or not mapping.is_folder or not media_id:
+            return
+        tag_id = mapping.tag_id
+        count = self._counts[tag_id] = self._counts.get(tag_id, 0.0) + 1
+        queue = self._queues.get(tag_id)
+        if (queue is not None and queue.media_key == media_key) or tag_id in self._building:
+            return
+        if len(self._queues) + len(self._building) >= self.size and count <= self._lowest_count():
+            return
+        self._async_schedule_build(tag_id, media_key, media_id)
+
+    @callback
+    def invalidate(self, tag_id: str) -> None:
+        """Drop the queue of a remapped or removed tag."""
+        self._queues.pop(tag_id, None)
+
+    @callback
+    def set_size(self, size: int) -> None:
+        """Change how many queues are kept, evicting the least tapped."""
+        self.size = size
+        self._evict(size)
+
+    async def async_refresh(self) -> None:
+        """Decay the tap counts and rebuild every queue."""
+        for tag_id in list(self._counts):
+            self._counts[tag_id] *= COUNT_DECAY
+            if self._counts[tag_id] < MIN_COUNT and tag_id not in self._queues:
+                del self._counts[tag_id]
+
+        semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
+
+        async def _rebuild(tag_id: str, queue: PrebuiltQueue) -> None:
+            async with semaphore:
+                await self._async_build(tag_id, queue.media_key, queue.media_id)
+
+        started = time.monotonic()
+        queues = list(self._queues.items())
+        await asyncio.gather(*(_rebuild(tag_id, queue) for tag_id, queue in queues))
+        _LOGGER.debug("Rebuilt %d track queues in %.1f s", len(queues), time.monotonic() - started)
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the pre-built queues and their statistics."""
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "builds": self.builds,
+            "queues": {
+                tag_id: {
+                    "tracks": len(queue.tracks),
+                    "taps": round(self._counts.get(tag_id, 0.0), 2),
+                    "built_at": queue.built_at,
+                }
+                for tag_id, queue in self._queues.items()
+            },
+        }
+
+    @callback
+    def _async_schedule_build(self, tag_id: str, media_key: str, media_id: str) -> None:
+        """List a folder in the background."""
+        self._building.add(tag_id)
+        self._entry.async_create_background_task(
+            self.hass,
+            self._async_build(tag_id, media_key, media_id),
+            f"rfid_jukebox_queue_{tag_id}",
+        )
+
+    async def _async_build(self, tag_id: str, media_key: str, media_id: str) -> None:
+        """List a tag's folder and keep its tracks as the tag's queue."""
+        self._building.add(tag_id)
+        try:
+            tracks = await self._resolver.async_list_tracks("folder", media_id, MAX_QUEUE_TRACKS)
+        finally:
+            self._building.discard(tag_id)
+        if not tracks:
+            # The folder is gone or empty; let Music Assistant handle it.
+            self._queues.pop(tag_id, None)
+            return
+        self.builds += 1
+        self._queues[tag_id] = PrebuiltQueue(media_key, media_id, tracks, time.time())
+        self._evict(self.size)
+
+    @callback
+    def _evict(self, size: int) -> None:
+        """Drop the least tapped queues beyond ``size``."""
+        while len(self._queues) > max(size, 0):
+            tag_id = min(self._queues, key=lambda tag: self._counts.get(tag, 0.0))
+            del self._queues[tag_id]
+
+    @callback
+    def _lowest_count(self) -> float:
+        """Return the tap count of the least tapped queue."""
+        if not self._queues:
+            return 0.0
+        return min(self._counts.get(tag_id, 0.0) for tag_id in self._queues)
@@ -0,0 +1,345 @@
+"""Resolution of tag mappings to canonical Music Assistant media IDs."""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+
+from .models import TagMapping
+
+_LOGGER = logging.getLogger(__name__)
+
+MA_DOMAIN = "music_assistant"
+
+# Cap on concurrent lookups during a background refresh.
+REFRESH_CONCURRENCY = 4
+
+
+def folder_path(folder_name: str) -> str:
+    """Normalize a folder name to the path Music Assistant expects."""
+    return str(folder_name).strip().lstrip("/\\").replace("\\", "/")
+
+
+def folder_media_id(filesystem: str, folder_name: str) -> str:
+    """Build the ``<filesystem>://folder/<path>`` media ID for a folder."""
+    return f"{filesystem}://folder/{folder_path(folder_name)}"
+
+
+class ResolvedMedia:
+    """A mapping resolved to the media ID Music Assistant plays directly."""
+
+    __slots__ = ("media_id", "resolved_at")
+
+    def __init__(self, media_id: str, resolved_at: float):
+        """Initialize the entry."""
+        self.media_id = media_id
+        self.resolved_at = resolved_at
+
+
+class MediaResolver:
+    """Resolve mappings to canonical Music Assistant URIs.
+
+    Playlists are looked up by name through ``music_assistant.search`` and
+    folders are checked by browsing the folder they are in, one level deep,
+    so their own tracks are never listed. Results live in an LRU cache with
+    a TTL, keyed by media type and name, so taps play the URI directly.
+    Mappings that fail to resolve are collected in ``broken``.
+
+    Resolvers with the same ``share_key`` get the same results, so one of
+    them can resolve for all; the others ``adopt`` what it found.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        media_player: str,
+        filesystem: Optional[str],
+        max_entries: int,
+        ttl: float,
+    ):
+        """Initialize the resolver."""
+        self.hass = hass
+        self.media_player = media_player
+        self.filesystem = filesystem
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.broken: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[str, str], ResolvedMedia]" = OrderedDict()
+
+    @property
+    def share_key(self) -> Tuple[Optional[str], Optional[str]]:
+        """Return the filesystem and Music Assistant entry the results depend on."""
+        return self.filesystem, self._ma_config_entry_id()
+
+    @callback
+    def get(self, mapping: TagMapping) -> Optional[str]:
+        """Return the cached media ID for a mapping, if fresh."""
+        key = (mapping.media_type, mapping.name)
+        entry = self._cache.get(key)
+        if entry is None or time.monotonic() - entry.resolved_at > self.ttl:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return entry.media_id
+
+    @callback
+    def invalidate(self, mapping: TagMapping) -> None:
+        """Forget the cached resolution of a mapping."""
+        self._cache.pop((mapping.media_type, mapping.name), None)
+        self.broken.pop(mapping.tag_id, None)
+
+    @callback
+    def clear(self) -> None:
+        """Forget all cached resolutions."""
+        self._cache.clear()
+
+    async def async_resolve(
+        self, mapping: TagMapping, listings: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """Resolve a mapping, cache the result and return its media ID.
+
+        Returns None when Music Assistant is not reachable or the mapping is
+        broken; broken mappings are recorded with the reason. ``listings``
+        holds folder listings browsed already, by folder media ID.
+        """
+        try:
+            if mapping.is_folder:
+                media_id = await self._async_resolve_folder(mapping.name, listings)
+            else:
+                media_id = await self._async_resolve_playlist(mapping.name)
+        except HomeAssistantError as err:
+            _LOGGER.debug("Could not resolve %s '%s': %s", mapping.media_type, mapping.name, err)
+            return None
+
+        if isinstance(media_id, _Broken):
+            if self.broken.get(mapping.tag_id) != media_id.reason:
+                _LOGGER.warning(
+                    "Mapping for tag %s (%s '%s') is broken: %s",
+                    mapping.tag_id,
+                    mapping.media_type,
+                    mapping.name,
+                    media_id.reason,
+                )
+            self.broken[mapping.tag_id] = media_id.reason
+            self._cache.pop((mapping.media_type, mapping.name), None)
+            return None
+
+        self.broken.pop(mapping.tag_id, None)
+        self._store((mapping.media_type, mapping.name), ResolvedMedia(media_id, time.monotonic()))
+        return media_id
+
+    @callback
+    def adopt(self, source: "MediaResolver", mappings: Iterable[TagMapping], prune: bool = True) -> None:
+        """Take over what ``source`` resolved for ``mappings``, as if refreshed here."""
+        mappings = list(mappings)
+        for mapping in mappings:
+            key = (mapping.media_type, mapping.name)
+            reason = source.broken.get(mapping.tag_id)
+            if reason is not None:
+                self.broken[mapping.tag_id] = reason
+                self._cache.pop(key, None)
+                continue
+            entry = source._cache.get(key)
+            if entry is not None:
+                self.broken.pop(mapping.tag_id, None)
+                self._store(key, entry)
+        if prune:
+            self._prune(mappings)
+
+    async def async_refresh(self, mappings: Iterable[TagMapping], prune: bool = True) -> None:
+        """Re-resolve the given mappings in the background.
+
+        With ``prune``, the mappings are taken to be all there are and broken
+        entries for other tags are dropped.
+        """
+        semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
+        mappings = list(mappings)
+        parents = {
+            self._parent_media_id(folder_path(mapping.name))
+            for mapping in mappings
+            if mapping.is_folder and self.filesystem
+        }
+
+        # Folders in the same folder are checked against one listing of it.
+        listings: Dict[str, Any] = {}
+        entity = self._player_entity()
+
+        async def _list(parent_id: str) -> None:
+            async with semaphore:
+                listings[parent_id] = await self._async_list_children(entity, parent_id)
+
+        async def _resolve(mapping: TagMapping) -> None:
+            async with semaphore:
+                await self.async_resolve(mapping, listings)
+
+        started = time.monotonic()
+        if entity is not None:
+            await asyncio.gather(*(_list(parent_id) for parent_id in parents))
+        await asyncio.gather(*(_resolve(mapping) for mapping in mappings))
+        if prune:
+            self._prune(mappings)
+        _LOGGER.debug(
+            "Resolved %d mappings in %.1f s, %d broken",
+            len(mappings),
+            time.monotonic() - started,
+            len(self.broken),
+        )
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return cache statistics and broken mappings."""
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "broken": dict(self.broken),
+        }
+
+    async def _async_resolve_playlist(self, name: str):
+        """Find the URI of the playlist with the given name."""
+        if "://" in name:
+            return name
+        if not self.hass.services.has_service(MA_DOMAIN, "search"):
+            raise HomeAssistantError("Music Assistant is not loaded")
+
+        data = {"name": name, "media_type": ["playlist"], "limit": 10}
+        config_entry_id = self._ma_config_entry_id()
+        if config_entry_id:
+            data["config_entry_id"] = config_entry_id
+        response = await self.hass.services.async_call(
+            MA_DOMAIN, "search", data, blocking=True, return_response=True
+        )
+        playlists = (response or {}).get("playlists") or []
+        wanted = name.casefold()
+        for playlist in playlists:
+            if str(playlist.get("name", "")).casefold() == wanted and playlist.get("uri"):
+                return playlist["uri"]
+        if playlists:
+            names = ", ".join(str(playlist.get("name")) for playlist in playlists[:3])
+            return _Broken(f"no playlist named '{name}' (closest: {names})")
+        return _Broken(f"no playlist named '{name}'")
+
+    async def _async_resolve_folder(self, name: str, listings: Optional[Dict[str, Any]] = None):
+        """Build the folder URI and check that the folder it is in lists it."""
+        if not self.filesystem:
+            return _Broken("Music Assistant filesystem ID is not configured")
+        media_id = folder_media_id(self.filesystem, name)
+        path = folder_path(name).rstrip("/")
+        parent_id = self._parent_media_id(path)
+
+        if listings is not None and parent_id in listings:
+            children = listings[parent_id]
+        else:
+            entity = self._player_entity()
+            if entity is None:
+                raise HomeAssistantError(f"{self.media_player} is not available")
+            children = await self._async_list_children(entity, parent_id)
+        if isinstance(children, Exception):
+            return _Broken(f"folder '{name}' cannot be browsed: {children}")
+        if children is None or not path:
+            # The player cannot browse, or this is the filesystem itself.
+            return media_id
+        leaf = path.rpartition("/")[2]
+        if media_id.rstrip("/") in children or leaf in children:
+            return media_id
+        return _Broken(f"folder '{name}' was not found")
+
+    def _parent_media_id(self, path: str) -> str:
+        """Return the media ID of the folder that lists ``path``; the root lists itself."""
+        return folder_media_id(self.filesystem, path.rstrip("/").rpartition("/")[0])
+
+    def _player_entity(self):
+        """Return the media player entity that browses, if it is loaded."""
+        component = self.hass.data.get("media_player")
+        return component.get_entity(self.media_player) if component else None
+
+    async def _async_list_children(self, entity, media_id: str):
+        """Browse one folder level; return the media IDs and titles listed.
+
+        Returns None when the player cannot browse, and the error when the
+        folder cannot be browsed.
+        """
+        try:
+            browsed = await entity.async_browse_media("folder", media_id)
+        except NotImplementedError:
+            return None
+        except Exception as err:  # pylint: disable=broad-except
+            # Music Assistant raises its own error types for unknown paths.
+            return err
+        children: Set[str] = set()
+        for child in browsed.children or ():
+            children.add(str(child.media_content_id).rstrip("/"))
+            title = getattr(child, "title", None)
+            if title:
+                children.add(str(title))
+        return children
+
+    async def async_check_filesystem(self) -> Optional[str]:
+        """Return why the filesystem provider cannot be browsed, or None.
+
+        Raises HomeAssistantError when the player is not loaded, so the
+        provider cannot be checked at all.
+        """
+        result = await self._async_resolve_folder("")
+        return result.reason if isinstance(result, _Broken) else None
+
+    async def async_list_tracks(self, media_type: str, media_id: str, limit: int) -> Optional[List[str]]:
+        """Return the URIs of the playable tracks in a folder or playlist, in order.
+
+        Returns None when the media has subfolders or more than ``limit``
+        tracks, as the list would not play everything that starting the
+        media itself plays.
+        """
+        entity = self._player_entity()
+        if entity is None or "://" not in media_id:
+            return None
+        try:
+            browsed = await entity.async_browse_media(media_type, media_id)
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.debug("Could not list %s '%s': %s", media_type, media_id, err)
+            return None
+        children = browsed.children or []
+        if len(children) > limit or any(child.can_expand for child in children):
+            _LOGGER.debug("Not listing %s '%s': it has subfolders or over %d tracks", media_type, media_id, limit)
+            return None
+        return [child.media_content_id for child in children if child.can_play]
+
+    @callback
+    def _store(self, key: Tuple[str, str], entry: ResolvedMedia) -> None:
+        """Cache a resolution, dropping the least recently used past the limit."""
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    @callback
+    def _prune(self, mappings: List[TagMapping]) -> None:
+        """Drop broken entries of tags that are no longer mapped."""
+        live = {mapping.tag_id for mapping in mappings}
+        for tag_id in list(self.broken):
+            if tag_id not in live:
+                del self.broken[tag_id]
+
+    def _ma_config_entry_id(self) -> Optional[str]:
+        """Return the Music Assistant config entry that owns the player."""
+        entity_entry = er.async_get(self.hass).async_get(self.media_player)
+        if entity_entry and entity_entry.platform == MA_DOMAIN:
+            return entity_entry.config_entry_id
+        for entry in self.hass.config_entries.async_entries(MA_DOMAIN):
+            return entry.entry_id
+        return None
+
+
+class _Broken:
+    """Resolution result for a mapping that points at nothing."""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
@@ -0,0 +1,204 @@
+"""Per-tag playback position memory for the RFID Jukebox integration."""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant, State, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 30
+
+# Positions this close to the start of a track are not worth a seek.
+MIN_RESUME_POSITION = 5.0
+# Longest track listing kept in memory to rebuild the rest of a queue.
+MAX_LISTING = 500
+
+
+class ResumePoint:
+    """Where playback of a tag's media stopped."""
+
+    __slots__ = ("media_key", "track_uri", "track_index", "position", "updated_at", "listing")
+
+    def __init__(
+        self,
+        media_key: str,
+        track_uri: str,
+        track_index: Optional[int],
+        position: float,
+        updated_at: float,
+    ):
+        """Initialize the resume point."""
+        self.media_key = media_key
+        self.track_uri = track_uri
+        self.track_index = track_index
+        self.position = position
+        self.updated_at = updated_at
+        # Track URIs of the media, filled in the background; memory only.
+        self.listing: Optional[List[str]] = None
+
+    def remaining(self) -> Optional[List[str]]:
+        """Return the track URIs from the resume track to the end, if known."""
+        if not self.listing:
+            return None
+        try:
+            index = self.listing.index(self.track_uri)
+        except ValueError:
+            index = self.track_index
+        if index is None or index >= len(self.listing) or self.listing[index] != self.track_uri:
+            return None
+        return self.listing[index:]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the stored form."""
+        return {
+            "media_key": self.media_key,
+            "track_uri": self.track_uri,
+            "track_index": self.track_index,
+            "position": round(self.position, 1),
+            "updated_at": self.updated_at,
+        }
+
+
+class ResumeStore:
+    """Bounded LRU of resume points, keyed by tag ID.
+
+    At most ``max_tags`` tags are remembered and points older than
+    ``max_age`` seconds are dropped. Changes are written to ``.storage`` with
+    a delayed save, so a burst of taps costs a single write.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, max_tags: int, max_age: float):
+        """Initialize the store."""
+        self.hass = hass
+        self.max_tags = max_tags
+        self.max_age = max_age
+        self.resumed = 0
+        self._points: "OrderedDict[str, ResumePoint]" = OrderedDict()
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.resume.{entry_id}")
+
+    async def async_load(self) -> None:
+        """Load stored resume points, dropping the expired ones."""
+        data = await self._store.async_load() or {}
+        for tag_id, raw in data.get("points", {}).items():
+            try:
+                point = ResumePoint(
+                    raw["media_key"],
+                    raw["track_uri"],
+                    raw.get("track_index"),
+                    float(raw["position"]),
+                    float(raw["updated_at"]),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._points[tag_id] = point
+        self._async_evict()
+
+    async def async_remove(self) -> None:
+        """Delete the stored resume points."""
+        await self._store.async_remove()
+
+    def __len__(self) -> int:
+        """Return the number of remembered tags."""
+        return len(self._points)
+
+    @callback
+    def get(self, tag_id: str, media_key: str) -> Optional[ResumePoint]:
+        """Return the resume point of a tag if it is still for the same media."""
+        point = self._points.get(tag_id)
+        if point is None:
+            return None
+        if point.media_key != media_key or time.time() - point.updated_at > self.max_age:
+            self.async_forget(tag_id)
+            return None
+        return point
+
+    @callback
+    def async_capture(self, tag_id: str, media_key: str, state: Optional[State]) -> Optional[ResumePoint]:
+        """Remember where the player is in a tag's media.
+
+        Reads the current track and position from the player's state. Returns
+        the new resume point, or None if there is nothing worth resuming.
+        """
+        if state is None or self.max_tags <= 0:
+            return None
+        track_uri = state.attributes.get("media_content_id")
+        position = state.attributes.get("media_position")
+        if not track_uri or position is None:
+            return None
+        position = float(position)
+        updated_at = state.attributes.get("media_position_updated_at")
+        if state.state == "playing" and updated_at:
+            position += (dt_util.utcnow() - updated_at).total_seconds()
+
+        previous = self._points.get(tag_id)
+        point = ResumePoint(media_key, track_uri, None, position, time.time())
+        if previous and previous.media_key == media_key and previous.listing:
+            point.listing = previous.listing
+            if track_uri in previous.listing:
+                point.track_index = previous.listing.index(track_uri)
+        if point.track_index == 0 and position < MIN_RESUME_POSITION:
+            # Still at the very beginning, a plain start does the same.
+            self.async_forget(tag_id)
+            return None
+
+        self._points[tag_id] = point
+        self._points.move_to_end(tag_id)
+        self._async_evict()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        return point
+
+    @callback
+    def async_forget(self, tag_id: str) -> None:
+        """Drop the resume point of a tag."""
+        if self._points.pop(tag_id, None) is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_drop_listings(self) -> None:
+        """Forget the track listings, so they are listed again when needed."""
+        for point in self._points.values():
+            point.listing = None
+
+    @callback
+    def async_clear(self) -> None:
+        """Drop every resume point."""
+        if self._points:
+            self._points.clear()
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_resumed(self, tag_id: str) -> None:
+        """Mark a tag as used."""
+        self.resumed += 1
+        self._points.move_to_end(tag_id)
+
+    @callback
+    def async_set_limits(self, max_tags: int, max_age: float) -> None:
+        """Apply new limits, dropping the points beyond them."""
+        self.max_tags = max_tags
+        self.max_age = max_age
+        count = len(self._points)
+        self._async_evict()
+        if len(self._points) != count:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _async_evict(self) -> None:
+        """Drop expired points and the least recently used beyond the limit."""
+        cutoff = time.time() - self.max_age
+        for tag_id in [tag_id for tag_id, point in self._points.items() if point.updated_at < cutoff]:
+            del self._points[tag_id]
+        while len(self._points) > self.max_tags:
+            self._points.popitem(last=False)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        """Return the data to store."""
+        return {"points": {tag_id: point.as_dict() for tag_id, point in self._points.items()}}
@@ -27,7 +27,7 @@ class MediaTypeSelect(SelectEntity):
         self._jukebox = jukebox
         self._jukebox.media_type_entity = self
         self._attr_name = "RFID Jukebox Media Type"
-        self._attr_unique_id = f"{DOMAIN}_media_type"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_media_type"
         self._attr_icon = "mdi:music-box-outline"
         self._attr_options = ["playlist", "folder"]
         self._attr_current_option = "folder"
@@ -39,5 +39,7 @@ class MediaTypeSelect(SelectEntity):
 
     def update_option(self, option: str):
         """Update the selected option from the jukebox."""
+        if option == self._attr_current_option:
+            return
         self._attr_current_option = option
         self.async_write_ha_state()
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""Sensor platform for RFID Jukebox."""
+import logging
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers import event
+from homeassistant.helpers.entity import EntityCategory
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .timing import STAGE_TOTAL, STAGES
+
+_LOGGER = logging.getLogger(__name__)
+
+# Days and cards covered by the statistics attributes.
+WEEK = 7
+TOP_TAGS = 10
+# Seconds playback commands must stay pending before the queue depth is written.
+PENDING_WRITE_DELAY = 5.0
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the sensor platform from a config entry."""
+    jukebox = hass.data[DOMAIN][entry.entry_id]
+    entities = [
+        FlapsAbsorbedSensor(jukebox),
+        *(TapStageSensor(jukebox, stage) for stage in STAGES),
+        TapLatencyP95Sensor(jukebox),
+        GroupSlowestMemberSensor(jukebox),
+        PendingCommandsSensor(jukebox),
+    ]
+    if jukebox.analytics is not None:
+        entities += [TapsTodaySensor(jukebox), ListeningTodaySensor(jukebox)]
+    async_add_entities(entities)
+
+
+class FlapsAbsorbedSensor(SensorEntity):
+    """Counts tag sensor flaps swallowed by the debounce windows."""
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._jukebox.flaps_entity = self
+        self._attr_name = "RFID Jukebox Flaps Absorbed"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_flaps_absorbed"
+        self._attr_icon = "mdi:tag-off-outline"
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._set_counters(jukebox.debouncer)
+
+    def _set_counters(self, debouncer):
+        self._attr_native_value = debouncer.flaps_absorbed
+        self._attr_extra_state_attributes = {
+            "absorbed_removals": debouncer.absorbed_removals,
+            "absorbed_presences": debouncer.absorbed_presences,
+        }
+
+    def update_value(self, debouncer):
+        """Update the counters from the jukebox debouncer."""
+        self._set_counters(debouncer)
+        self.async_write_ha_state()
+
+
+class TapStageSensor(SensorEntity):
+    """Duration of one stage of the most recent tap, with p50/p95 attributes."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_suggested_display_precision = 1
+
+    def __init__(self, jukebox, stage: str):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._stage = stage
+        label = stage.replace("_", " ").title()
+        self._attr_name = f"RFID Jukebox Tap {label} Time"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_tap_{stage}_time"
+        self._attr_icon = "mdi:timer-outline"
+        # Only the end-to-end time is shown by default; stages are for digging in.
+        self._attr_entity_registry_enabled_default = stage == STAGE_TOTAL
+        self._set_stats(jukebox.timings.stats())
+
+    def _set_stats(self, stats):
+        stage = stats[self._stage]
+        self._attr_native_value = stage["last"]
+        self._attr_extra_state_attributes = {
+            "p50": stage["p50"],
+            "p95": stage["p95"],
+            "samples": stage["samples"],
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Start receiving timing updates."""
+        self._jukebox.timing_entities.append(self)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop receiving timing updates."""
+        if self in self._jukebox.timing_entities:
+            self._jukebox.timing_entities.remove(self)
+
+    def update_value(self, stats):
+        """Update the timing from the jukebox."""
+        self._set_stats(stats)
+        self.async_write_ha_state()
+
+
+class TapLatencyP95Sensor(TapStageSensor):
+    """95th percentile of the end-to-end tap time over the recent taps."""
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        super().__init__(jukebox, STAGE_TOTAL)
+        self._attr_name = "RFID Jukebox Tap Time p95"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_tap_time_p95"
+
+    def _set_stats(self, stats):
+        stage = stats[self._stage]
+        self._attr_native_value = stage["p95"]
+        self._attr_extra_state_attributes = {"samples": stage["samples"]}
+
+
+class GroupSlowestMemberSensor(SensorEntity):
+    """Time the slowest member of a player group took for the last fanned out call."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_suggested_display_precision = 1
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._jukebox.group_entity = self
+        self._attr_name = "RFID Jukebox Group Slowest Member Time"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_group_slowest_member_time"
+        self._attr_icon = "mdi:speaker-multiple"
+        self._set_stats(jukebox.group_timings)
+
+    def _set_stats(self, group_timings):
+        stats = group_timings.stats()
+        self._attr_native_value = stats.pop("last")
+        self._attr_extra_state_attributes = stats
+
+    def update_value(self, group_timings):
+        """Update the member times from the jukebox."""
+        self._set_stats(group_timings)
+        self.async_write_ha_state()
+
+
+class PendingCommandsSensor(SensorEntity):
+    """Playback commands queued, in flight or waiting for a retry.
+
+    A healthy tap queues a command for a moment, so the depth is only
+    written once commands stay pending for ``PENDING_WRITE_DELAY`` seconds,
+    when a retry or expiry happens, and when a backlog written before has
+    cleared.
+    """
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._attr_name = "RFID Jukebox Pending Commands"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_pending_commands"
+        self._attr_icon = "mdi:tray-full"
+        self._cancel_write = None
+        self._set_state(jukebox.playback)
+        self._written = (self._attr_native_value, jukebox.playback.retries, jukebox.playback.expired)
+
+    def _set_state(self, playback):
+        state = playback.diagnostics()
+        self._attr_native_value = state.pop("depth")
+        self._attr_extra_state_attributes = state
+
+    async def async_added_to_hass(self) -> None:
+        """Start receiving playback queue updates."""
+        self.async_on_remove(self._jukebox.playback.add_listener(self.update_value))
+        self.async_on_remove(self._async_cancel_write)
+
+    def update_value(self, playback):
+        """Update the queue depth from the jukebox."""
+        self._set_state(playback)
+        _depth, retries, expired = self._written
+        if (playback.retries, playback.expired) != (retries, expired):
+            self._async_write()
+        elif playback.depth:
+            if self._cancel_write is None:
+                self._cancel_write = event.async_call_later(
+                    self.hass, PENDING_WRITE_DELAY, self._async_write_pending
+                )
+        elif self._written[0]:
+            self._async_write()
+        else:
+            # Drained before anyone could see it.
+            self._async_cancel_write()
+
+    @callback
+    def _async_write_pending(self, _now):
+        """Write the depth of commands that stayed pending."""
+        self._cancel_write = None
+        self._set_state(self._jukebox.playback)
+        self._async_write()
+
+    @callback
+    def _async_write(self):
+        self._async_cancel_write()
+        playback = self._jukebox.playback
+        self._written = (self._attr_native_value, playback.retries, playback.expired)
+        self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_write(self):
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+
+
+class TapsTodaySensor(SensorEntity):
+    """Cards played today, with the most played cards of the week."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._attr_name = "RFID Jukebox Taps Today"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_taps_today"
+        self._attr_icon = "mdi:gesture-tap"
+        self._set_stats(jukebox.analytics)
+
+    def _set_stats(self, analytics):
+        today = analytics.today()
+        week = analytics.tag_stats(WEEK)
+        top = sorted(week, key=lambda tag_id: week[tag_id]["taps"], reverse=True)[:TOP_TAGS]
+        self._attr_native_value = today["taps"]
+        self._attr_extra_state_attributes = {
+            "skips_today": today["skips"],
+            "top_tags_7d": [
+                {
+                    "tag_id": tag_id,
+                    "alias": mapping.alias if (mapping := self._jukebox.mappings.get(tag_id)) else None,
+                    "taps": week[tag_id]["taps"],
+                    "listened_min": round(week[tag_id]["listened"] / 60),
+                    "skips": week[tag_id]["skips"],
+                }
+                for tag_id in top
+            ],
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Start receiving statistics updates."""
+        self.async_on_remove(self._jukebox.analytics.add_listener(self.update_value))
+
+    def update_value(self, analytics):
+        """Update the statistics from the jukebox."""
+        self._set_stats(analytics)
+        self.async_write_ha_state()
+
+
+class ListeningTodaySensor(SensorEntity):
+    """Time spent listening today."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_suggested_display_precision = 0
+
+    def __init__(self, jukebox):
+        """Initialize the sensor entity."""
+        self._jukebox = jukebox
+        self._attr_name = "RFID Jukebox Listening Time Today"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_listening_today"
+        self._attr_icon = "mdi:headphones"
+        self._set_stats(jukebox.analytics)
+
+    def _set_stats(self, analytics):
+        self._attr_native_value = round(analytics.today()["listened"] / 60, 1)
+
+    async def async_added_to_hass(self) -> None:
+        """Start receiving statistics updates."""
+        self.async_on_remove(self._jukebox.analytics.add_listener(self.update_value))
+
+    def update_value(self, analytics):
+        """Update the listening time from the jukebox."""
+        self._set_stats(analytics)
+        self.async_write_ha_state()
@@ -0,0 +1,222 @@
+"""Tag session state machine for the RFID Jukebox integration."""
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from homeassistant.const import (
+    STATE_IDLE,
+    STATE_OFF,
+    STATE_PAUSED,
+    STATE_PLAYING,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import callback
+
+from .playback import KIND_RESUME, PlaybackCommand
+
+_LOGGER = logging.getLogger(__name__)
+
+# Idle, playing and paused share the player state names.
+STATE_STARTING = "starting"
+STATE_REMOVED_GRACE = "removed_grace"
+
+# Every transition the session may take; anything else is a bug.
+_TRANSITIONS = {
+    STATE_IDLE: {STATE_STARTING, STATE_PLAYING, STATE_IDLE},
+    STATE_STARTING: {STATE_STARTING, STATE_PLAYING, STATE_PAUSED, STATE_IDLE, STATE_REMOVED_GRACE},
+    STATE_PLAYING: {STATE_STARTING, STATE_PAUSED, STATE_IDLE, STATE_REMOVED_GRACE},
+    STATE_PAUSED: {STATE_STARTING, STATE_PLAYING, STATE_IDLE},
+    STATE_REMOVED_GRACE: {STATE_STARTING, STATE_PLAYING, STATE_PAUSED, STATE_IDLE},
+}
+# States in which a removed card pauses the player.
+_ACTIVE = (STATE_STARTING, STATE_PLAYING)
+_PLAYER_STOPPED = (STATE_IDLE, STATE_OFF, STATE_UNAVAILABLE)
+HISTORY = 50
+
+
+class TagSession:
+    """What the card on one jukebox's reader is doing.
+
+    ``idle``: no media of ``tag_id`` is playing; a tap starts it from the
+    beginning. ``starting``: a start or resume command is queued or in
+    flight. ``playing`` and ``paused`` follow the player. ``removed_grace``:
+    the card left the reader but the removal grace window is still open;
+    the state it left is kept in ``grace_state``. ``loaded`` tells whether
+    the player got the card's media, so its position may be remembered.
+
+    Transitions run in event loop callbacks and never await, so each one
+    completes before the next event is looked at. While a start is in
+    flight:
+
+    - the same card again is ignored;
+    - another card supersedes it with its own start;
+    - a removal pauses, and the pause is sent after the start; if the
+      start then fails, the session goes idle;
+    - the completion of any command but the newest start is ignored.
+
+    The player is only followed once no command is pending, when it pauses,
+    stops or plays on its own.
+    """
+
+    def __init__(self):
+        """Initialize an idle session."""
+        self.state = STATE_IDLE
+        self.tag_id: Optional[str] = None
+        self.command: Optional[PlaybackCommand] = None
+        self.loaded = False
+        self.grace_state: Optional[str] = None
+        self.restart = False
+        self.transitions = 0
+        self.ignored = 0
+        self.invalid = 0
+        self.history: Deque[Tuple[float, Optional[str], str, str, str]] = deque(maxlen=HISTORY)
+
+    @property
+    def active(self) -> bool:
+        """Return True if the session's media is playing or about to."""
+        if self.state == STATE_REMOVED_GRACE:
+            return self.grace_state in _ACTIVE
+        return self.state in _ACTIVE
+
+    def same_tag(self, tag_id: str) -> bool:
+        """Return True if a tap of ``tag_id`` continues this session."""
+        return tag_id == self.tag_id and not self.restart
+
+    @callback
+    def async_start(self, tag_id: str, command: Optional[PlaybackCommand]) -> None:
+        """Wait for ``command`` to start or resume the media of a tag.
+
+        Without a command nothing was sent, and the session stays idle.
+        """
+        if command is None or command.kind != KIND_RESUME:
+            self.loaded = False
+        self.tag_id = tag_id
+        self.restart = False
+        self.command = command
+        self._set(STATE_STARTING if command else STATE_IDLE, "tap")
+
+    @callback
+    def async_continued(self, tag_id: str) -> None:
+        """Note that a resume cancelled out a pause that was never sent."""
+        self.tag_id = tag_id
+        self.command = None
+        self._set(STATE_PLAYING, "pause cancelled")
+
+    @callback
+    def async_stop(self, tag_id: str) -> None:
+        """Follow a tag that has nothing to play."""
+        self.tag_id = tag_id
+        self.restart = False
+        self.command = None
+        self.loaded = False
+        self._set(STATE_IDLE, "unmapped tag")
+
+    @callback
+    def async_command_done(self, command: PlaybackCommand, success: bool) -> None:
+        """Settle the newest start once its command completed or failed."""
+        if command is not self.command:
+            self.ignored += 1
+            return
+        self.command = None
+        self.loaded = success
+        outcome = STATE_PLAYING if success else STATE_IDLE
+        if self.state == STATE_REMOVED_GRACE:
+            if self.grace_state == STATE_STARTING:
+                self.grace_state = outcome
+        elif self.state == STATE_STARTING or (self.state == STATE_PAUSED and not success):
+            self._set(outcome, "started" if success else "start failed")
+
+    @callback
+    def async_cancelled(self, command: PlaybackCommand) -> None:
+        """Forget a start that was cancelled before it was sent."""
+        if command is self.command:
+            self.command = None
+
+    @callback
+    def async_lifted(self) -> None:
+        """Open the removal grace window for a card that left the reader."""
+        if self.state in _ACTIVE:
+            self.grace_state = self.state
+            self._set(STATE_REMOVED_GRACE, "lifted")
+        else:
+            self.ignored += 1
+
+    @callback
+    def async_returned(self) -> None:
+        """Close the grace window for a card that came back in time."""
+        if self.state != STATE_REMOVED_GRACE:
+            self.ignored += 1
+            return
+        state, self.grace_state = self.grace_state, None
+        self._set(state, "returned")
+
+    @callback
+    def async_removed(self) -> bool:
+        """Follow a confirmed removal; return True if the player must pause."""
+        active = self.active
+        if self.state == STATE_REMOVED_GRACE:
+            state, self.grace_state = self.grace_state, None
+        else:
+            state = self.state
+        if active:
+            self._set(STATE_PAUSED, "removed")
+        elif state != self.state:
+            self._set(state, "removed")
+        return active
+
+    @callback
+    def async_player_changed(self, player_state: str) -> None:
+        """Follow the player when it pauses, stops or plays on its own."""
+        if player_state in _PLAYER_STOPPED:
+            target = STATE_IDLE
+        elif player_state in (STATE_PLAYING, STATE_PAUSED):
+            target = player_state
+        else:
+            return
+        current = self.grace_state if self.state == STATE_REMOVED_GRACE else self.state
+        if current == STATE_IDLE and target == STATE_PAUSED:
+            # Media of an earlier card was paused; this one has none to resume.
+            return
+        if current == target:
+            return
+        if current == STATE_STARTING:
+            # The start never reported back; take the player's word for it.
+            self.command = None
+            self.loaded = target == STATE_PLAYING
+        if self.state == STATE_REMOVED_GRACE:
+            self.grace_state = target
+            return
+        self._set(target, f"player {player_state}")
+
+    @callback
+    def async_remapped(self) -> None:
+        """Make the next tap of the card start its new media."""
+        self.restart = True
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the state and the most recent transitions."""
+        return {
+            "state": self.state,
+            "tag_id": self.tag_id,
+            "grace_state": self.grace_state,
+            "loaded": self.loaded,
+            "restart": self.restart,
+            "transitions": self.transitions,
+            "ignored": self.ignored,
+            "invalid": self.invalid,
+            "history": list(self.history),
+        }
+
+    @callback
+    def _set(self, state: str, reason: str) -> None:
+        """Move to ``state``, recording the transition."""
+        if state not in _TRANSITIONS[self.state]:
+            self.invalid += 1
+            _LOGGER.warning(
+                "Unexpected session transition %s -> %s (%s)", self.state, state, reason
+            )
+        _LOGGER.debug("Session of tag %s: %s -> %s (%s)", self.tag_id, self.state, state, reason)
+        self.history.append((time.time(), self.tag_id, self.state, state, reason))
+        self.state = state
+        self.transitions += 1
@@ -0,0 +1,279 @@
+"""Journaled storage for RFID Jukebox tag mappings."""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import yaml
+from homeassistant.core import HomeAssistant
+
+from .helpers import MappingFileError, load_mappings, write_mappings_atomic
+from .models import TagMapping, build_index
+
+_LOGGER = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+CACHE_VERSION = 1
+
+OP_SET = "set"
+OP_DELETE = "delete"
+
+
+class MappingStore:
+    """Persist tag mappings as a YAML snapshot plus an append-only journal.
+
+    The YAML file keeps the format users know and edit by hand. Every change
+    is appended to ``<file>.journal`` as one JSON line and fsynced, so a
+    mapping costs O(1) I/O. Once the journal grows past the compaction
+    threshold, the snapshot is rewritten atomically and the journal is
+    truncated. A line torn by a power cut is skipped on replay.
+
+    The parsed snapshot is cached as JSON, keyed by the YAML file's mtime and
+    size, so startup only re-parses YAML after the file actually changed.
+
+    A YAML file that cannot be parsed is never rewritten: its mappings are
+    left out, ``snapshot_error`` tells why, and changes only go to the
+    journal until the file is fixed and loaded again.
+
+    All methods do blocking I/O and must run in the executor.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        file_path: str,
+        compact_threshold: int,
+        cache_path: Optional[str] = None,
+    ):
+        """Initialize the store."""
+        self.hass = hass
+        self.file_path = file_path
+        self.journal_path = file_path + JOURNAL_SUFFIX
+        self.cache_path = cache_path
+        self.compact_threshold = compact_threshold
+        self.load_stats: Dict[str, Any] = {}
+        self.snapshot_error: Optional[str] = None
+        self._mappings: Dict[str, Any] = {}
+        self._journal_entries = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, TagMapping]:
+        """Load the snapshot, replay the journal and return the mapping index.
+
+        Legacy string entries and non-canonical tag IDs are upgraded in place
+        and written back with a compaction.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            self._mappings, source = self._load_snapshot()
+            parsed = time.perf_counter()
+            self._journal_entries, torn = self._replay_journal()
+            index, upgrades = build_index(self._mappings)
+            for key, mapping in upgrades:
+                self._mappings.pop(key, None)
+                self._mappings[mapping.tag_id] = mapping.as_dict()
+            if upgrades:
+                _LOGGER.info("Upgraded %d mappings to the current format", len(upgrades))
+            # Appending after a torn line would corrupt the next record too.
+            if upgrades or torn or self._journal_entries >= self.compact_threshold:
+                if not self._compact() and torn:
+                    self._end_torn_line()
+            finished = time.perf_counter()
+            self.load_stats = {
+                "source": source,
+                "mappings": len(index),
+                "journal_entries": self._journal_entries,
+                "snapshot_error": self.snapshot_error,
+                "snapshot_ms": round((parsed - started) * 1000, 3),
+                "total_ms": round((finished - started) * 1000, 3),
+            }
+            return index
+
+    def set(self, tag_id: str, mapping: Any) -> None:
+        """Persist a single mapping."""
+        self.apply([(OP_SET, tag_id, mapping)])
+
+    def apply(self, operations: Iterable[Tuple[str, str, Optional[Any]]]) -> None:
+        """Persist a batch of ``(op, tag_id, mapping)`` changes with one write.
+
+        Raises OSError if the batch could not be written; the store is then
+        left as it was.
+        """
+        operations = list(operations)
+        if not operations:
+            return
+        with self._lock:
+            previous = {tag_id: self._mappings.get(tag_id) for _op, tag_id, _mapping in operations}
+            for op, tag_id, mapping in operations:
+                if op == OP_SET:
+                    self._mappings[tag_id] = mapping
+                else:
+                    self._mappings.pop(tag_id, None)
+
+            if self._journal_entries + len(operations) >= self.compact_threshold:
+                if self._compact():
+                    return
+
+            lines = "".join(
+                json.dumps({"op": op, "tag": tag_id, "mapping": mapping}, separators=(",", ":")) + "\n"
+                for op, tag_id, mapping in operations
+            )
+            try:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                for tag_id, mapping in previous.items():
+                    if mapping is None:
+                        self._mappings.pop(tag_id, None)
+                    else:
+                        self._mappings[tag_id] = mapping
+                raise
+            self._journal_entries += len(operations)
+
+    def compact(self) -> None:
+        """Fold the journal into the YAML snapshot."""
+        with self._lock:
+            self._compact()
+
+    def _snapshot_key(self) -> Optional[Dict[str, int]]:
+        """Return the cache key of the YAML snapshot, or None if it is missing."""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _load_snapshot(self) -> Tuple[Dict[str, Any], str]:
+        """Load the YAML snapshot, preferring the parsed cache when it is fresh."""
+        key = self._snapshot_key()
+        self.snapshot_error = None
+        if key is None:
+            return {}, "empty"
+
+        if self.cache_path:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+                if (
+                    cache.get("version") == CACHE_VERSION
+                    and cache.get("key") == key
+                    and isinstance(cache.get("mappings"), dict)
+                ):
+                    return cache["mappings"], "cache"
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                _LOGGER.debug("Ignoring unreadable mapping cache %s: %s", self.cache_path, e)
+
+        try:
+            mappings = load_mappings(self.hass, self.file_path)
+        except MappingFileError as e:
+            self.snapshot_error = str(e)
+            _LOGGER.error(
+                "%s; its mappings are not loaded and the file will not be rewritten until it is fixed",
+                e,
+            )
+            return {}, "unreadable"
+        self._write_cache(key, mappings)
+        return mappings, "yaml"
+
+    def _write_cache(self, key: Optional[Dict[str, int]], mappings: Dict[str, Any]) -> None:
+        """Write the parsed snapshot cache next to Home Assistant's storage."""
+        if not self.cache_path or key is None:
+            return
+        directory = os.path.dirname(self.cache_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"version": CACHE_VERSION, "key": key, "mappings": mappings},
+                        f,
+                        separators=(",", ":"),
+                    )
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            # A missing cache only costs a YAML parse on the next start.
+            _LOGGER.debug("Could not write mapping cache %s: %s", self.cache_path, e)
+
+    def _replay_journal(self) -> Tuple[int, bool]:
+        """Apply journal lines on top of the loaded snapshot.
+
+        Returns the number of applied entries and whether the last line was
+        torn by an interrupted write.
+        """
+        entries = 0
+        torn = False
+        try:
+            with open(self.journal_path, "r", encoding="utf-8", errors="replace") as f:
+                for line_number, line in enumerate(f, 1):
+                    torn = not line.endswith("\n")
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        op = record["op"]
+                        tag_id = record["tag"]
+                    except (ValueError, KeyError, TypeError):
+                        _LOGGER.warning(
+                            "Skipping corrupt line %d in mapping journal %s",
+                            line_number,
+                            self.journal_path,
+                        )
+                        continue
+                    if op == OP_SET:
+                        self._mappings[tag_id] = record.get("mapping")
+                    elif op == OP_DELETE:
+                        self._mappings.pop(tag_id, None)
+                    entries += 1
+        except FileNotFoundError:
+            return 0, False
+        except OSError as e:
+            _LOGGER.error("Error reading mapping journal %s: %s", self.journal_path, e)
+        if entries:
+            _LOGGER.debug("Replayed %d journal entries from %s", entries, self.journal_path)
+        return entries, torn
+
+    def _end_torn_line(self) -> None:
+        """Terminate a torn journal line, so the next record starts on its own line."""
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            _LOGGER.error("Error repairing mapping journal %s: %s", self.journal_path, e)
+
+    def _compact(self) -> bool:
+        """Rewrite the snapshot atomically, then truncate the journal."""
+        if self.snapshot_error:
+            _LOGGER.debug("Not compacting into unreadable mapping file %s", self.file_path)
+            return False
+        try:
+            write_mappings_atomic(self.file_path, self._mappings)
+        except (OSError, yaml.YAMLError) as e:
+            _LOGGER.error("Error compacting mapping file %s: %s", self.file_path, e)
+            return False
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # The snapshot already holds everything, replaying is harmless.
+            _LOGGER.error("Error truncating mapping journal %s: %s", self.journal_path, e)
+        self._journal_entries = 0
+        self._write_cache(self._snapshot_key(), self._mappings)
+        _LOGGER.info("Compacted %d mappings into %s", len(self._mappings), self.file_path)
+        return True
@@ -32,7 +32,7 @@ class MediaNameText(TextEntity):
         self._jukebox = jukebox
         self._jukebox.text_entity = self
         self._attr_name = "RFID Jukebox Media Name to Map"
-        self._attr_unique_id = f"{DOMAIN}_media_name_to_map"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_media_name_to_map"
         self._attr_icon = "mdi:music-box"
         self._attr_native_value = ""
 
@@ -43,6 +43,8 @@ class MediaNameText(TextEntity):
 
     def update_value(self, value: str):
         """Update the value of the text entity from the jukebox."""
+        if value == self._attr_native_value:
+            return
         self._attr_native_value = value
         self.async_write_ha_state()
 
@@ -55,7 +57,7 @@ class AliasText(TextEntity):
         self._jukebox = jukebox
         self._jukebox.alias_entity = self
         self._attr_name = "RFID Jukebox Alias"
-        self._attr_unique_id = f"{DOMAIN}_alias"
+        self._attr_unique_id = f"{jukebox.entry.entry_id}_alias"
         self._attr_icon = "mdi:label"
         self._attr_native_value = ""
 
@@ -66,5 +68,7 @@ class AliasText(TextEntity):
 
     def update_value(self, value: str):
         """Update the value of the text entity from the jukebox."""
+        if value == self._attr_native_value:
+            return
         self._attr_native_value = value
         self.async_write_ha_state()
\ No newline at end of file
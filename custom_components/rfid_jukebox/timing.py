@@ -0,0 +1,181 @@
+"""Per-stage timing of tag taps for the RFID Jukebox integration."""
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+STAGE_EVENT_BUS = "event_bus"
+STAGE_DEBOUNCE = "debounce"
+STAGE_LOOKUP = "lookup"
+STAGE_DISPATCH = "dispatch"
+STAGE_SERVICE = "service"
+STAGE_PLAYING = "playing"
+STAGE_TOTAL = "total"
+STAGES = (
+    STAGE_EVENT_BUS,
+    STAGE_DEBOUNCE,
+    STAGE_LOOKUP,
+    STAGE_DISPATCH,
+    STAGE_SERVICE,
+    STAGE_PLAYING,
+    STAGE_TOTAL,
+)
+
+# Number of recent taps included verbatim in the diagnostics download.
+DIAGNOSTICS_RECENT = 20
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Return the nearest-rank percentile of ``values``."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class TapTrace:
+    """Timestamps of one tap on its way from the tag sensor to the speaker.
+
+    All marks are ``time.perf_counter()`` values except ``event_bus``, the
+    delay between the tag sensor's state change and its receipt, which is
+    measured from the state's wall clock timestamp.
+    """
+
+    __slots__ = (
+        "kind",
+        "tag_id",
+        "event_bus",
+        "received",
+        "presented",
+        "looked_up",
+        "dispatched",
+        "completed",
+        "playing",
+        "wall_time",
+    )
+
+    def __init__(self, tag_id: str, event_bus: float, received: float):
+        """Start a trace at the receipt of a tag sensor change."""
+        self.kind: Optional[str] = None
+        self.tag_id = tag_id
+        self.event_bus = max(event_bus, 0.0)
+        self.received = received
+        self.presented: Optional[float] = None
+        self.looked_up: Optional[float] = None
+        self.dispatched: Optional[float] = None
+        self.completed: Optional[float] = None
+        self.playing: Optional[float] = None
+        self.wall_time = time.time()
+
+    @property
+    def done(self) -> bool:
+        """Return True once the command completed and the player plays."""
+        return self.completed is not None and self.playing is not None
+
+    def stages(self) -> Dict[str, Optional[float]]:
+        """Return the duration of each stage in milliseconds."""
+
+        def _span(start: Optional[float], end: Optional[float]) -> Optional[float]:
+            if start is None or end is None:
+                return None
+            return max(end - start, 0.0) * 1000
+
+        finished = max(self.completed or 0.0, self.playing or 0.0) or None
+        total = _span(self.received, finished)
+        return {
+            STAGE_EVENT_BUS: self.event_bus * 1000,
+            STAGE_DEBOUNCE: _span(self.received, self.presented),
+            STAGE_LOOKUP: _span(self.presented, self.looked_up),
+            STAGE_DISPATCH: _span(self.looked_up, self.dispatched),
+            STAGE_SERVICE: _span(self.dispatched, self.completed),
+            STAGE_PLAYING: _span(self.completed, self.playing),
+            STAGE_TOTAL: None if total is None else total + self.event_bus * 1000,
+        }
+
+
+class TapTimings:
+    """Ring buffer of the most recent tap traces."""
+
+    def __init__(self, size: int):
+        """Initialize the buffer."""
+        self._traces: Deque[TapTrace] = deque(maxlen=size)
+        self.recorded = 0
+
+    def record(self, trace: TapTrace) -> None:
+        """Add a finished trace, dropping the oldest one when full."""
+        self._traces.append(trace)
+        self.recorded += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return last, p50 and p95 per stage in milliseconds."""
+        samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        last: Dict[str, Optional[float]] = dict.fromkeys(STAGES)
+        for trace in self._traces:
+            for stage, value in trace.stages().items():
+                if value is not None:
+                    samples[stage].append(value)
+                    last[stage] = value
+        return {
+            stage: {
+                "last": _round(last[stage]),
+                "p50": _round(percentile(samples[stage], 50)),
+                "p95": _round(percentile(samples[stage], 95)),
+                "samples": len(samples[stage]),
+            }
+            for stage in STAGES
+        }
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the stage statistics and the most recent taps."""
+        recent = list(self._traces)[-DIAGNOSTICS_RECENT:]
+        return {
+            "recorded": self.recorded,
+            "stats": self.stats(),
+            "recent": [
+                {
+                    "tag_id": trace.tag_id,
+                    "kind": trace.kind,
+                    "time": trace.wall_time,
+                    "stages_ms": {
+                        stage: _round(value) for stage, value in trace.stages().items()
+                    },
+                }
+                for trace in recent
+            ],
+        }
+
+
+class GroupTimings:
+    """Member times of the most recent calls fanned out to a player group."""
+
+    def __init__(self, size: int):
+        """Initialize the buffer."""
+        self._slowest: Deque[float] = deque(maxlen=size)
+        self.last: Dict[str, float] = {}
+        self.kind: Optional[str] = None
+        self.recorded = 0
+
+    def record(self, kind: str, member_times: Dict[str, float]) -> None:
+        """Add the member times of a command's fanned out call."""
+        self.last = dict(member_times)
+        self.kind = kind
+        self._slowest.append(max(member_times.values()))
+        self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the slowest member of the last call and p50/p95 of the slowest members."""
+        slowest = max(self.last, key=self.last.get) if self.last else None
+        samples = list(self._slowest)
+        return {
+            "last": _round(self.last[slowest]) if slowest else None,
+            "slowest_member": slowest,
+            "kind": self.kind,
+            "members": {entity_id: _round(value) for entity_id, value in self.last.items()},
+            "p50": _round(percentile(samples, 50)),
+            "p95": _round(percentile(samples, 95)),
+            "samples": len(samples),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
@@ -0,0 +1,405 @@
+"""Bulk import and export of tag mappings.
+
+Everything here does blocking I/O and runs in the executor. CSV, JSON
+Lines and JSON files are read and written one record at a time, so large
+tag libraries never have to fit in memory twice. YAML files are parsed
+whole, so their size is limited to ``YAML_SIZE_LIMIT``.
+"""
+import csv
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import yaml
+
+from .const import FORMAT_CSV, FORMAT_JSON, FORMAT_JSONL, FORMAT_YAML, FORMATS, MEDIA_TYPES
+from .helpers import fsync_directory, safe_loader, write_mappings_atomic
+from .models import TagMapping, normalize_tag_id
+
+_LOGGER = logging.getLogger(__name__)
+
+CSV_COLUMNS = ["tag_id", "type", "name", "alias", "players"]
+
+# Conflicts and errors listed individually in a report; the rest are counted.
+REPORT_LIMIT = 50
+
+# Largest YAML file imported; about 100,000 tags.
+YAML_SIZE_LIMIT = 10 * 1024 * 1024
+# Characters read from a JSON file at a time.
+JSON_CHUNK_SIZE = 64 * 1024
+
+_EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".json": FORMAT_JSON,
+    ".jsonl": FORMAT_JSONL,
+    ".ndjson": FORMAT_JSONL,
+    ".yaml": FORMAT_YAML,
+    ".yml": FORMAT_YAML,
+}
+
+
+class TransferError(Exception):
+    """A mapping file cannot be read or written."""
+
+
+class _Invalid:
+    """Stands in for the tag ID of a record that could not be parsed."""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+def detect_format(file_path: str, file_format: Optional[str] = None) -> str:
+    """Return the given format, or the one implied by the file extension."""
+    if file_format:
+        return file_format
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in _EXTENSIONS:
+        raise TransferError(f"Cannot tell the format of {file_path}, pass one of {', '.join(FORMATS)}")
+    return _EXTENSIONS[extension]
+
+
+class ImportReport:
+    """What an import did, or would do in a dry run."""
+
+    def __init__(self, dry_run: bool):
+        """Initialize the report."""
+        self.dry_run = dry_run
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.conflicts: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self._conflict_count = 0
+        self._error_count = 0
+
+    def add_conflict(self, current: TagMapping, new: TagMapping) -> None:
+        """Record a tag that is already mapped to other media."""
+        self._conflict_count += 1
+        if len(self.conflicts) < REPORT_LIMIT:
+            self.conflicts.append(
+                {"tag_id": new.tag_id, "current": current.as_dict(), "new": new.as_dict()}
+            )
+
+    def add_error(self, row: str, reason: str) -> None:
+        """Record a row that could not be imported."""
+        self._error_count += 1
+        if len(self.errors) < REPORT_LIMIT:
+            self.errors.append({"row": row, "reason": reason})
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as a service response."""
+        return {
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            "added": self.added,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "conflict_count": self._conflict_count,
+            "conflicts": self.conflicts,
+            "error_count": self._error_count,
+            "errors": self.errors,
+        }
+
+
+def plan_import(
+    file_path: str,
+    file_format: Optional[str],
+    current: Dict[str, TagMapping],
+    overwrite: bool,
+    dry_run: bool,
+) -> Tuple[Dict[str, TagMapping], ImportReport]:
+    """Read and validate a mapping file against the current index.
+
+    Returns the mappings to apply and the report. Tags already mapped to
+    other media are conflicts; they are only replaced with ``overwrite``.
+    Later rows for the same tag win over earlier ones.
+    """
+    report = ImportReport(dry_run)
+    changes: Dict[str, TagMapping] = {}
+    for row, key, raw in _iter_records(file_path, detect_format(file_path, file_format)):
+        report.rows += 1
+        mapping, reason = _validate(key, raw)
+        if mapping is None:
+            report.add_error(row, reason)
+            continue
+        if mapping.tag_id in changes:
+            report.duplicates += 1
+        changes[mapping.tag_id] = mapping
+
+    for tag_id, mapping in list(changes.items()):
+        existing = current.get(tag_id)
+        if existing is None:
+            report.added += 1
+        elif existing == mapping:
+            report.unchanged += 1
+            del changes[tag_id]
+        elif existing.media_type == mapping.media_type and existing.name == mapping.name:
+            # Only the alias differs, not worth a conflict.
+            report.updated += 1
+        else:
+            report.add_conflict(existing, mapping)
+            if overwrite:
+                report.updated += 1
+            else:
+                report.skipped += 1
+                del changes[tag_id]
+    return changes, report
+
+
+def write_export(file_path: str, file_format: Optional[str], mappings: Iterable[TagMapping]) -> int:
+    """Write mappings to a file atomically and return how many were written."""
+    file_format = detect_format(file_path, file_format)
+    if file_format == FORMAT_YAML:
+        snapshot = {mapping.tag_id: mapping.as_dict() for mapping in mappings}
+        try:
+            write_mappings_atomic(file_path, snapshot)
+        except (OSError, yaml.YAMLError) as err:
+            raise TransferError(f"Cannot write {file_path}: {err}") from err
+        return len(snapshot)
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    count = 0
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".rfid_export.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                if file_format == FORMAT_CSV:
+                    writer = csv.writer(f)
+                    writer.writerow(CSV_COLUMNS)
+                    for mapping in mappings:
+                        writer.writerow(
+                            [mapping.tag_id, mapping.media_type, mapping.name, mapping.alias, " ".join(mapping.players)]
+                        )
+                        count += 1
+                elif file_format == FORMAT_JSONL:
+                    for mapping in mappings:
+                        f.write(json.dumps({"tag_id": mapping.tag_id, **mapping.as_dict()}) + "\n")
+                        count += 1
+                else:
+                    # Written entry by entry so the whole document is never built.
+                    f.write("{")
+                    for mapping in mappings:
+                        f.write(",\n" if count else "\n")
+                        f.write(f"{json.dumps(mapping.tag_id)}: {json.dumps(mapping.as_dict())}")
+                        count += 1
+                    f.write("\n}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    except OSError as err:
+        raise TransferError(f"Cannot write {file_path}: {err}") from err
+    fsync_directory(directory)
+    return count
+
+
+def _validate(key: Any, raw: Any) -> Tuple[Optional[TagMapping], str]:
+    """Return the mapping for one record, or None and the reason it is invalid."""
+    if isinstance(key, _Invalid):
+        return None, key.reason
+    if key is None or not str(key).strip():
+        return None, "missing tag ID"
+    if isinstance(raw, dict):
+        media_type = raw.get("type") or None
+        if media_type is not None and media_type not in MEDIA_TYPES:
+            return None, f"unknown media type '{media_type}'"
+    mapping = TagMapping.from_raw(normalize_tag_id(key), raw)
+    if mapping is None:
+        return None, "missing media name"
+    return mapping, ""
+
+
+def _iter_records(file_path: str, file_format: str) -> Iterator[Tuple[str, Any, Any]]:
+    """Yield ``(row label, tag ID, raw mapping)`` for every record in a file."""
+    try:
+        if file_format == FORMAT_CSV:
+            yield from _iter_csv(file_path)
+        elif file_format == FORMAT_JSONL:
+            yield from _iter_jsonl(file_path)
+        elif file_format == FORMAT_JSON:
+            yield from _iter_json(file_path)
+        else:
+            size = os.path.getsize(file_path)
+            if size > YAML_SIZE_LIMIT:
+                raise TransferError(
+                    f"{file_path} is {size / 1048576:.1f} MB, YAML files are limited to "
+                    f"{YAML_SIZE_LIMIT // 1048576} MB; use CSV, JSON or JSON Lines for larger imports"
+                )
+            with open(file_path, "r", encoding="utf-8") as f:
+                yield from _iter_document(yaml.load(f, Loader=safe_loader()))
+    except FileNotFoundError as err:
+        raise TransferError(f"{file_path} does not exist") from err
+    except (OSError, UnicodeDecodeError, csv.Error, ValueError, yaml.YAMLError) as err:
+        raise TransferError(f"Cannot read {file_path}: {err}") from err
+
+
+def _row_mapping(row: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """Split a row with tag, type, name, alias and players columns."""
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    tag_id = row.get("tag_id") or row.get("tag") or row.get("uid")
+    return tag_id, {
+        "type": row.get("type") or row.get("media_type"),
+        "name": row.get("name") or row.get("media_name"),
+        "alias": row.get("alias"),
+        "players": row.get("players"),
+    }
+
+
+def _iter_csv(file_path: str) -> Iterator[Tuple[str, Any, Any]]:
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield (f"line {reader.line_num}", *_row_mapping(row))
+
+
+def _iter_jsonl(file_path: str) -> Iterator[Tuple[str, Any, Any]]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            label = f"line {line_number}"
+            try:
+                record = json.loads(line)
+            except ValueError as err:
+                yield label, _Invalid(f"invalid JSON: {err}"), None
+                continue
+            if not isinstance(record, dict):
+                yield label, _Invalid("not an object"), None
+                continue
+            yield (label, *_row_mapping(record))
+
+
+def _iter_document(document: Any) -> Iterator[Tuple[str, Any, Any]]:
+    """Yield records from a parsed JSON or YAML document.
+
+    Accepts the mapping file format, ``{tag_id: {type, name, alias}}``, or a
+    list of row objects.
+    """
+    if isinstance(document, dict):
+        for key, raw in document.items():
+            yield f"tag {key}", key, raw
+    elif isinstance(document, list):
+        for index, record in enumerate(document, 1):
+            yield _item_record(index, record)
+    elif document is not None:
+        raise ValueError("expected a mapping of tags or a list of rows")
+
+
+def _item_record(index: int, record: Any) -> Tuple[str, Any, Any]:
+    """Return the record of one item of a list of row objects."""
+    if isinstance(record, dict):
+        return (f"item {index}", *_row_mapping(record))
+    return f"item {index}", _Invalid("not an object"), None
+
+
+def _iter_json(file_path: str) -> Iterator[Tuple[str, Any, Any]]:
+    """Yield records from a JSON document, one top-level entry at a time."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = _JsonReader(f)
+        start = reader.peek()
+        if start == "{":
+            for key, raw in reader.iter_container("{", "}"):
+                yield f"tag {key}", key, raw
+        elif start == "[":
+            for index, record in enumerate(reader.iter_container("[", "]"), 1):
+                yield _item_record(index, record)
+        else:
+            yield from _iter_document(reader.value())
+        if reader.peek():
+            raise reader.error("extra data after the document")
+
+
+class _JsonReader:
+    """Decode the entries of a JSON document's top-level object or array.
+
+    Only one entry is held in memory at a time, along with the rest of the
+    chunk it was read in.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+
+    def error(self, reason: str) -> ValueError:
+        """Return an error pointing at the current position."""
+        return ValueError(f"invalid JSON at character {self._offset + self._pos}: {reason}")
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._read():
+                return self._buffer[self._pos : self._pos + 1]
+
+    def value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError as err:
+                if self._read():
+                    continue
+                raise self.error(str(err)) from err
+            # A number cut off at the end of the chunk decodes too early.
+            if end == len(self._buffer) and self._read():
+                continue
+            self._pos = end
+            return value
+
+    def iter_container(self, opening: str, closing: str) -> Iterator[Any]:
+        """Yield the values of an array, or the ``(key, value)`` pairs of an object."""
+        self._pos += 1
+        if self.peek() == closing:
+            self._pos += 1
+            return
+        while True:
+            if opening == "{":
+                key = self.value()
+                if not isinstance(key, str):
+                    raise self.error("expected a string key")
+                if self.peek() != ":":
+                    raise self.error("expected ':'")
+                self._pos += 1
+                yield key, self.value()
+            else:
+                yield self.value()
+            separator = self.peek()
+            self._pos += 1
+            if separator == closing:
+                return
+            if separator != ",":
+                raise self.error(f"expected ',' or '{closing}'")
+
+    def _read(self) -> bool:
+        """Append the next chunk, dropping what was consumed; False at the end."""
+        if self._eof:
+            return False
+        chunk = self._file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
@@ -0,0 +1,160 @@
+"""Predictive warm-up of the jukebox player."""
+import logging
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, List, Optional
+
+from homeassistant.const import STATE_OFF, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import event
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+_INACTIVE_STATES = (STATE_UNAVAILABLE, STATE_UNKNOWN, STATE_OFF)
+# Days of tap statistics consulted for the cards usual at this hour.
+HOURLY_DAYS = 28
+
+
+def parse_warmup_times(value: Optional[str]) -> List[tuple]:
+    """Parse ``"07:00, 18:30"`` into ``[(7, 0), (18, 30)]``, skipping bad entries."""
+    times = []
+    for part in (value or "").replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            hour, minute = (int(piece) for piece in part.split(":")[:2])
+        except ValueError:
+            _LOGGER.warning("Ignoring invalid warm-up time '%s'", part)
+            continue
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            times.append((hour, minute))
+        else:
+            _LOGGER.warning("Ignoring invalid warm-up time '%s'", part)
+    return times
+
+
+class PlayerWarmUp:
+    """Wake the player and pre-resolve the most likely next tags.
+
+    Runs when the box becomes active (its tag sensor or player comes back
+    from unavailable/off) and at configured times of day. The box hands it
+    the state changes of both, as the coordinator dispatches them. Likely tags are
+    ranked from the box's recent tap history, newest taps weighing most,
+    plus the cards most tapped at this hour according to the statistics.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        jukebox,
+        times: List[tuple],
+        top_tags: int,
+        history: int,
+        cooldown: float,
+    ):
+        """Initialize the warm-up."""
+        self.hass = hass
+        self._jukebox = jukebox
+        self.times = times
+        self.top_tags = top_tags
+        self.cooldown = cooldown
+        self.runs = 0
+        self.last_run: Optional[float] = None
+        self._history: Deque[str] = deque(maxlen=history)
+
+    @callback
+    def async_setup(self) -> Callable[[], None]:
+        """Schedule the warm-ups at the configured times; return an unsubscribe."""
+        unsubs = [
+            event.async_track_time_change(self.hass, self._async_scheduled, hour=hour, minute=minute, second=0)
+            for hour, minute in self.times
+        ]
+
+        @callback
+        def _unsub() -> None:
+            while unsubs:
+                unsubs.pop()()
+
+        return _unsub
+
+    @callback
+    def record_tap(self, tag_id: str) -> None:
+        """Remember a tap for the likely-next-tag ranking."""
+        self._history.append(tag_id)
+
+    @callback
+    def likely_tags(self) -> List[str]:
+        """Return the most likely next tags, best first."""
+        scores: Counter = Counter()
+        # Linear recency weighting: the newest tap counts len(history) times
+        # as much as the oldest one still remembered.
+        for weight, tag_id in enumerate(self._history, 1):
+            scores[tag_id] += weight
+        # Cards usually tapped at this hour over the last four weeks get a
+        # bonus on par with the newest tap.
+        bonus = len(self._history) or 1
+        analytics = self._jukebox.analytics
+        hourly = []
+        if analytics is not None:
+            hourly = analytics.top_tags(self.top_tags, HOURLY_DAYS, hour=dt_util.now().hour)
+        for rank, tag_id in enumerate(hourly):
+            scores[tag_id] += bonus * (len(hourly) - rank) / len(hourly)
+        return [tag_id for tag_id, _ in scores.most_common(self.top_tags)]
+
+    @callback
+    def async_trigger(self, reason: str) -> None:
+        """Run a warm-up in the background unless one ran recently."""
+        now = time.monotonic()
+        if self.last_run is not None and now - self.last_run < self.cooldown:
+            return
+        self.last_run = now
+        _LOGGER.debug("Warming up player (%s)", reason)
+        self._jukebox.entry.async_create_background_task(
+            self.hass, self._async_warm_up(), "rfid_jukebox_warm_up"
+        )
+
+    @callback
+    def async_state_changed(self, event_data) -> None:
+        """Warm up when the tag sensor or the player becomes active."""
+        old_state = event_data.data.get("old_state")
+        new_state = event_data.data.get("new_state")
+        if not old_state or not new_state:
+            return
+        if old_state.state in _INACTIVE_STATES and new_state.state not in _INACTIVE_STATES:
+            self.async_trigger(f"{new_state.entity_id} became active")
+        elif (
+            new_state.entity_id == self._jukebox.plan.tag_sensor
+            and old_state.state == STATE_UNAVAILABLE
+            and new_state.state != STATE_UNAVAILABLE
+        ):
+            # The reader reports "unknown" once it is back and empty.
+            self.async_trigger("tag reader came online")
+
+    @callback
+    def _async_scheduled(self, _now) -> None:
+        """Warm up at a configured time of day."""
+        self.async_trigger("scheduled")
+
+    async def _async_warm_up(self) -> None:
+        """Wake the player and resolve the likely tags."""
+        self.runs += 1
+        jukebox = self._jukebox
+        media_player = jukebox.plan.media_player
+        player_state = self.hass.states.get(media_player)
+        if player_state and player_state.state == STATE_OFF:
+            try:
+                await self.hass.services.async_call(
+                    "media_player",
+                    "turn_on",
+                    {"entity_id": media_player},
+                    blocking=True,
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Could not wake %s: %s", media_player, err)
+
+        for tag_id in self.likely_tags():
+            mapping = jukebox.mappings.get(tag_id)
+            if mapping and jukebox.resolver.get(mapping) is None:
+                await jukebox.resolver.async_resolve(mapping)
@@ -0,0 +1,108 @@
+"""Fixtures for the RFID Jukebox tests."""
+import asyncio
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytest
+from homeassistant.exceptions import HomeAssistantError, ServiceNotFound
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.rfid_jukebox import debounce  # noqa: E402
+
+
+class FakeTimers:
+    """Stand-in for ``event.async_call_later`` that fires on demand."""
+
+    def __init__(self):
+        """Initialize without pending timers."""
+        self.pending: List[Tuple[float, Callable]] = []
+
+    def call_later(self, _hass, delay: float, action: Callable) -> Callable[[], None]:
+        """Record a timer and return its canceller."""
+        timer = (delay, action)
+        self.pending.append(timer)
+
+        def _cancel() -> None:
+            if timer in self.pending:
+                self.pending.remove(timer)
+
+        return _cancel
+
+    def fire(self) -> int:
+        """Run every pending timer; return how many ran."""
+        timers, self.pending = self.pending, []
+        for _delay, action in timers:
+            action(None)
+        return len(timers)
+
+
+class FakeServices:
+    """Records service calls.
+
+    While ``outage`` is set, calls fail as if Music Assistant were not
+    loaded; otherwise they raise ``error``, if set.
+    """
+
+    def __init__(self):
+        """Initialize an empty call log."""
+        self.calls: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.outage = False
+        self.error: Optional[HomeAssistantError] = None
+        self.latency = 0.0
+
+    async def async_call(self, domain: str, service: str, data: Dict[str, Any], blocking: bool = False):
+        """Record the call, wait ``latency`` seconds and fail during an outage."""
+        self.calls.append((domain, service, data))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.outage:
+            raise ServiceNotFound(domain, service)
+        if self.error is not None:
+            raise self.error
+
+
+class FakeStates:
+    """Entity states by entity ID."""
+
+    def __init__(self):
+        """Initialize without states."""
+        self.states: Dict[str, Any] = {}
+
+    def get(self, entity_id: str) -> Any:
+        """Return the state of an entity, or None."""
+        return self.states.get(entity_id)
+
+
+class FakeHass:
+    """The bits of ``HomeAssistant`` the playback queue uses."""
+
+    def __init__(self):
+        """Initialize the services."""
+        self.services = FakeServices()
+        self.states = FakeStates()
+        self.data: Dict[str, Any] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running event loop."""
+        return asyncio.get_running_loop()
+
+    def async_create_task(self, target, name: Optional[str] = None) -> asyncio.Task:
+        """Schedule a coroutine on the running loop."""
+        return self.loop.create_task(target)
+
+
+@pytest.fixture
+def timers(monkeypatch) -> FakeTimers:
+    """Replace the debouncer's timers with ones fired by the test."""
+    fake = FakeTimers()
+    monkeypatch.setattr(debounce.event, "async_call_later", fake.call_later)
+    return fake
+
+
+@pytest.fixture
+def hass() -> FakeHass:
+    """Return a Home Assistant stand-in for the playback queue."""
+    return FakeHass()
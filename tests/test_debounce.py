@@ -0,0 +1,97 @@
+"""Tests of the tag debouncer."""
+from custom_components.rfid_jukebox.debounce import TagDebouncer
+
+
+class Events:
+    """Collects what the debouncer reports."""
+
+    def __init__(self):
+        """Initialize an empty log."""
+        self.log = []
+
+    def present(self, tag):
+        self.log.append(("present", tag))
+
+    def removed(self):
+        self.log.append(("removed",))
+
+
+def make(timers, removal_grace=0.0, presence_confirm=0.0):
+    """Return a debouncer and the log of its reports."""
+    events = Events()
+    debouncer = TagDebouncer(
+        None, events.present, events.removed, removal_grace=removal_grace, presence_confirm=presence_confirm
+    )
+    return debouncer, events
+
+
+def test_zero_windows_pass_through(timers):
+    """Without windows every change is reported at once."""
+    debouncer, events = make(timers)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    assert events.log == [("present", "A"), ("removed",)]
+    assert not timers.pending
+
+
+def test_dropout_within_grace_is_absorbed(timers):
+    """The same tag back within the grace window is no removal."""
+    debouncer, events = make(timers, removal_grace=1.0)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    assert debouncer.removal_pending
+    debouncer.async_present("A")
+    assert not debouncer.removal_pending
+    assert timers.fire() == 0
+    assert events.log == [("present", "A")]
+    assert debouncer.absorbed_removals == 1
+
+
+def test_removal_reported_after_grace(timers):
+    """A tag that stays away is reported removed once the window ends."""
+    debouncer, events = make(timers, removal_grace=1.0)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    debouncer.async_removed()
+    assert timers.fire() == 1
+    assert events.log == [("present", "A"), ("removed",)]
+
+
+def test_other_tag_ends_grace_at_once(timers):
+    """A different tag reports the old one removed before itself."""
+    debouncer, events = make(timers, removal_grace=1.0)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    debouncer.async_present("B")
+    assert events.log == [("present", "A"), ("removed",), ("present", "B")]
+    assert not timers.pending
+
+
+def test_unconfirmed_presence_is_absorbed(timers):
+    """A tag gone before the confirmation window ends is never reported."""
+    debouncer, events = make(timers, presence_confirm=0.2)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    assert timers.fire() == 0
+    assert events.log == []
+    assert debouncer.absorbed_presences == 1
+    assert debouncer.flaps_absorbed == 1
+
+
+def test_presence_confirmed_after_window(timers):
+    """A tag that stays is reported once, when the window ends."""
+    debouncer, events = make(timers, presence_confirm=0.2)
+    debouncer.async_present("A")
+    debouncer.async_present("A")
+    assert timers.fire() == 1
+    assert events.log == [("present", "A")]
+
+
+def test_cancel_drops_pending_timers(timers):
+    """Cancelling reports nothing that was pending."""
+    debouncer, events = make(timers, removal_grace=1.0)
+    debouncer.async_present("A")
+    debouncer.async_removed()
+    debouncer.async_cancel()
+    assert not timers.pending
+    assert events.log == [("present", "A")]
@@ -0,0 +1,195 @@
+"""Tests of the playback command queue."""
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+
+from custom_components.rfid_jukebox.playback import (
+    KIND_PAUSE,
+    KIND_RESUME,
+    KIND_START,
+    PlaybackCommand,
+    PlaybackQueue,
+)
+
+
+def command(kind: str, media: str = "A") -> PlaybackCommand:
+    """Return a command playing or controlling ``media``."""
+    return PlaybackCommand(kind, "media_player", kind, {"media": media}, "Failed")
+
+
+async def async_drain(queue: PlaybackQueue) -> None:
+    """Wait until the queue has sent everything."""
+    for _ in range(1000):
+        if queue.intent is None:
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("queue never drained")
+
+
+def test_newest_start_wins(hass):
+    """A start replaces every command queued before it."""
+
+    async def _async_run():
+        hass.services.latency = 0.01
+        done, failed = [], []
+        queue = PlaybackQueue(hass, done.append, failed.append)
+        queue.async_submit(command(KIND_START, "A"))
+        await asyncio.sleep(0)
+        queue.async_submit(command(KIND_PAUSE))
+        latest = command(KIND_START, "B")
+        queue.async_submit(latest)
+        await async_drain(queue)
+        assert done == [latest]
+        assert queue.superseded == 2
+
+    asyncio.run(_async_run())
+
+
+def test_pause_and_resume_cancel_out(hass):
+    """A resume queued behind its pause removes both."""
+
+    async def _async_run():
+        hass.services.latency = 0.01
+        queue = PlaybackQueue(hass)
+        start = command(KIND_START)
+        queue.async_submit(start)
+        await asyncio.sleep(0)
+        queue.async_submit(command(KIND_PAUSE))
+        assert queue.async_submit(command(KIND_RESUME)) is start
+        await async_drain(queue)
+        assert [call[1] for call in hass.services.calls] == [KIND_START]
+        assert queue.coalesced == 1
+
+    asyncio.run(_async_run())
+
+
+def test_duplicate_is_dropped(hass):
+    """The same intent twice is sent once."""
+
+    async def _async_run():
+        hass.services.latency = 0.01
+        queue = PlaybackQueue(hass)
+        pause = command(KIND_PAUSE)
+        queue.async_submit(pause)
+        assert queue.async_submit(command(KIND_PAUSE)) is pause
+        await async_drain(queue)
+        assert len(hass.services.calls) == 1
+
+    asyncio.run(_async_run())
+
+
+def test_failure_without_expiry_is_reported(hass):
+    """With retries off a failed command is given up at once."""
+
+    async def _async_run():
+        hass.services.outage = True
+        failed = []
+        queue = PlaybackQueue(hass, on_error=failed.append)
+        start = command(KIND_START)
+        queue.async_submit(start)
+        await async_drain(queue)
+        assert failed == [start]
+        assert queue.retries == 0
+
+    asyncio.run(_async_run())
+
+
+def test_failed_command_is_retried(hass):
+    """A failed command is sent again once the outage ends."""
+
+    async def _async_run():
+        hass.services.outage = True
+        done = []
+        queue = PlaybackQueue(hass, done.append, expiry=5, retry_delay=0.01, retry_max_delay=0.02)
+        start = command(KIND_START)
+        queue.async_submit(start)
+        await asyncio.sleep(0.03)
+        assert queue.retrying is start
+        hass.services.outage = False
+        await async_drain(queue)
+        assert done == [start]
+        assert queue.retries >= 1
+
+    asyncio.run(_async_run())
+
+
+def test_retry_replaced_by_newer_command(hass):
+    """A command submitted during the backoff is sent instead of the retry."""
+
+    async def _async_run():
+        hass.services.outage = True
+        done, failed = [], []
+        queue = PlaybackQueue(hass, done.append, failed.append, expiry=5, retry_delay=1)
+        first = command(KIND_START, "A")
+        queue.async_submit(first)
+        await asyncio.sleep(0.01)
+        hass.services.outage = False
+        latest = command(KIND_START, "B")
+        queue.async_submit(latest)
+        await async_drain(queue)
+        assert done == [latest]
+        assert first not in done
+
+    asyncio.run(_async_run())
+
+
+def test_command_expires_during_outage(hass):
+    """A command that cannot be sent within the expiry is dropped."""
+
+    async def _async_run():
+        hass.services.outage = True
+        failed = []
+        queue = PlaybackQueue(hass, on_error=failed.append, expiry=0.05, retry_delay=0.01, retry_max_delay=0.02)
+        start = command(KIND_START)
+        queue.async_submit(start)
+        await async_drain(queue)
+        assert failed == [start]
+        assert queue.expired == 1
+
+    asyncio.run(_async_run())
+
+
+def test_permanent_failures_are_not_retried(hass):
+    """Invalid calls, failures of an available player and broken media are given up at once."""
+
+    async def _async_run():
+        hass.states.states["media_player.box"] = SimpleNamespace(state="idle")
+        broken = command(KIND_START)
+        broken.retry = False
+        cases = [
+            (ServiceValidationError("bad data"), command(KIND_START)),
+            (HomeAssistantError("media not found"), command(KIND_START)),
+            (HomeAssistantError("media not found"), broken),
+        ]
+        for error, start in cases:
+            hass.services.error = error
+            start.data["entity_id"] = "media_player.box"
+            failed = []
+            queue = PlaybackQueue(hass, on_error=failed.append, expiry=5, retry_delay=0.01)
+            queue.async_submit(start)
+            await async_drain(queue)
+            assert failed == [start]
+            assert queue.retries == 0
+
+    asyncio.run(_async_run())
+
+
+def test_unavailable_player_is_retried(hass):
+    """A failure while the player is unavailable is retried once it is back."""
+
+    async def _async_run():
+        hass.states.states["media_player.box"] = SimpleNamespace(state="unavailable")
+        hass.services.error = HomeAssistantError("player unavailable")
+        done = []
+        queue = PlaybackQueue(hass, done.append, expiry=5, retry_delay=0.01, retry_max_delay=0.02)
+        start = PlaybackCommand(KIND_START, "media_player", "play", {"entity_id": "media_player.box"}, "Failed")
+        queue.async_submit(start)
+        await asyncio.sleep(0.03)
+        assert queue.retrying is start
+        hass.states.states["media_player.box"] = SimpleNamespace(state="idle")
+        hass.services.error = None
+        await async_drain(queue)
+        assert done == [start]
+
+    asyncio.run(_async_run())
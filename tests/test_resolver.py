@@ -0,0 +1,134 @@
+"""Tests of the media resolver's folder checks."""
+import asyncio
+
+from custom_components.rfid_jukebox.models import TagMapping
+from custom_components.rfid_jukebox.resolver import MediaResolver
+
+FILESYSTEM = "filesystem_local--test"
+ROOT = f"{FILESYSTEM}://folder/"
+
+
+class Child:
+    """A browsed folder entry."""
+
+    def __init__(self, media_content_id: str, title: str):
+        """Initialize the entry."""
+        self.media_content_id = media_content_id
+        self.title = title
+        self.children = None
+
+
+class Player:
+    """A player browsing a fixed folder tree, one level per call."""
+
+    def __init__(self, folders):
+        """Initialize with the paths of the folders that exist."""
+        self.folders = set(folders)
+        self.browsed = []
+
+    def get_entity(self, _entity_id):
+        return self
+
+    async def async_browse_media(self, media_content_type, media_content_id):
+        self.browsed.append(media_content_id)
+        path = media_content_id[len(ROOT):].rstrip("/")
+        if path and path not in self.folders:
+            raise ValueError(f"{path} does not exist")
+        listed = Child(media_content_id, path.rpartition("/")[2])
+        listed.children = [
+            Child(ROOT + folder, folder.rpartition("/")[2])
+            for folder in sorted(self.folders)
+            if folder.rpartition("/")[0] == path
+        ]
+        return listed
+
+
+def folder(tag_id: str, name: str) -> TagMapping:
+    """Return a folder mapping."""
+    return TagMapping.from_raw(tag_id, {"type": "folder", "name": name})
+
+
+def make(hass, folders) -> MediaResolver:
+    """Return a resolver browsing ``folders`` through a stand-in player."""
+    hass.data["media_player"] = Player(folders)
+    return MediaResolver(hass, "media_player.test", FILESYSTEM, 100, 3600)
+
+
+def test_refresh_lists_each_parent_once(hass):
+    """Folders next to each other are checked against one listing."""
+    resolver = make(hass, ["kids", "kids/songs", "kids/stories", "kids/radio"])
+    mappings = [folder("01", "kids/songs"), folder("02", "kids/stories"), folder("03", "/kids/radio")]
+    asyncio.run(resolver.async_refresh(mappings))
+    assert hass.data["media_player"].browsed == [ROOT + "kids"]
+    assert resolver.get(mappings[2]) == ROOT + "kids/radio"
+    assert not resolver.broken
+
+
+def test_missing_folder_is_broken(hass):
+    """A folder its parent does not list is reported, and not cached."""
+    resolver = make(hass, ["kids", "kids/songs"])
+    mappings = [folder("01", "kids/sogns"), folder("02", "nope/songs")]
+    asyncio.run(resolver.async_refresh(mappings))
+    assert "not found" in resolver.broken["01"]
+    assert "cannot be browsed" in resolver.broken["02"]
+    assert resolver.get(mappings[0]) is None
+
+
+def test_single_resolve_browses_the_parent(hass):
+    """Resolving one folder lists the folder it is in, not the folder itself."""
+    resolver = make(hass, ["kids", "kids/songs"])
+    assert asyncio.run(resolver.async_resolve(folder("01", "kids/songs"))) == ROOT + "kids/songs"
+    assert hass.data["media_player"].browsed == [ROOT + "kids"]
+
+
+def test_adopt_copies_results(hass):
+    """A resolver sharing the filesystem takes over results without browsing."""
+    source = make(hass, ["kids", "kids/songs"])
+    mappings = [folder("01", "kids/songs"), folder("02", "kids/missing")]
+    asyncio.run(source.async_refresh(mappings))
+    target = MediaResolver(hass, "media_player.other", FILESYSTEM, 100, 3600)
+    target.broken["03"] = "stale"
+    target.adopt(source, mappings)
+    assert target.get(mappings[0]) == ROOT + "kids/songs"
+    assert set(target.broken) == {"02"}
+    assert hass.data["media_player"].browsed == [ROOT + "kids"]
+
+
+class Track:
+    """A browsed track or subfolder entry."""
+
+    def __init__(self, media_content_id: str, can_expand: bool = False):
+        """Initialize the entry."""
+        self.media_content_id = media_content_id
+        self.can_play = True
+        self.can_expand = can_expand
+
+
+class FolderPlayer:
+    """A player listing one folder's entries."""
+
+    def __init__(self, children):
+        """Initialize with the entries of the folder."""
+        self.children = children
+
+    def get_entity(self, _entity_id):
+        return self
+
+    async def async_browse_media(self, media_content_type, media_content_id):
+        listed = Track(media_content_id, True)
+        listed.children = self.children
+        return listed
+
+
+def test_list_tracks_only_lists_flat_folders(hass):
+    """Folders with subfolders or over the limit are not listed as tracks."""
+    tracks = [Track(f"{ROOT}kids/{index}.mp3") for index in range(3)]
+    resolver = MediaResolver(hass, "media_player.test", FILESYSTEM, 100, 3600)
+    cases = [
+        (tracks, 3, [track.media_content_id for track in tracks]),
+        (tracks, 2, None),
+        ([*tracks, Track(f"{ROOT}kids/more", True)], 10, None),
+    ]
+    for children, limit, expected in cases:
+        hass.data["media_player"] = FolderPlayer(children)
+        assert asyncio.run(resolver.async_list_tracks("folder", ROOT + "kids", limit)) == expected
@@ -0,0 +1,50 @@
+"""Tests of the sensor state writes."""
+from types import SimpleNamespace
+
+from custom_components.rfid_jukebox.sensor import PendingCommandsSensor
+
+
+class Playback:
+    """A playback queue's depth and counters."""
+
+    def __init__(self):
+        """Initialize an empty queue."""
+        self.depth = 0
+        self.retries = 0
+        self.expired = 0
+
+    def diagnostics(self):
+        return {"depth": self.depth, "retries": self.retries, "expired": self.expired}
+
+
+def make_sensor(hass):
+    """Return a pending commands sensor and the depths it writes."""
+    playback = Playback()
+    sensor = PendingCommandsSensor(SimpleNamespace(entry=SimpleNamespace(entry_id="box"), playback=playback))
+    sensor.hass = hass
+    written = []
+    sensor.async_write_ha_state = lambda: written.append(sensor._attr_native_value)
+    return sensor, playback, written
+
+
+def test_healthy_tap_is_not_written(hass, timers):
+    """A command that completes before the delay writes nothing."""
+    sensor, playback, written = make_sensor(hass)
+    for depth in (1, 2, 1, 0):
+        playback.depth = depth
+        sensor.update_value(playback)
+    assert written == []
+    assert timers.pending == []
+
+
+def test_backlog_and_retries_are_written(hass, timers):
+    """Commands that stay pending, retries and the cleared backlog are written."""
+    sensor, playback, written = make_sensor(hass)
+    playback.depth = 1
+    sensor.update_value(playback)
+    assert timers.fire() == 1
+    playback.retries = 1
+    sensor.update_value(playback)
+    playback.depth = 0
+    sensor.update_value(playback)
+    assert written == [1, 1, 0]
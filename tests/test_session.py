@@ -0,0 +1,295 @@
+"""Tests of the tag session state machine."""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+from conftest import FakeHass
+from homeassistant.const import STATE_IDLE, STATE_PAUSED, STATE_PLAYING
+
+from custom_components.rfid_jukebox import RFIDJukebox
+from custom_components.rfid_jukebox.const import (
+    CONF_COMMAND_EXPIRY,
+    CONF_MA_FILESYSTEM,
+    CONF_MEDIA_PLAYER,
+    CONF_PLAYBACK_ONLY,
+    CONF_PRESENCE_CONFIRM,
+    CONF_REMOVAL_GRACE,
+    CONF_TAG_SENSOR,
+    CONF_TAP_STATISTICS,
+)
+from custom_components.rfid_jukebox.models import TagMapping
+from custom_components.rfid_jukebox.playback import KIND_RESUME, KIND_START, PlaybackCommand
+from custom_components.rfid_jukebox.session import (
+    _TRANSITIONS,
+    STATE_REMOVED_GRACE,
+    STATE_STARTING,
+    TagSession,
+)
+
+SENSOR = "sensor.reader"
+PLAYER = "media_player.box"
+MAPPED = ("AA-01", "AA-02")
+TAGS = (*MAPPED, "AA-03")
+PLAYER_STATES = ("idle", "off", "unavailable", "playing", "paused", "buffering")
+TABLE = {(old, new) for old, targets in _TRANSITIONS.items() for new in targets}
+
+
+def command(kind: str = KIND_START) -> PlaybackCommand:
+    """Return a playback command that is never sent."""
+    return PlaybackCommand(kind, "music_assistant", "play_media", {}, "Failed")
+
+
+def state_event(entity_id: str, state: str) -> SimpleNamespace:
+    """Return a state changed event of an entity."""
+    new_state = SimpleNamespace(
+        entity_id=entity_id, state=state, attributes={}, last_updated_timestamp=time.time()
+    )
+    return SimpleNamespace(data={"entity_id": entity_id, "new_state": new_state})
+
+
+class Box:
+    """Drives a jukebox through its tag sensor and player handlers.
+
+    Each step is one event from the reader, the player, the timers, the
+    mapping store or Music Assistant; the jukebox decides what the session
+    does with it. Service calls finish on the next ``run`` step.
+    """
+
+    def __init__(self, hass, timers, rng: random.Random):
+        """Initialize a box with two mapped tags."""
+        self.hass = hass
+        self.timers = timers
+        self.rng = rng
+        entry = SimpleNamespace(
+            entry_id="box",
+            data={CONF_TAG_SENSOR: SENSOR, CONF_MEDIA_PLAYER: PLAYER, CONF_MA_FILESYSTEM: "filesystem_local--test"},
+            options={
+                CONF_REMOVAL_GRACE: rng.choice((0.0, 1.0)),
+                CONF_PRESENCE_CONFIRM: rng.choice((0.0, 0.5)),
+                CONF_COMMAND_EXPIRY: 0.05,
+                CONF_PLAYBACK_ONLY: True,
+                CONF_TAP_STATISTICS: False,
+            },
+        )
+        self.jukebox = RFIDJukebox(hass, entry)
+        self.jukebox.playback.retry_delay = 0.001
+        self.jukebox.playback.retry_max_delay = 0.002
+        self.jukebox.mappings = {tag: self._mapping(tag, "one") for tag in MAPPED}
+        self.session = self.jukebox.session
+
+    @staticmethod
+    def _mapping(tag_id: str, name: str) -> TagMapping:
+        return TagMapping.from_raw(tag_id, {"type": "folder", "name": f"{tag_id}/{name}"})
+
+    def tap(self) -> None:
+        self.jukebox.async_tag_changed_handler(state_event(SENSOR, self.rng.choice(TAGS)))
+
+    def lift(self) -> None:
+        self.jukebox.async_tag_changed_handler(state_event(SENSOR, "unknown"))
+
+    def timer(self) -> None:
+        self.timers.fire()
+
+    def player(self) -> None:
+        player_state = self.rng.choice(PLAYER_STATES)
+        self.hass.states.states[PLAYER] = SimpleNamespace(state=player_state, attributes={})
+        self.jukebox.async_player_changed(state_event(PLAYER, player_state))
+
+    def remap(self) -> None:
+        tag_id = self.rng.choice(MAPPED)
+        previous = self.jukebox.mappings[tag_id]
+        mapping = self._mapping(tag_id, self.rng.choice(("one", "two")))
+        self.jukebox.mappings[tag_id] = mapping
+        self.jukebox.async_mappings_changed([(previous, mapping)])
+
+    def outage(self) -> None:
+        self.hass.services.outage = not self.hass.services.outage
+
+    async def async_run(self) -> None:
+        await asyncio.sleep(0.001 if self.rng.random() < 0.2 else 0)
+
+    STEPS = ("tap", "tap", "lift", "timer", "player", "remap", "outage", "run", "run")
+
+    async def async_step(self) -> None:
+        step = self.rng.choice(self.STEPS)
+        if step == "run":
+            await self.async_run()
+        else:
+            getattr(self, step)()
+
+    async def async_settle(self) -> None:
+        """End any outage and wait until nothing is pending."""
+        self.hass.services.outage = False
+        for _ in range(1000):
+            if self.jukebox.playback.intent is None:
+                return
+            await asyncio.sleep(0.001)
+        raise AssertionError("playback never drained")
+
+
+def walk(hass, timers, seed: int, steps: int = 300) -> TagSession:
+    """Drive a jukebox through random events and check its session after each one."""
+
+    async def _async_walk() -> TagSession:
+        box = Box(hass, timers, random.Random(seed))
+        session = box.session
+        for _ in range(steps):
+            await box.async_step()
+            assert session.invalid == 0, list(session.history)[-3:]
+            if session.state == STATE_STARTING:
+                assert session.command is not None
+        await box.async_settle()
+        assert session.state != STATE_STARTING and session.command is None
+        box.jukebox.debouncer.async_cancel()
+        return session
+
+    return asyncio.run(_async_walk())
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_events_take_allowed_transitions(hass, timers, seed):
+    """Every transition of a random run is in the table."""
+    session = walk(hass, timers, seed)
+    for _at, _tag, old, new, _reason in session.history:
+        assert (old, new) in TABLE
+
+
+def test_table_has_no_unreachable_transitions(timers):
+    """Every transition in the table is taken by some run."""
+    taken = set()
+    for seed in range(200):
+        session = walk(FakeHass(), timers, seed)
+        taken.update((old, new) for _at, _tag, old, new, _reason in session.history)
+    assert TABLE - taken == set()
+
+
+def test_start_then_done_plays():
+    """A completed start plays and marks the media loaded."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    assert session.state == STATE_STARTING
+    session.async_command_done(start, True)
+    assert session.state == STATE_PLAYING
+    assert session.loaded
+    assert session.command is None
+
+
+def test_failed_start_goes_idle():
+    """A failed start leaves the session idle, so the next tap restarts."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_command_done(start, False)
+    assert session.state == STATE_IDLE
+    assert not session.loaded
+
+
+def test_superseded_start_is_ignored():
+    """Only the newest start settles the session."""
+    session = TagSession()
+    first, second = command(), command()
+    session.async_start("A", first)
+    session.async_start("B", second)
+    session.async_command_done(first, False)
+    assert session.state == STATE_STARTING
+    assert session.ignored == 1
+    session.async_command_done(second, True)
+    assert session.state == STATE_PLAYING
+    assert session.tag_id == "B"
+
+
+def test_lift_and_return_restore_the_state():
+    """A card back within the grace window picks up where it left."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_command_done(start, True)
+    session.async_lifted()
+    assert session.state == STATE_REMOVED_GRACE
+    assert session.active
+    session.async_returned()
+    assert session.state == STATE_PLAYING
+    assert session.grace_state is None
+
+
+def test_start_finishing_in_grace_window_is_kept():
+    """A start completing while the card is lifted settles the kept state."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_lifted()
+    session.async_command_done(start, True)
+    assert session.state == STATE_REMOVED_GRACE
+    assert session.grace_state == STATE_PLAYING
+    session.async_returned()
+    assert session.state == STATE_PLAYING
+
+
+def test_removal_while_starting_then_failure_goes_idle():
+    """A removal during a start pauses; the failed start then goes idle."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    assert session.async_removed()
+    assert session.state == STATE_PAUSED
+    session.async_command_done(start, False)
+    assert session.state == STATE_IDLE
+
+
+def test_removal_of_idle_card_does_not_pause():
+    """Only media that is playing or starting is paused on removal."""
+    session = TagSession()
+    session.async_stop("C")
+    assert not session.async_removed()
+    assert session.state == STATE_IDLE
+
+
+def test_continued_resume_plays_without_command():
+    """A resume that cancelled a queued pause plays right away."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_command_done(start, True)
+    session.async_removed()
+    session.async_continued("A")
+    assert session.state == STATE_PLAYING
+    assert session.command is None
+
+
+def test_player_stopping_during_start_clears_it():
+    """A start that never reported back follows the player."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_player_changed("idle")
+    assert session.state == STATE_IDLE
+    assert session.command is None
+    session.async_command_done(start, True)
+    assert session.state == STATE_IDLE
+    assert session.ignored == 1
+
+
+def test_paused_player_does_not_wake_idle_session():
+    """A pause of an earlier card's media is not this card's to resume."""
+    session = TagSession()
+    session.async_stop("C")
+    session.async_player_changed("paused")
+    assert session.state == STATE_IDLE
+    assert session.transitions == 1
+
+
+def test_remapped_tag_restarts():
+    """A tap after a remap starts the new media instead of resuming."""
+    session = TagSession()
+    start = command()
+    session.async_start("A", start)
+    session.async_command_done(start, True)
+    session.async_removed()
+    session.async_remapped()
+    assert not session.same_tag("A")
+    session.async_start("A", command())
+    assert session.same_tag("A")
+    assert not session.loaded
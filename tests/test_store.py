@@ -0,0 +1,74 @@
+"""Tests of the journaled mapping store."""
+import os
+
+import pytest
+
+from custom_components.rfid_jukebox.store import OP_SET, MappingStore
+
+BROKEN = "AA-BB: {type: folder, name: [unclosed\n"
+
+
+def make(tmp_path, threshold: int = 1) -> MappingStore:
+    """Return a store compacting after ``threshold`` journal entries."""
+    return MappingStore(None, str(tmp_path / "rfid_mappings.yaml"), threshold, str(tmp_path / "cache.json"))
+
+
+def test_missing_file_loads_empty(tmp_path):
+    """A missing file has no mappings and is created by the first change."""
+    store = make(tmp_path)
+    assert store.load() == {}
+    assert store.snapshot_error is None
+    store.set("AA-BB", {"type": "folder", "name": "Songs"})
+    assert os.path.exists(store.file_path)
+
+
+def test_unreadable_file_is_never_compacted(tmp_path):
+    """A file that does not parse is kept as it is; changes go to the journal."""
+    store = make(tmp_path)
+    with open(store.file_path, "w", encoding="utf-8") as f:
+        f.write(BROKEN)
+    assert store.load() == {}
+    assert store.snapshot_error
+    assert store.load_stats["source"] == "unreadable"
+    store.set("CC-DD", {"type": "folder", "name": "Songs"})
+    store.compact()
+    with open(store.file_path, encoding="utf-8") as f:
+        assert f.read() == BROKEN
+    assert os.path.exists(store.journal_path)
+    assert not os.path.exists(store.cache_path)
+
+
+def test_fixed_file_gets_the_journal(tmp_path):
+    """Once the file is fixed, changes made meanwhile are replayed on top."""
+    store = make(tmp_path)
+    with open(store.file_path, "w", encoding="utf-8") as f:
+        f.write(BROKEN)
+    store.load()
+    store.set("CC-DD", {"type": "folder", "name": "Songs"})
+    with open(store.file_path, "w", encoding="utf-8") as f:
+        f.write("AA-BB: {type: folder, name: Stories}\n")
+    mappings = make(tmp_path).load()
+    assert set(mappings) == {"AA-BB", "CC-DD"}
+
+
+def test_torn_line_is_ended_when_compaction_is_refused(tmp_path):
+    """A record appended after a torn line stays readable."""
+    store = make(tmp_path, threshold=100)
+    with open(store.file_path, "w", encoding="utf-8") as f:
+        f.write(BROKEN)
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write('{"op":"set","tag":"AA')
+    store.load()
+    store.set("CC-DD", {"type": "folder", "name": "Songs"})
+    assert set(make(tmp_path, threshold=100).load()) == {"CC-DD"}
+
+
+def test_failed_journal_write_raises(tmp_path):
+    """A change that cannot be written raises and is not kept."""
+    store = make(tmp_path, threshold=100)
+    store.load()
+    os.mkdir(store.journal_path)
+    with pytest.raises(OSError):
+        store.apply([(OP_SET, "AA-BB", {"type": "folder", "name": "Songs"})])
+    assert store._mappings == {}
+    assert store._journal_entries == 0
@@ -0,0 +1,77 @@
+"""Tests of the mapping import readers."""
+import json
+
+import pytest
+
+from custom_components.rfid_jukebox import transfer
+from custom_components.rfid_jukebox.transfer import TransferError, plan_import
+
+MAPPINGS = {
+    f"01-23-45-{index:02X}": {"type": "folder", "name": f"kids/{index} \\", "alias": f"Card {index}", "players": None}
+    for index in range(40)
+}
+MAPPINGS["FF-FF-FF-FF"] = {"type": "playlist", "name": "Ünïcode ♫", "alias": "", "players": ["media_player.a"]}
+
+
+def write(tmp_path, name: str, text: str) -> str:
+    """Write a file and return its path."""
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(params=[1, 7, 64 * 1024])
+def chunk_size(request, monkeypatch):
+    """Read JSON in chunks of various sizes, down to a character at a time."""
+    monkeypatch.setattr(transfer, "JSON_CHUNK_SIZE", request.param)
+    return request.param
+
+
+def test_json_object_streams_like_json_load(tmp_path, chunk_size):
+    """A mapping file document reads the same however it is chunked."""
+    path = write(tmp_path, "tags.json", json.dumps(MAPPINGS, indent=2))
+    changes, report = plan_import(path, None, {}, False, True)
+    assert report.rows == len(MAPPINGS)
+    assert not report.errors
+    assert set(changes) == set(MAPPINGS)
+    assert changes["FF-FF-FF-FF"].name == "Ünïcode ♫"
+
+
+def test_json_list_streams_like_json_load(tmp_path, chunk_size):
+    """A list of rows reads the same however it is chunked, bad items included."""
+    rows = [{"tag_id": tag_id, **raw} for tag_id, raw in MAPPINGS.items()]
+    rows.insert(3, 12345678901234567890)
+    path = write(tmp_path, "tags.json", json.dumps(rows))
+    changes, report = plan_import(path, None, {}, False, True)
+    assert report.rows == len(rows)
+    assert report.errors == [{"row": "item 4", "reason": "not an object"}]
+    assert set(changes) == set(MAPPINGS)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['{"01-02": {"type": "folder", "name": "a"}', '{"01-02": {"type": "folder"} "03": 1}', '[1, 2] 3', '"tags"'],
+)
+def test_invalid_json_is_refused(tmp_path, chunk_size, text):
+    """Truncated, malformed and scalar documents are refused as a whole."""
+    path = write(tmp_path, "tags.json", text)
+    with pytest.raises(TransferError):
+        plan_import(path, None, {}, False, True)
+
+
+def test_empty_json_document(tmp_path, chunk_size):
+    """Empty objects and null import nothing."""
+    for text in ("{}", " [ ] ", "null"):
+        changes, report = plan_import(write(tmp_path, "tags.json", text), None, {}, False, True)
+        assert changes == {} and report.rows == 0
+
+
+def test_yaml_size_is_limited(tmp_path, monkeypatch):
+    """YAML files above the limit are refused before they are parsed."""
+    path = write(tmp_path, "tags.yaml", "01-02: {type: folder, name: a}\n")
+    monkeypatch.setattr(transfer, "YAML_SIZE_LIMIT", 10)
+    with pytest.raises(TransferError, match="limited"):
+        plan_import(path, None, {}, False, True)
+    monkeypatch.setattr(transfer, "YAML_SIZE_LIMIT", 1000)
+    changes, _report = plan_import(path, None, {}, False, True)
+    assert list(changes) == ["01-02"]